@@ -33,6 +33,10 @@ class MotorCarSerializer(serializers.ModelSerializer):
         return formatted
 
 class RatingSerializer(serializers.ModelSerializer):
+    # Resized derivatives of the rating photo, never the multi-MB original
+    image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+
     class Meta:
         model = Rating
         fields = [
@@ -43,6 +47,20 @@ class RatingSerializer(serializers.ModelSerializer):
             'location',
             'device_id',
             'is_anonymous',
-            'created_at'
+            'created_at',
+            'image_url',
+            'thumbnail_url',
         ]
         read_only_fields = ['motor_car', 'created_at']
+
+    def _absolute(self, url):
+        request = self.context.get('request')
+        if url and request:
+            return request.build_absolute_uri(url)
+        return url
+
+    def get_image_url(self, obj):
+        return self._absolute(obj.display_image_url)
+
+    def get_thumbnail_url(self, obj):
+        return self._absolute(obj.thumbnail_url)
@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import OCRExtractionLog, OCRJob, OCRVariantStat
+
+
+class OCRExtractionLogAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'formatted_plate', 'success', 'plate_format', 'engine_used',
+                    'confidence', 'processing_time_ms', 'ocr_calls', 'user_corrected', 'input_method']
+    list_filter = ['success', 'engine_used', 'plate_format', 'user_corrected', 'input_method']
+    search_fields = ['formatted_plate', 'corrected_plate', 'extracted_plate']
+    date_hierarchy = 'created_at'
+    raw_id_fields = ['user']
+
+
+admin.site.register(OCRExtractionLog, OCRExtractionLogAdmin)
+admin.site.register(OCRJob)
+admin.site.register(OCRVariantStat)
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class PlateOcrConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'plate_ocr'
+
+    def ready(self):
+        import plate_ocr.checks  # settings checks
+        import plate_ocr.signals  # known-plate snapping
+        from django.core.signals import request_started
+        from .conf import ocr_setting
+        from .warmup import warm_up_on_request
+        # Load the OCR models in the background before the first photo arrives
+        if ocr_setting('WARM_UP'):
+            request_started.connect(warm_up_on_request, dispatch_uid='plate_ocr_warm_up')
@@ -0,0 +1,263 @@
+"""
+OCR backends used by OCREngine.
+
+A backend reads the text on a (preprocessed) plate crop and returns
+(text, confidence) pairs; the engine validates them with PlateValidator.
+Backends load their model lazily on first use and report themselves
+unavailable when their dependency or model is missing, so any subset can be
+configured with PLATE_OCR['BACKENDS'] (preferred first).
+"""
+import logging
+import os
+import threading
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class OCRBackend:
+    """Base class: subclasses set `name` and implement load() and read()"""
+
+    name = ''
+    # Multiplier applied to this backend's confidence when ranking plates
+    confidence_boost = 1.0
+
+    def __init__(self):
+        self._available = None
+
+    @property
+    def available(self) -> bool:
+        """Load the backend on first use; False if it cannot be used"""
+        if self._available is None:
+            try:
+                self._available = self.load()
+            except Exception as e:
+                logger.error(f"Error initializing {self.name}: {e}")
+                self._available = False
+        return self._available
+
+    def load(self) -> bool:
+        raise NotImplementedError
+
+    def read(self, image: np.ndarray) -> List[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def region_reader(self, region: np.ndarray):
+        """
+        read() for the preprocessed variants of one plate region. Backends
+        that can share work between the variants of a region return a
+        callable that also has read_many(images).
+        """
+        return self.read
+
+
+class EasyOCRRegionReader:
+    """
+    Reads the variants of one plate region with EasyOCR's CRAFT text
+    detector run once, on the region, instead of on every variant as
+    readtext() does. Only the recognizer runs on the variants, on the boxes
+    found; read_many() recognizes the boxes of several variants, stacked
+    into one image, in a single recognize() call.
+    """
+
+    def __init__(self, reader, region: np.ndarray):
+        self.reader = reader
+        self.region = region
+        self._boxes = None
+
+    def boxes(self) -> List[List[int]]:
+        """Text boxes in the region as [x_min, x_max, y_min, y_max], detected on first use"""
+        if self._boxes is None:
+            height, width = self.region.shape[:2]
+            horizontal, free = self.reader.detect(self.region)
+            boxes = list(horizontal[0]) if horizontal else []
+            # Slanted text comes back as quadrilaterals; the recognizer gets their upright bounds
+            for points in (free[0] if free else []):
+                xs, ys = [point[0] for point in points], [point[1] for point in points]
+                boxes.append([min(xs), max(xs), min(ys), max(ys)])
+            boxes = [
+                [max(int(x1), 0), min(int(x2), width), max(int(y1), 0), min(int(y2), height)]
+                for x1, x2, y1, y2 in boxes
+            ]
+            # A tight plate crop may hold no box CRAFT is sure of; read it whole then
+            self._boxes = [box for box in boxes if box[1] > box[0] and box[3] > box[2]] or [[0, width, 0, height]]
+        return self._boxes
+
+    def __call__(self, image: np.ndarray) -> List[Tuple[str, float]]:
+        return self.read_many([image])[0]
+
+    def read_many(self, images: List[np.ndarray]) -> List[List[Tuple[str, float]]]:
+        """(text, confidence) pairs for each image, all the region's size"""
+        height, width = self.region.shape[:2]
+        if any(image.shape[:2] != (height, width) for image in images):
+            # The boxes do not apply to a resized image: detect on it as usual
+            return [[(d[1], d[2]) for d in self.reader.readtext(image)] for image in images]
+        images = [cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image for image in images]
+        boxes = self.boxes()
+        stacked = np.vstack(images)
+        # Each variant's copy of the boxes, shifted down to where it sits in the stack
+        horizontal = [[x1, x2, y1 + i * height, y2 + i * height]
+                      for i in range(len(images)) for x1, x2, y1, y2 in boxes]
+        readings = [[] for _ in images]
+        for box, text, confidence in self.reader.recognize(
+            stacked, horizontal_list=horizontal, free_list=[], batch_size=len(horizontal),
+        ):
+            # Results come back sorted by position, so the box's top edge says which variant it is from
+            readings[min(int(box[0][1]) // height, len(images) - 1)].append((text, confidence))
+        return readings
+
+
+class EasyOCRBackend(OCRBackend):
+    """General-purpose EasyOCR text reader (torch)"""
+
+    name = 'easyocr'
+    confidence_boost = 1.1
+
+    def load(self) -> bool:
+        try:
+            import easyocr
+        except ImportError:
+            logger.warning("EasyOCR not available")
+            return False
+        from .conf import ocr_setting
+        threads = ocr_setting('TORCH_THREADS')
+        if threads is not None:
+            import torch
+            # torch defaults to one intra-op thread per core, per process
+            torch.set_num_threads(threads)
+        self.reader = easyocr.Reader(['en'], gpu=False)
+        self.detect_once = ocr_setting('EASYOCR_DETECT_ONCE')
+        logger.info("EasyOCR initialized successfully")
+        return True
+
+    def read(self, image: np.ndarray) -> List[Tuple[str, float]]:
+        return [(detection[1], detection[2]) for detection in self.reader.readtext(image)]
+
+    def region_reader(self, region: np.ndarray):
+        if not self.detect_once:
+            return self.read
+        return EasyOCRRegionReader(self.reader, region)
+
+
+class TesseractBackend(OCRBackend):
+    """Tesseract through pytesseract (one subprocess per call)"""
+
+    name = 'tesseract'
+    CONFIG = r'--oem 3 --psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+    def load(self) -> bool:
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+        except Exception:
+            logger.warning("Tesseract not available")
+            return False
+        logger.info("Tesseract available")
+        return True
+
+    def read(self, image: np.ndarray) -> List[Tuple[str, float]]:
+        import pytesseract
+        text = pytesseract.image_to_string(image, config=self.CONFIG).strip()
+        # Tesseract doesn't provide confidence for simple mode
+        return [(text, 0.7)] if text else []
+
+
+class TesserocrBackend(OCRBackend):
+    """
+    Tesseract in-process through tesserocr: one API handle per thread,
+    initialized once with the plate whitelist and PSM 7 (single line), fed
+    the pixel buffer directly and reporting Tesseract's word confidences.
+    Falls back to TesseractBackend's subprocesses if tesserocr is missing.
+    """
+
+    name = 'tesserocr'
+    WHITELIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+        self._fallback = None
+
+    def load(self) -> bool:
+        try:
+            import tesserocr  # noqa: F401
+        except ImportError:
+            logger.warning("tesserocr not available, falling back to pytesseract")
+            self._fallback = TesseractBackend()
+            return self._fallback.available
+        self._api()
+        logger.info("tesserocr initialized successfully")
+        return True
+
+    def _api(self):
+        """This thread's API handle; a TessBaseAPI must not be shared between threads"""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            import tesserocr
+            api = tesserocr.PyTessBaseAPI(lang='eng', psm=tesserocr.PSM.SINGLE_LINE)
+            api.SetVariable('tessedit_char_whitelist', self.WHITELIST)
+            self._local.api = api
+        return api
+
+    def read(self, image: np.ndarray) -> List[Tuple[str, float]]:
+        if self._fallback is not None:
+            return self._fallback.read(image)
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+
+        api = self._api()
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+        text = api.GetUTF8Text().strip()
+        confidences = api.AllWordConfidences()
+        if not text or not confidences:
+            return []
+        # Word confidences are 0-100; a plate is only as certain as its least certain word
+        return [(text, min(confidences) / 100)]
+
+
+class PlateCharBackend(OCRBackend):
+    """
+    Dedicated plate character recognizer (plate_recognizer.py): character
+    segmentation plus a small CNN run by OpenCV DNN, no torch or subprocess.
+    Needs the ONNX model from `manage.py train_plate_recognizer`.
+    """
+
+    name = 'platechar'
+
+    def __init__(self, model_path: str = None):
+        super().__init__()
+        self.model_path = model_path
+
+    def load(self) -> bool:
+        from .conf import ocr_setting
+        from .plate_recognizer import PlateCharRecognizer
+        model_path = self.model_path or ocr_setting('PLATE_CHAR_MODEL')
+        if not os.path.exists(model_path):
+            logger.warning(f"Plate character model not found at {model_path}")
+            return False
+        self.recognizer = PlateCharRecognizer(model_path)
+        logger.info("Plate character recognizer loaded")
+        return True
+
+    def read(self, image: np.ndarray) -> List[Tuple[str, float]]:
+        reading = self.recognizer.read(image)
+        return [reading] if reading else []
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (EasyOCRBackend, TesseractBackend, TesserocrBackend, PlateCharBackend)
+}
+
+
+def create_backend(name: str) -> OCRBackend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown OCR backend {name!r}; choose from {', '.join(BACKENDS)}")
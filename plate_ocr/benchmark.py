@@ -0,0 +1,161 @@
+"""
+Accuracy and latency benchmark for the OCR engine over a labeled image set.
+
+A data set is a folder of photos plus a labels file mapping file names to
+the expected plate, either labels.csv (filename,plate rows) or labels.json
+({"filename": "plate"}). run_benchmark() pushes every photo through
+OCREngine.extract_from_bytes, optionally across several worker processes,
+and returns a JSON-serialisable report meant to be saved and diffed between
+runs (see `manage.py benchmark_ocr`).
+"""
+import csv
+import json
+import os
+import platform
+import resource
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .ocr_engine import OCREngine, PlateValidator
+
+LABEL_FILES = ('labels.csv', 'labels.json')
+
+# OCR engine of the current benchmark worker process
+_worker_engine = None
+
+
+def normalize_plate(plate: str) -> str:
+    return ''.join(plate.split()).upper()
+
+
+def load_labels(image_dir: Path, labels_path: Optional[Path] = None) -> Dict[str, str]:
+    """Map of image file name -> expected plate"""
+    if labels_path is None:
+        labels_path = next((image_dir / name for name in LABEL_FILES if (image_dir / name).exists()), None)
+        if labels_path is None:
+            raise FileNotFoundError(f"No {' or '.join(LABEL_FILES)} in {image_dir}")
+
+    if labels_path.suffix == '.json':
+        with open(labels_path) as f:
+            return {name: plate for name, plate in json.load(f).items()}
+
+    labels = {}
+    with open(labels_path, newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0].startswith('#') or row[0].lower() == 'filename':
+                continue
+            labels[row[0].strip()] = row[1].strip()
+    return labels
+
+
+def _init_worker(engine_options):
+    global _worker_engine
+    _worker_engine = OCREngine(**engine_options)
+    # Load the models up front so the first photo's latency is not skewed
+    _worker_engine.warm_up()
+
+
+def _run_one(path: str, expected: str) -> dict:
+    with open(path, 'rb') as f:
+        image_bytes = f.read()
+    started = time.perf_counter()
+    result = _worker_engine.extract_from_bytes(image_bytes)
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    predicted = result.formatted_plate if result.is_valid else ''
+    _, expected_format, _ = PlateValidator.validate_and_format(expected)
+    return {
+        'file': os.path.basename(path),
+        'expected': expected,
+        'expected_format': expected_format.value,
+        'predicted': predicted,
+        'correct': normalize_plate(predicted) == normalize_plate(expected),
+        'confidence': round(result.confidence, 4),
+        'error': result.error,
+        'latency_ms': round(latency_ms, 2),
+        'ocr_calls': result.ocr_calls,
+        'timings': {stage: round(ms, 2) for stage, ms in (result.timings or {}).items()},
+    }
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+
+def summarize(records: List[dict]) -> dict:
+    latencies = [r['latency_ms'] for r in records]
+    by_format = defaultdict(lambda: [0, 0])
+    stage_totals = defaultdict(float)
+    for record in records:
+        by_format[record['expected_format']][0] += 1
+        by_format[record['expected_format']][1] += record['correct']
+        for stage, ms in record['timings'].items():
+            stage_totals[stage] += ms
+
+    count = len(records) or 1
+    return {
+        'images': len(records),
+        'correct': sum(r['correct'] for r in records),
+        'accuracy': round(sum(r['correct'] for r in records) / count, 4),
+        'per_format': {
+            fmt: {'images': total, 'correct': correct, 'accuracy': round(correct / total, 4)}
+            for fmt, (total, correct) in sorted(by_format.items())
+        },
+        'latency_ms': {
+            'mean': round(sum(latencies) / count, 2),
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+            'max': round(max(latencies), 2) if latencies else None,
+        },
+        'ocr_calls_per_image': round(sum(r['ocr_calls'] for r in records) / count, 2),
+        'stage_ms_per_image': {stage: round(total / count, 2) for stage, total in sorted(stage_totals.items())},
+    }
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident memory of this process and of its (finished) worker processes"""
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1024 * 1024 if platform.system() == 'Darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        'workers': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+
+def run_benchmark(image_dir: Path, labels: Dict[str, str], engine_options: dict,
+                  workers: int = 1, limit: Optional[int] = None) -> dict:
+    """Run every labeled image through the engine and return the report"""
+    items = [(str(image_dir / name), plate) for name, plate in sorted(labels.items())
+             if (image_dir / name).exists()]
+    missing = sorted(name for name in labels if not (image_dir / name).exists())
+    if limit:
+        items = items[:limit]
+
+    started = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                 initializer=_init_worker, initargs=(engine_options,)) as executor:
+            records = list(executor.map(_run_one, *zip(*items))) if items else []
+    else:
+        _init_worker(engine_options)
+        records = [_run_one(path, plate) for path, plate in items]
+    wall_s = time.perf_counter() - started
+
+    return {
+        'config': {**engine_options, 'workers': workers, 'image_dir': str(image_dir)},
+        'summary': {
+            **summarize(records),
+            'wall_time_s': round(wall_s, 2),
+            'images_per_s': round(len(records) / wall_s, 2) if wall_s else None,
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'missing_files': missing,
+        'results': records,
+    }
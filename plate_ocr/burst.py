@@ -0,0 +1,282 @@
+"""
+Plate recognition over a burst of photos or a short video clip.
+
+A single photo of a moving boda boda is often blurred. Here every frame is
+scored by the variance of its Laplacian on a small grayscale copy, which is
+cheap, and only the sharpest few frames are read, in capture order. The
+plate box read in one frame is followed into the next by template matching,
+so plate detection only runs again when the plate is lost. The plates read
+from the frames are then put to a vote.
+
+Frames are streamed: photos are decoded one at a time and video frames are
+pulled from cv2.VideoCapture one at a time, so no more than top_frames
+decoded frames are held at once.
+"""
+import heapq
+import logging
+import os
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .decoding import ImageRejected, decode_image, upload_source
+from .ocr_engine import NO_PLATE_ERROR, ImagePreprocessor, OCREngine, PlateResult, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Long edge of the grayscale copy that frame sharpness is measured on
+SHARPNESS_EDGE = 480
+
+
+def sharpness(frame: np.ndarray) -> float:
+    """Variance of the Laplacian: higher is sharper"""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    scale = SHARPNESS_EDGE / max(gray.shape[:2])
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def sharpest_frames(frames: Iterable[np.ndarray], count: int) -> Tuple[List[Tuple[int, np.ndarray]], int]:
+    """
+    The `count` sharpest frames as (index, frame) in frame order, and the
+    number of frames seen. Only `count` frames are kept while streaming.
+    """
+    heap, seen = [], 0
+    for index, frame in enumerate(frames):
+        seen += 1
+        entry = (sharpness(frame), index, frame)
+        if len(heap) < count:
+            heapq.heappush(heap, entry)
+        elif entry[0] > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+    return sorted(((index, frame) for _, index, frame in heap), key=lambda item: item[0]), seen
+
+
+class PlateTracker:
+    """Follows a plate box from frame to frame by template matching around its last position"""
+
+    def __init__(self, min_score: float = 0.6, search_margin: float = 1.0):
+        # Lowest normalized correlation accepted as the same plate
+        self.min_score = min_score
+        # Search window padding on every side, as a share of the box size
+        self.search_margin = search_margin
+        self.template = None
+        self.bbox = None
+
+    def update(self, frame: np.ndarray, bbox: Tuple[int, int, int, int]):
+        x1, y1, x2, y2 = bbox
+        self.template = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        self.bbox = bbox
+
+    def locate(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """The plate's box in `frame`, or None if it is not found near its last position"""
+        if self.bbox is None:
+            return None
+        x1, y1, x2, y2 = self.bbox
+        height, width = frame.shape[:2]
+        pad_x, pad_y = int((x2 - x1) * self.search_margin), int((y2 - y1) * self.search_margin)
+        left, top = max(x1 - pad_x, 0), max(y1 - pad_y, 0)
+        right, bottom = min(x2 + pad_x, width), min(y2 + pad_y, height)
+        template_h, template_w = self.template.shape
+        if bottom - top < template_h or right - left < template_w:
+            return None
+
+        window = cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED))
+        if score < self.min_score:
+            return None
+        return left + dx, top + dy, left + dx + template_w, top + dy + template_h
+
+
+def vote(results: List[PlateResult]) -> PlateResult:
+    """
+    Combine per-frame results: the plate read from the most frames wins (ties
+    go to the higher summed confidence). Its best frame's result is returned,
+    with the confidence scaled by the share of plate-reading frames that agree.
+    """
+    valid = [result for result in results if result.is_valid]
+    raw_detections = [text for result in results for text in (result.raw_detections or [])]
+    if not valid:
+        errors = [result.error for result in results if result.error and result.error != NO_PLATE_ERROR]
+        failed = PlateResult.failed(errors[0] if errors and len(errors) == len(results) else NO_PLATE_ERROR)
+        failed.raw_detections = raw_detections
+        return failed
+
+    votes = Counter(result.formatted_plate for result in valid)
+    support = Counter()
+    for result in valid:
+        support[result.formatted_plate] += result.confidence
+    winner = max(votes, key=lambda plate: (votes[plate], support[plate]))
+    best = max((result for result in valid if result.formatted_plate == winner), key=lambda r: r.confidence)
+    return replace(
+        best,
+        confidence=best.confidence * votes[winner] / len(valid),
+        raw_detections=raw_detections,
+        votes=dict(votes),
+    )
+
+
+def iter_photo_frames(sources: Iterable, decode) -> Iterator[np.ndarray]:
+    """Decode photos one at a time, skipping any that are rejected"""
+    for source in sources:
+        try:
+            yield decode(source)
+        except ImageRejected as e:
+            logger.info(f"Skipping burst frame: {e}")
+
+
+def iter_video_frames(path: str, stride: int = 1, max_frames: Optional[int] = None,
+                      max_edge: Optional[int] = None) -> Iterator[np.ndarray]:
+    """Every `stride`-th frame of a video, shrunk to max_edge, decoded as it is reached"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ImageRejected("Could not decode video")
+    try:
+        index = yielded = 0
+        while max_frames is None or yielded < max_frames:
+            # grab() skips a frame without converting it; retrieve() only for kept ones
+            if not capture.grab():
+                break
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield ImagePreprocessor._limit_size(frame, max_edge) if max_edge else frame
+                    yielded += 1
+            index += 1
+    finally:
+        capture.release()
+
+
+@contextmanager
+def upload_path(upload):
+    """A file path for an upload: its temporary file, or a copy written in chunks"""
+    if hasattr(upload, 'temporary_file_path'):
+        yield upload.temporary_file_path()
+        return
+    suffix = os.path.splitext(getattr(upload, 'name', '') or '')[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as copy:
+        for chunk in upload.chunks():
+            copy.write(chunk)
+        copy.flush()
+        yield copy.name
+
+
+class BurstRecognizer:
+    """
+    Reads one plate from several frames with an OCR engine. With a local
+    OCREngine, tracked boxes are passed as regions so detection is skipped;
+    other engines (OCRPoolClient) are sent the tracked crop instead.
+    """
+
+    def __init__(self, engine, top_frames: int = 3, max_frames: int = 90, video_stride: int = 2,
+                 track_min_score: float = 0.6, decode_target_edge: Optional[int] = None,
+                 max_image_bytes: Optional[int] = None, max_image_pixels: Optional[int] = None,
+                 max_video_bytes: Optional[int] = None):
+        self.engine = engine
+        self.top_frames = top_frames
+        self.max_frames = max_frames
+        self.video_stride = video_stride
+        self.track_min_score = track_min_score
+        self.decode_target_edge = decode_target_edge
+        self.max_image_bytes = max_image_bytes
+        self.max_image_pixels = max_image_pixels
+        self.max_video_bytes = max_video_bytes
+
+    @classmethod
+    def from_settings(cls, engine) -> 'BurstRecognizer':
+        from .conf import ocr_setting
+        return cls(
+            engine,
+            top_frames=ocr_setting('BURST_TOP_FRAMES'),
+            max_frames=ocr_setting('BURST_MAX_FRAMES'),
+            video_stride=ocr_setting('BURST_VIDEO_STRIDE'),
+            track_min_score=ocr_setting('BURST_TRACK_MIN_SCORE'),
+            decode_target_edge=ocr_setting('DECODE_TARGET_EDGE'),
+            max_image_bytes=ocr_setting('MAX_IMAGE_BYTES'),
+            max_image_pixels=ocr_setting('MAX_IMAGE_PIXELS'),
+            max_video_bytes=ocr_setting('MAX_VIDEO_BYTES'),
+        )
+
+    def _decode(self, source) -> np.ndarray:
+        return decode_image(source, target_edge=self.decode_target_edge,
+                            max_bytes=self.max_image_bytes, max_pixels=self.max_image_pixels)
+
+    def recognize_photos(self, uploads: Iterable) -> PlateResult:
+        """Burst of photo uploads (or paths/bytes/file objects)"""
+        sources = (upload_source(upload) for upload, _ in zip(uploads, range(self.max_frames)))
+        return self.recognize(iter_photo_frames(sources, self._decode))
+
+    def recognize_video(self, upload) -> PlateResult:
+        """Short video clip upload, sampled every video_stride frames"""
+        if self.max_video_bytes and upload.size > self.max_video_bytes:
+            return PlateResult.failed(f"Video is too large ({upload.size // (1024 * 1024)} MB)")
+        with upload_path(upload) as path:
+            return self.recognize(iter_video_frames(
+                path, stride=self.video_stride, max_frames=self.max_frames, max_edge=self.decode_target_edge,
+            ))
+
+    def recognize(self, frames: Iterable[np.ndarray]) -> PlateResult:
+        timings = {}
+        try:
+            with stage_timer(timings, 'select'):
+                selected, seen = sharpest_frames(frames, self.top_frames)
+        except ImageRejected as e:
+            return PlateResult.failed(str(e))
+        if not selected:
+            return PlateResult.failed("No frames could be decoded")
+        logger.info(f"Reading the {len(selected)} sharpest of {seen} frames")
+
+        tracker = PlateTracker(min_score=self.track_min_score)
+        results = []
+        for _, frame in selected:
+            with stage_timer(timings, 'track'):
+                bbox = tracker.locate(frame)
+            result = self._read(frame, bbox)
+            if result.is_valid and result.bounding_box:
+                tracker.update(frame, result.bounding_box)
+            results.append(result)
+
+        final = vote(results)
+        final.ocr_calls = sum(result.ocr_calls for result in results)
+        for result in results:
+            for stage, ms in (result.timings or {}).items():
+                timings[stage] = timings.get(stage, 0.0) + ms
+        final.timings = timings
+        return final
+
+    def _read(self, frame: np.ndarray, bbox: Optional[Tuple[int, int, int, int]]) -> PlateResult:
+        if bbox is None:
+            return self.engine.extract_plate(frame)
+        x1, y1, x2, y2 = bbox
+        crop = frame[y1:y2, x1:x2]
+        if isinstance(self.engine, OCREngine):
+            if self.engine.region_max_edge:
+                crop = ImagePreprocessor._limit_size(crop, self.engine.region_max_edge)
+            return self.engine.extract_plate(frame, regions=[(crop, bbox)])
+
+        result = self.engine.extract_plate(crop)
+        if result.bounding_box:
+            bx1, by1, bx2, by2 = result.bounding_box
+            result.bounding_box = (x1 + bx1, y1 + by1, x1 + bx2, y1 + by2)
+        return result
+
+
+_recognizer_instance = None
+
+
+def get_burst_recognizer() -> BurstRecognizer:
+    """BurstRecognizer around the shared OCR engine (bypassing the result cache)"""
+    global _recognizer_instance
+    if _recognizer_instance is None:
+        from .ocr_engine import get_ocr_engine
+        engine = get_ocr_engine()
+        # CachedOCREngine keys on whole uploads; frames go to the engine it wraps
+        engine = getattr(engine, 'engine', engine)
+        _recognizer_instance = BurstRecognizer.from_settings(engine)
+    return _recognizer_instance
@@ -0,0 +1,160 @@
+"""
+OCR result cache.
+
+Users often submit the same photo more than once (back button, retries on a
+flaky network), so results are cached in-process, keyed by the SHA-256 of
+the image bytes plus the engine configuration version. Entries are stored as
+PlateResult.to_dict(), evicted least-recently-used beyond RESULT_CACHE_SIZE
+and expire after RESULT_CACHE_TTL seconds.
+
+With RESULT_CACHE_PHASH a second tier matches photos by a 64-bit difference
+hash (dHash) of the decoded image, so a re-encoded or resized copy of a
+photo that was already read also hits.
+"""
+import hashlib
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .conf import config_version, ocr_setting
+from .ocr_engine import NO_PLATE_ERROR, PlateResult
+
+logger = logging.getLogger(__name__)
+
+
+def difference_hash(image_bytes: bytes) -> Optional[int]:
+    """64-bit dHash of an encoded image, or None if it cannot be decoded"""
+    buffer = np.frombuffer(image_bytes, np.uint8)
+    # A reduced decode is plenty for a 9x8 thumbnail and much cheaper
+    gray = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        return None
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class OCRResultCache:
+    """Thread-safe LRU cache of serialized PlateResults with a TTL"""
+
+    def __init__(self, max_size: int, ttl: float, use_phash: bool = False, phash_distance: int = 4):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.use_phash = use_phash
+        self.phash_distance = phash_distance
+        self.version = config_version()
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires_at, dhash, result dict), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, image_bytes: bytes) -> str:
+        return f"{self.version}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    def upload_key(self, upload) -> str:
+        """Same key as key() for the upload's bytes, hashed without reading them into memory"""
+        digest = hashlib.sha256()
+        file = getattr(upload, 'file', upload)
+        if isinstance(file, io.BytesIO):
+            with file.getbuffer() as buffer:
+                digest.update(buffer)
+        else:
+            file.seek(0)
+            for chunk in iter(lambda: file.read(64 * 1024), b''):
+                digest.update(chunk)
+        return f"{self.version}:{digest.hexdigest()}"
+
+    def get(self, key: str, dhash: Optional[int] = None) -> Optional[PlateResult]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and dhash is not None:
+                key, entry = self._find_similar(dhash, now)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return PlateResult.from_dict(entry[2])
+
+    def _find_similar(self, dhash: int, now: float):
+        for key, entry in self._entries.items():
+            if entry[1] is not None and entry[0] > now \
+                    and (entry[1] ^ dhash).bit_count() <= self.phash_distance:
+                return key, entry
+        return None, None
+
+    def set(self, key: str, result: PlateResult, dhash: Optional[int] = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dhash, result.to_dict())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedOCREngine:
+    """
+    Wraps an OCR engine (local OCREngine or OCRPoolClient) so that
+    extract_from_bytes and extract_from_upload are answered from the cache
+    when possible. Only completed OCR runs are cached; failures such as a
+    pool timeout are not.
+    """
+
+    def __init__(self, engine, cache: Optional[OCRResultCache] = None):
+        self.engine = engine
+        if cache is None:
+            cache = OCRResultCache(
+                max_size=ocr_setting('RESULT_CACHE_SIZE'),
+                ttl=ocr_setting('RESULT_CACHE_TTL'),
+                use_phash=ocr_setting('RESULT_CACHE_PHASH'),
+                phash_distance=ocr_setting('RESULT_CACHE_PHASH_DISTANCE'),
+            )
+        self.cache = cache
+
+    def extract_from_bytes(self, image_bytes: bytes) -> PlateResult:
+        key = self.cache.key(image_bytes)
+        dhash = difference_hash(image_bytes) if self.cache.use_phash else None
+        cached = self.cache.get(key, dhash)
+        if cached is not None:
+            logger.debug("OCR cache hit")
+            return cached
+
+        return self._store(key, self.engine.extract_from_bytes(image_bytes), dhash)
+
+    def extract_from_upload(self, upload) -> PlateResult:
+        if self.cache.use_phash:
+            # The difference hash is computed from the encoded bytes
+            upload.seek(0)
+            return self.extract_from_bytes(upload.read())
+
+        key = self.cache.upload_key(upload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.debug("OCR cache hit")
+            return cached
+        return self._store(key, self.engine.extract_from_upload(upload))
+
+    def _store(self, key: str, result: PlateResult, dhash: Optional[int] = None) -> PlateResult:
+        if result.error is None or result.error == NO_PLATE_ERROR:
+            self.cache.set(key, result, dhash)
+        return result
+
+    def __getattr__(self, name):
+        # extract_plate, extract_from_file etc. go straight to the engine
+        return getattr(self.engine, name)
@@ -0,0 +1,30 @@
+"""
+System checks for the plate OCR settings (run by `manage.py check` and on startup).
+"""
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+from .quotas import ATOMIC_CACHE_BACKENDS
+
+
+@register()
+def check_quota_cache(app_configs, **kwargs):
+    """The OCR quota counters need a cache with atomic incr/decr shared by every worker"""
+    from .conf import ocr_setting
+    if ocr_setting('OCR_QUOTAS') is None:
+        return []
+    alias = ocr_setting('OCR_QUOTA_CACHE')
+    cache = settings.CACHES.get(alias)
+    if cache is None:
+        return [Error(
+            f"PLATE_OCR['OCR_QUOTA_CACHE'] names the cache '{alias}', which is not in CACHES.",
+            id='plate_ocr.E001',
+        )]
+    if cache.get('BACKEND') not in ATOMIC_CACHE_BACKENDS:
+        return [Warning(
+            f"The OCR quota cache '{alias}' uses {cache.get('BACKEND')}, whose counters are not "
+            f"atomic or not shared between processes, so concurrent requests can get past the quotas.",
+            hint="Point PLATE_OCR['OCR_QUOTA_CACHE'] at a Redis or Memcached cache.",
+            id='plate_ocr.W001',
+        )]
+    return []
@@ -0,0 +1,171 @@
+"""
+Settings for the plate OCR engine.
+
+All options live in one PLATE_OCR dict in the Django settings; anything not
+set there falls back to DEFAULTS below.
+"""
+import hashlib
+import json
+import os
+
+from django.conf import settings
+
+DEFAULTS = {
+    # OCR backends, preferred first: 'easyocr', 'tesserocr' (Tesseract
+    # in-process), 'tesseract' (a pytesseract subprocess per call) and/or
+    # 'platechar' (the dedicated plate character recognizer, see plate_recognizer.py)
+    'BACKENDS': ('easyocr', 'tesserocr'),
+    # ONNX model of the 'platechar' backend (`manage.py train_plate_recognizer`)
+    'PLATE_CHAR_MODEL': os.path.join(os.path.dirname(__file__), 'weights', 'plate_chars.onnx'),
+    # Run EasyOCR's text detector once per plate region and only its
+    # recognizer on each preprocessed variant (False = readtext() per variant)
+    'EASYOCR_DETECT_ONCE': True,
+
+    # Stop OCR as soon as a plate is good enough instead of trying every
+    # region x variant x engine combination
+    'CASCADE': True,
+    # A valid plate at or above this confidence ends the cascade immediately
+    'CASCADE_MIN_CONFIDENCE': 0.85,
+    # Per-photo budget for the cascade (None = unlimited)
+    'MAX_OCR_CALLS': 24,
+    'MAX_OCR_MS': 5000,
+
+    # Snap a read that fails plate validation to the registered MotorCar
+    # plate it differs from by one OCR confusion pair (O/0, B/8, ...) and
+    # multiply its confidence by KNOWN_PLATE_BOOST; valid reads are kept as
+    # read. The plates are indexed on a background thread (or during WARM_UP)
+    # and re-indexed every KNOWN_PLATES_REFRESH seconds (see known_plates.py)
+    'KNOWN_PLATES': True,
+    'KNOWN_PLATE_BOOST': 1.2,
+    'KNOWN_PLATES_REFRESH': 600,
+
+    # Uploads are rejected from the header alone above MAX_IMAGE_BYTES or
+    # MAX_IMAGE_PIXELS. JPEGs are decoded at 1/2, 1/4 or 1/8 scale as long
+    # as the long edge stays >= DECODE_TARGET_EDGE (None = full resolution)
+    'DECODE_TARGET_EDGE': 1600,
+    'MAX_IMAGE_BYTES': 20 * 1024 * 1024,
+    'MAX_IMAGE_PIXELS': 50_000_000,
+
+    # Burst/video recognition (burst.py, api/extract-burst/): frames examined
+    # at most, of which the BURST_TOP_FRAMES sharpest are read and voted on.
+    # Videos are sampled every BURST_VIDEO_STRIDE frames, up to MAX_VIDEO_BYTES
+    'BURST_TOP_FRAMES': 3,
+    'BURST_MAX_FRAMES': 90,
+    'BURST_VIDEO_STRIDE': 2,
+    'MAX_VIDEO_BYTES': 50 * 1024 * 1024,
+    # Lowest template-matching score at which a plate box is followed into
+    # the next frame instead of detecting the plate again
+    'BURST_TRACK_MIN_SCORE': 0.6,
+
+    # Plate detection runs on a copy scaled down to this long edge (pixels);
+    # regions are still cropped from the decoded photo (None = off)
+    'DETECT_MAX_EDGE': 1280,
+    # Cropped regions larger than this long edge are shrunk before OCR
+    'REGION_MAX_EDGE': 1600,
+
+    # Load the OCR models and run one inference in the background when a
+    # Celery worker process starts, or when a web process started with
+    # PLATE_OCR_WARM_UP=1 serves its first request, instead of on its first
+    # photo. The readiness endpoint (photo/rating/ready/) answers 503 until
+    # that is done (see warmup.py)
+    'WARM_UP': False,
+
+    # Photos read at once per process (None = no limit). Up to OCR_QUEUE_SIZE
+    # more wait for a slot, for at most OCR_QUEUE_TIMEOUT seconds; beyond that
+    # the upload is turned away with "enter the plate manually" (HTTP 429 from the API)
+    'OCR_CONCURRENCY': 2,
+    'OCR_QUEUE_SIZE': 8,
+    'OCR_QUEUE_TIMEOUT': 15,
+    # Bearer token a metrics scraper sends to photo/rating/metrics/ (None =
+    # staff only)
+    'METRICS_TOKEN': None,
+    # Threads per process for torch (EasyOCR) and OpenCV (None = one per core)
+    'TORCH_THREADS': 2,
+    'OPENCV_THREADS': 2,
+
+    # Per-client OCR quotas by accounts user_type (None = no quotas): photos
+    # per minute and photos being read at once. Signed-in users are counted
+    # per account, anonymous clients per IP; over quota is HTTP 429
+    'OCR_QUOTAS': {
+        'Anonymous': {'per_minute': 6, 'concurrent': 1},
+        'Registered': {'per_minute': 20, 'concurrent': 2},
+        'Verified': {'per_minute': 60, 'concurrent': 3},
+    },
+    # Cache holding the quota counters. It must be a Redis or Memcached cache
+    # shared by all web and Celery workers: other backends do not increment
+    # atomically across processes, so bursts get past the quotas (see
+    # quotas.py; `manage.py check` warns with plate_ocr.W001)
+    'OCR_QUOTA_CACHE': 'default',
+
+    # Shared OCR process pool (`manage.py run_ocr_pool`). When enabled, web
+    # workers send image bytes to the pool instead of loading the model.
+    'POOL_ENABLED': False,
+    # Unix socket path or (host, port) the pool listens on
+    'POOL_ADDRESS': ('127.0.0.1', 8765),
+    # Shared secret for the pool connection; None derives one from SECRET_KEY
+    'POOL_AUTHKEY': None,
+    # Number of OCR processes, each holding one loaded model
+    'POOL_SIZE': 2,
+    # Recycle an OCR process after this many photos (None = never)
+    'POOL_MAX_TASKS_PER_CHILD': None,
+    # Seconds a web worker waits for a result before giving up
+    'POOL_TIMEOUT': 30,
+    # Largest photo accepted by the pool, in bytes
+    'POOL_MAX_IMAGE_BYTES': 10 * 1024 * 1024,
+
+    # In-process cache of OCR results keyed by the photo's bytes, so retried
+    # uploads skip OCR. Number of results kept (0 = no cache) and their lifetime
+    'RESULT_CACHE_SIZE': 256,
+    'RESULT_CACHE_TTL': 600,
+    # Also match re-encoded/resized copies of a photo by perceptual hash
+    'RESULT_CACHE_PHASH': False,
+    # Max differing bits (of 64) for two photos to count as the same
+    'RESULT_CACHE_PHASH_DISTANCE': 4,
+
+    # Run photo OCR as OCRJobs on the "ocr" Celery queue instead of inside the
+    # request (needs a worker: `celery -A tra_ratings worker -Q ocr`)
+    'ASYNC_JOBS': False,
+
+    # Order (and prune) preprocessing variants in the cascade by how often
+    # each one produced the accepted plate, as recorded in OCRVariantStat
+    'ADAPTIVE_VARIANTS': True,
+    # Share of photos that try a random variant first, so every variant keeps
+    # collecting statistics
+    'VARIANT_EXPLORATION': 0.1,
+    # Variants tried on at least VARIANT_MIN_ATTEMPTS photos that produced
+    # the plate less often than VARIANT_PRUNE_BELOW are skipped
+    'VARIANT_MIN_ATTEMPTS': 200,
+    'VARIANT_PRUNE_BELOW': 0.02,
+    # Photos between writes of the collected statistics to the database
+    'VARIANT_STATS_FLUSH_EVERY': 20,
+
+    # Write an OCRExtractionLog row per photo. Rows are buffered and saved
+    # with bulk_create by a background thread, so requests never wait on it:
+    # every EXTRACTION_LOG_BATCH_SIZE rows or EXTRACTION_LOG_FLUSH_INTERVAL seconds
+    'EXTRACTION_LOG': True,
+    'EXTRACTION_LOG_BATCH_SIZE': 50,
+    'EXTRACTION_LOG_FLUSH_INTERVAL': 5,
+}
+
+# Bump when a change to the OCR code alters results, to invalidate cached ones
+ENGINE_VERSION = 1
+
+
+def ocr_setting(name):
+    """Return a PLATE_OCR option, falling back to its default"""
+    return getattr(settings, 'PLATE_OCR', {}).get(name, DEFAULTS[name])
+
+
+def pool_authkey() -> bytes:
+    authkey = ocr_setting('POOL_AUTHKEY')
+    if authkey is None:
+        return hashlib.sha256(f"plate-ocr-pool:{settings.SECRET_KEY}".encode()).digest()
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def config_version() -> str:
+    """Short fingerprint of the engine code version and every OCR option"""
+    options = {name: ocr_setting(name) for name in DEFAULTS}
+    options['ENGINE_VERSION'] = ENGINE_VERSION
+    payload = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
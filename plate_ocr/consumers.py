@@ -0,0 +1,44 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .jobs import job_group, job_payload
+from .models import OCRJob
+
+
+class OCRJobConsumer(AsyncJsonWebsocketConsumer):
+    """Sends an OCR job's status changes to its owner until the job finishes"""
+
+    async def connect(self):
+        self.job_id = self.scope['url_route']['kwargs']['job_id']
+        job = await self._get_job()
+        if job is None:
+            await self.close()
+            return
+
+        self.group_name = job_group(self.job_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        # The job may have finished before we joined the group
+        job = await self._get_job()
+        await self.send_json(job_payload(job))
+        if job.is_finished:
+            await self.close()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def ocr_job(self, event):
+        await self.send_json(event['job'])
+        if event['job']['status'] in (OCRJob.STATUS_DONE, OCRJob.STATUS_FAILED):
+            await self.close()
+
+    @database_sync_to_async
+    def _get_job(self):
+        session = self.scope.get('session')
+        session_key = session.session_key if session is not None else None
+        job = OCRJob.objects.filter(id=self.job_id).first()
+        if job is None or not job.belongs_to(self.scope['user'], session_key):
+            return None
+        return job
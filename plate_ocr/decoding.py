@@ -0,0 +1,140 @@
+"""
+Memory-bounded image decoding for uploaded photos.
+
+The header is read first (PIL only parses it), so files that are not an
+image, are too large or have too many pixels are rejected before any pixel
+data is decoded. JPEGs are then decoded at a reduced resolution
+(cv2.IMREAD_REDUCED_COLOR_2/4/8, which scales in the JPEG decoder itself)
+when the photo is much larger than OCR needs: a 12 MP photo becomes a
+~9 MB array at 1/2 scale instead of ~36 MB.
+
+Sources can be a path, bytes, or a binary file object. Files with a file
+descriptor (Django's temporary upload files, FileSystemStorage files) are
+memory-mapped and in-memory uploads are decoded from their buffer, so the
+upload is never copied into a separate bytes object.
+"""
+import io
+import mmap
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+# Formats OpenCV decodes; PIL reports multi-picture phone JPEGs as MPO
+ALLOWED_FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP', 'BMP', 'TIFF')
+
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                 (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+class ImageRejected(ValueError):
+    """The upload is not a usable image; the message is shown to the user"""
+
+
+@dataclass
+class ImageInfo:
+    format: str
+    width: int
+    height: int
+    size_bytes: int
+
+
+def _source_size(source) -> int:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer().nbytes
+    try:
+        return os.fstat(source.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        position = source.tell()
+        size = source.seek(0, io.SEEK_END)
+        source.seek(position)
+        return size
+
+
+def inspect_image(source, max_bytes: Optional[int] = None, max_pixels: Optional[int] = None) -> ImageInfo:
+    """Read the image header; raises ImageRejected for unusable files"""
+    size_bytes = _source_size(source)
+    if max_bytes and size_bytes > max_bytes:
+        raise ImageRejected(f"Image is too large ({size_bytes // (1024 * 1024)} MB)")
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        header_source = io.BytesIO(source)
+    else:
+        header_source = source
+        if hasattr(source, 'seek'):
+            source.seek(0)
+    try:
+        # Image.open only parses the header; pixel data is not decoded
+        with Image.open(header_source) as image:
+            info = ImageInfo(image.format, image.width, image.height, size_bytes)
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        raise ImageRejected("Could not decode image")
+
+    if info.format not in ALLOWED_FORMATS:
+        raise ImageRejected(f"Unsupported image format {info.format}")
+    if max_pixels and info.width * info.height > max_pixels:
+        raise ImageRejected(f"Image resolution {info.width}x{info.height} is too large")
+    return info
+
+
+def reduced_decode_flag(info: ImageInfo, target_edge: Optional[int]) -> int:
+    """Smallest JPEG decode scale that still leaves the long edge >= target_edge"""
+    if target_edge and info.format in ('JPEG', 'MPO'):
+        long_edge = max(info.width, info.height)
+        for factor, flag in REDUCED_FLAGS:
+            if long_edge // factor >= target_edge:
+                return flag
+    return cv2.IMREAD_COLOR
+
+
+def _decode_buffer(buffer, flags: int) -> Optional[np.ndarray]:
+    return cv2.imdecode(np.frombuffer(buffer, np.uint8), flags)
+
+
+def _decode_file_object(file, flags: int) -> Optional[np.ndarray]:
+    if isinstance(file, io.BytesIO):
+        with file.getbuffer() as buffer:
+            return _decode_buffer(buffer, flags)
+    try:
+        fileno = file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        file.seek(0)
+        return _decode_buffer(file.read(), flags)
+    with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+        return _decode_buffer(mapped, flags)
+
+
+def upload_source(upload):
+    """What to decode for a Django UploadedFile/File: its temporary file path or its file object"""
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path()
+    return getattr(upload, 'file', upload)
+
+
+def decode_image(source, target_edge: Optional[int] = None, max_bytes: Optional[int] = None,
+                 max_pixels: Optional[int] = None) -> np.ndarray:
+    """
+    Decode a path, bytes or binary file object to a BGR array, at reduced
+    resolution when its long edge is at least twice target_edge.
+    Raises ImageRejected for oversize, corrupt or unsupported files.
+    """
+    info = inspect_image(source, max_bytes=max_bytes, max_pixels=max_pixels)
+    flags = reduced_decode_flag(info, target_edge)
+
+    if isinstance(source, (str, os.PathLike)):
+        image = cv2.imread(os.fspath(source), flags)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        image = _decode_buffer(source, flags)
+    else:
+        image = _decode_file_object(source, flags)
+
+    if image is None:
+        raise ImageRejected("Could not decode image")
+    return image
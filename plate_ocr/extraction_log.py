@@ -0,0 +1,213 @@
+"""
+Buffered OCRExtractionLog writing and the OCR latency report.
+
+log_extraction() only builds an unsaved OCRExtractionLog and hands it to the
+process-wide ExtractionLogWriter; a daemon thread saves the buffer with one
+bulk_create every EXTRACTION_LOG_BATCH_SIZE rows or
+EXTRACTION_LOG_FLUSH_INTERVAL seconds (and at exit), so logging adds no
+database round trip to the request or OCR job.
+
+Each row gets a `ref` UUID which the wizard keeps in the session; when the
+user corrects the plate, mark_corrected() updates the row, whether it is
+still buffered or already saved.
+"""
+import atexit
+import logging
+import threading
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from django.db import DatabaseError, connection
+from django.db.models import Aggregate, Avg, Count, FloatField, Q
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .conf import ocr_setting
+from .models import OCRExtractionLog
+
+logger = logging.getLogger(__name__)
+
+# Stages shown in the report, in pipeline order
+REPORT_STAGES = ('decode', 'queue', 'detect', 'preprocess', 'ocr_easyocr', 'ocr_tesserocr', 'ocr_tesseract',
+                 'ocr_platechar', 'validate')
+
+
+class ExtractionLogWriter:
+    """Collects OCRExtractionLog rows and saves them in batches"""
+
+    def __init__(self, batch_size: int = 50, flush_interval: float = 5, background: bool = True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.background = background
+        # ref -> unsaved row
+        self._rows = {}
+        # ref -> corrected plate, for rows that were already saved
+        self._corrections = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, row: OCRExtractionLog):
+        with self._lock:
+            self._rows[row.ref] = row
+            due = len(self._rows) >= self.batch_size
+        self._ensure_thread()
+        if due:
+            if self.background:
+                self._wakeup.set()
+            else:
+                self.flush()
+
+    def mark_corrected(self, ref, corrected_plate: str):
+        with self._lock:
+            row = self._rows.get(ref)
+            if row is not None:
+                row.user_corrected = True
+                row.corrected_plate = corrected_plate
+            else:
+                self._corrections[ref] = corrected_plate
+        self._ensure_thread()
+
+    def flush(self):
+        """Save the buffered rows and corrections"""
+        with self._lock:
+            rows, self._rows = list(self._rows.values()), {}
+            corrections, self._corrections = self._corrections, {}
+        if not rows and not corrections:
+            return
+
+        try:
+            if rows:
+                OCRExtractionLog.objects.bulk_create(rows, batch_size=self.batch_size)
+            for ref, corrected_plate in corrections.items():
+                OCRExtractionLog.objects.filter(ref=ref).update(
+                    user_corrected=True, corrected_plate=corrected_plate
+                )
+        except DatabaseError as e:
+            # Losing a batch of analytics rows is preferable to retrying forever
+            logger.warning(f"Could not save {len(rows)} OCR extraction logs: {e}")
+
+    def _ensure_thread(self):
+        if not self.background or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ocr-extraction-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            # Don't hold a database connection open while idle
+            connection.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> ExtractionLogWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ExtractionLogWriter(
+                    batch_size=ocr_setting('EXTRACTION_LOG_BATCH_SIZE'),
+                    flush_interval=ocr_setting('EXTRACTION_LOG_FLUSH_INTERVAL'),
+                )
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def engines_used(result) -> str:
+    """Engine that read the plate, or the engines that were run when none did"""
+    if result.engine:
+        return result.engine
+    return '+'.join(sorted(stage[4:] for stage in (result.timings or {}) if stage.startswith('ocr_')))
+
+
+def log_extraction(result, user=None, ip_address=None, user_agent: str = '',
+                   input_method: str = 'photo', ref=None) -> Optional[uuid.UUID]:
+    """Queue an OCRExtractionLog row for a PlateResult; returns its ref"""
+    if not ocr_setting('EXTRACTION_LOG'):
+        return None
+
+    timings = {stage: round(ms, 2) for stage, ms in (result.timings or {}).items()}
+    row = OCRExtractionLog(
+        ref=ref or uuid.uuid4(),
+        user=user if user is not None and user.is_authenticated else None,
+        extracted_plate=result.plate_text[:20],
+        formatted_plate=result.formatted_plate[:20],
+        confidence=result.confidence,
+        plate_format=result.plate_format.value if result.is_valid else '',
+        success=result.is_valid,
+        input_method=input_method,
+        raw_detections=result.raw_detections or [],
+        engine_used=engines_used(result)[:50],
+        processing_time_ms=round(sum(timings.values())),
+        timings=timings,
+        ocr_calls=result.ocr_calls,
+        ip_address=ip_address,
+        user_agent=user_agent or '',
+    )
+    get_log_writer().add(row)
+    return row.ref
+
+
+def mark_corrected(ref, corrected_plate: str):
+    """Record that the user replaced the plate read from the photo"""
+    if ref and ocr_setting('EXTRACTION_LOG'):
+        get_log_writer().mark_corrected(uuid.UUID(str(ref)), corrected_plate)
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL percentile_cont(fraction) WITHIN GROUP (ORDER BY expression)"""
+    function = 'percentile_cont'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction: float, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def _latency_aggregates():
+    return {
+        'photos': Count('id'),
+        'successes': Count('id', filter=Q(success=True)),
+        'corrected': Count('id', filter=Q(user_corrected=True)),
+        'mean_ms': Avg('processing_time_ms'),
+        'p50_ms': PercentileCont('processing_time_ms', 0.5),
+        'p95_ms': PercentileCont('processing_time_ms', 0.95),
+        'p99_ms': PercentileCont('processing_time_ms', 0.99),
+        'ocr_calls': Avg('ocr_calls'),
+    }
+
+
+def _with_rates(row: dict) -> dict:
+    row['success_rate'] = row['successes'] / row['photos'] if row['photos'] else 0
+    # Share of plates read from the photo that the user had to fix
+    row['correction_rate'] = row['corrected'] / row['successes'] if row['successes'] else 0
+    return row
+
+
+def extraction_report(days: int = 7) -> dict:
+    """Latency percentiles and success rates of photo OCR over the last `days` days"""
+    logs = OCRExtractionLog.objects.filter(
+        input_method='photo', created_at__gte=timezone.now() - timedelta(days=days)
+    )
+    aggregates = _latency_aggregates()
+    return {
+        'days': days,
+        'overall': _with_rates(logs.aggregate(**aggregates)),
+        'by_engine': [_with_rates(row) for row in
+                      logs.values('engine_used').annotate(**aggregates).order_by('-photos')],
+        'by_format': [_with_rates(row) for row in
+                      logs.filter(success=True).values('plate_format').annotate(**aggregates).order_by('-photos')],
+        'stages': logs.aggregate(**{
+            stage: Avg(Cast(KT(f'timings__{stage}'), FloatField())) for stage in REPORT_STAGES
+        }),
+    }
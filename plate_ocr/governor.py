@@ -0,0 +1,123 @@
+"""
+CPU concurrency control for OCR.
+
+EasyOCR (torch) and OpenCV each start one thread per core by default, so a
+few photos read at once in one process oversubscribe the CPU and every
+photo slows down. The OCRGovernor lets OCR_CONCURRENCY photos through
+OCREngine.extract_plate at a time per process. Up to OCR_QUEUE_SIZE more
+wait, for at most OCR_QUEUE_TIMEOUT seconds. Anything beyond that is turned
+away at once (OCRBusy), and the views answer "try manual entry" / HTTP 429.
+Thread counts for torch and OpenCV are set with TORCH_THREADS and
+OPENCV_THREADS.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import cv2
+
+
+class OCRBusy(Exception):
+    """No OCR slot: the wait queue is full or the wait timed out"""
+
+
+class OCRGovernor:
+    """Per-process limit on concurrent OCR runs with a bounded wait queue"""
+
+    def __init__(self, max_concurrent: int, max_waiting: int = 0, timeout: Optional[float] = None):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        # Counters since start, see stats()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.peak_waiting = 0
+
+    @contextmanager
+    def slot(self, timings: Optional[Dict[str, float]] = None):
+        """
+        Hold one OCR slot for the block; raises OCRBusy when none can be had.
+        The wait, admitted or not, is added to timings['queue'] in ms.
+        """
+        started = time.perf_counter()
+        try:
+            with self._condition:
+                if self.running >= self.max_concurrent:
+                    if self.waiting >= self.max_waiting:
+                        self.rejected += 1
+                        raise OCRBusy(f"OCR queue full ({self.waiting} waiting)")
+                    self.waiting += 1
+                    self.peak_waiting = max(self.peak_waiting, self.waiting)
+                    try:
+                        admitted = self._condition.wait_for(lambda: self.running < self.max_concurrent, self.timeout)
+                    finally:
+                        self.waiting -= 1
+                    if not admitted:
+                        self.timed_out += 1
+                        raise OCRBusy(f"No OCR slot within {self.timeout}s")
+                self.running += 1
+                self.admitted += 1
+                wait_ms = (time.perf_counter() - started) * 1000
+                self.wait_ms_total += wait_ms
+                self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        finally:
+            if timings is not None:
+                timings['queue'] = timings.get('queue', 0.0) + (time.perf_counter() - started) * 1000
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.running -= 1
+                self._condition.notify()
+
+    def stats(self) -> Dict:
+        """Current queue depth and wait times, for the metrics endpoint"""
+        with self._condition:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_waiting': self.max_waiting,
+                'running': self.running,
+                'waiting': self.waiting,
+                'peak_waiting': self.peak_waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'wait_ms_mean': round(self.wait_ms_total / self.admitted, 2) if self.admitted else 0.0,
+                'wait_ms_max': round(self.wait_ms_max, 2),
+            }
+
+
+_governor_instance = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> Optional[OCRGovernor]:
+    """This process's OCRGovernor from PLATE_OCR settings; None when OCR_CONCURRENCY is None"""
+    global _governor_instance
+    from .conf import ocr_setting
+    if ocr_setting('OCR_CONCURRENCY') is None:
+        return None
+    with _governor_lock:
+        if _governor_instance is None:
+            _governor_instance = OCRGovernor(
+                ocr_setting('OCR_CONCURRENCY'),
+                max_waiting=ocr_setting('OCR_QUEUE_SIZE'),
+                timeout=ocr_setting('OCR_QUEUE_TIMEOUT'),
+            )
+    return _governor_instance
+
+
+def limit_opencv_threads():
+    """Apply OPENCV_THREADS (process-wide); torch's count is set when EasyOCR loads"""
+    from .conf import ocr_setting
+    threads = ocr_setting('OPENCV_THREADS')
+    if threads is not None:
+        cv2.setNumThreads(threads)
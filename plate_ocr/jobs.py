@@ -0,0 +1,80 @@
+"""
+Asynchronous OCR jobs.
+
+A photo upload creates an OCRJob and returns its id straight away; the OCR
+itself runs in the run_ocr_job Celery task on the dedicated "ocr" queue.
+Clients either poll the job status endpoint or listen on the job's
+WebSocket (see consumers.OCRJobConsumer), which is told about every status
+change through the channel layer group returned by job_group().
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .models import OCRJob
+from .ocr_engine import PlateResult
+
+logger = logging.getLogger(__name__)
+
+
+def job_group(job_id) -> str:
+    return f"ocr_job_{job_id}"
+
+
+def job_payload(job: OCRJob) -> dict:
+    """JSON shape of a job for the status endpoint and WebSocket"""
+    result = PlateResult.from_dict(job.result) if job.result else None
+    return {
+        'job_id': str(job.id),
+        'status': job.status,
+        'success': result.is_valid if result else False,
+        'result': job.result,
+        'error': job.error or (result.error if result else None),
+    }
+
+
+def submit_job(photo, user=None, session_key='', quota_lease=None) -> OCRJob:
+    """
+    Store the uploaded photo and queue it for OCR once the transaction commits.
+    quota_lease is the request's QuotaLease (see quotas.py): the job takes
+    its in-flight slot over when it is queued and releases it when it
+    finishes. Until then the slot stays the caller's to release, so a
+    rollback or a failure to queue cannot leak it.
+    """
+    from .tasks import run_ocr_job
+
+    job = OCRJob.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        session_key=session_key or '',
+        image=photo,
+    )
+
+    def enqueue():
+        quota_client = quota_lease.detach() if quota_lease is not None else ''
+        if not quota_client:
+            run_ocr_job.delay(str(job.id))
+            return
+        try:
+            run_ocr_job.delay(str(job.id), quota_client=quota_client)
+        except Exception:
+            quota_lease.quota.release(quota_client)
+            raise
+
+    transaction.on_commit(enqueue)
+    return job
+
+
+def notify_job(job: OCRJob):
+    """Push the job's current state to anyone listening on its WebSocket"""
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            job_group(job.id), {'type': 'ocr.job', 'job': job_payload(job)}
+        )
+    except Exception as e:
+        # Clients can still poll the status endpoint
+        logger.warning(f"Could not notify OCR job {job.id}: {e}")
@@ -0,0 +1,260 @@
+"""
+Known-plate snapping.
+
+A plate OCR misreads by one commonly confused character (UAQ 77AK for
+UA 077AK) can fail PlateValidator when the correction pairs don't apply
+at that position, and the photo then yields no plate. Substituting
+characters OCR commonly confuses (the UgandaPlatePatterns correction
+pairs, O/0, B/8, ...) costs CONFUSION_COST, half an edit, so
+plate_distance('UAQ77AK', 'UA077AK') is 0.5.
+
+Plates already registered as MotorCars are held in a PlateIndex, keyed by
+their deletion neighbourhood: the plate with each confusion pair folded to
+one character, and every string left by deleting up to max_edits
+characters from it. Two plates within max_edits edits share one of those
+strings, so a lookup is a handful of dict probes followed by plate_distance
+on the few plates they turn up, however many plates are registered.
+
+OCREngine snaps such an invalid read to the one known plate within
+CONFUSION_COST and raises its confidence by KNOWN_PLATE_BOOST. A read that
+passes PlateValidator is never snapped: a plate one ordinary edit from a
+registered one is as likely a car not registered yet.
+
+The index is built on a background thread (or during OCR warm-up, see
+warmup.py) and swapped in whole, so a read never waits for it: until the
+first build finishes nothing is snapped. It grows as MotorCars are saved
+in this process (signals.py) and is rebuilt every KNOWN_PLATES_REFRESH
+seconds to pick up the rest, while lookups keep using the previous one.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from django.db import connection
+
+from .ocr_engine import UgandaPlatePatterns
+
+logger = logging.getLogger(__name__)
+
+# Substitution cost of a pair OCR often confuses; any other edit costs 1
+CONFUSION_COST = 0.5
+
+CONFUSION_PAIRS = frozenset(
+    frozenset((a, b))
+    for corrections in (UgandaPlatePatterns.OCR_CORRECTIONS, UgandaPlatePatterns.DIGIT_CORRECTIONS)
+    for a, b in corrections.items()
+    if a.isalnum() and b.isalnum()
+)
+
+
+def _confusion_classes() -> Dict[str, str]:
+    """Map every character of a confusion pair to one representative of all the characters it is confused with"""
+    classes: Dict[str, Set[str]] = {}
+    for pair in CONFUSION_PAIRS:
+        merged = set(pair).union(*(classes.get(char, ()) for char in pair))
+        for char in merged:
+            classes[char] = merged
+    return {char: min(members) for char, members in classes.items()}
+
+
+# str.translate table folding each confusion class to its representative
+FOLD = str.maketrans(_confusion_classes())
+
+
+def plate_key(plate: str) -> str:
+    return plate.replace(' ', '').upper()
+
+
+def plate_distance(a: str, b: str) -> float:
+    """Edit distance between two space-free plates, confusion pair substitutions costing CONFUSION_COST"""
+    # Plates being compared mostly differ in a character or two: only align the part that differs
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        return float(len(a) + len(b))
+
+    previous = [float(j) for j in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        current = [float(i)]
+        for j, char_b in enumerate(b, 1):
+            if char_a == char_b:
+                substitution = 0.0
+            elif frozenset((char_a, char_b)) in CONFUSION_PAIRS:
+                substitution = CONFUSION_COST
+            else:
+                substitution = 1.0
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + substitution))
+        previous = current
+    return previous[-1]
+
+
+class PlateIndex:
+    """
+    Space-free plates by deletion neighbourhood, for finding every plate
+    within a plate_distance of less than max_edits + 1.
+
+    Folding confusion pairs makes them free and leaves every other edit at
+    1, so two plates within distance d are within floor(d) edits once
+    folded, and then share a string of their neighbourhoods.
+    """
+
+    def __init__(self, max_edits: int = 1):
+        self.max_edits = max_edits
+        # Space-free key -> plate as registered
+        self.plates: Dict[str, str] = {}
+        # Neighbourhood string -> key, or a tuple of keys when several plates share it
+        self._neighbours: Dict[str, Union[str, Tuple[str, ...]]] = {}
+
+    def __len__(self):
+        return len(self.plates)
+
+    def _neighbourhood(self, key: str) -> Set[str]:
+        folded = key.translate(FOLD)
+        strings, frontier = {folded}, {folded}
+        for _ in range(self.max_edits):
+            frontier = {string[:i] + string[i + 1:] for string in frontier for i in range(len(string))}
+            strings |= frontier
+        return strings
+
+    def add(self, plate: str) -> bool:
+        """Insert a plate; False if it is already in the index"""
+        key = plate_key(plate)
+        if key in self.plates:
+            return False
+        for string in self._neighbourhood(key):
+            held = self._neighbours.get(string)
+            if held is None:
+                self._neighbours[string] = key
+            elif isinstance(held, str):
+                self._neighbours[string] = (held, key)
+            else:
+                self._neighbours[string] = held + (key,)
+        self.plates[key] = plate
+        return True
+
+    def search(self, key: str, max_distance: float) -> List[Tuple[float, str]]:
+        """(distance, key) for every plate within max_distance of a space-free plate, closest first"""
+        if int(max_distance) > self.max_edits:
+            raise ValueError(f"The index only finds plates less than {self.max_edits + 1} edits away")
+        candidates = set()
+        for string in self._neighbourhood(key):
+            held = self._neighbours.get(string)
+            if isinstance(held, str):
+                candidates.add(held)
+            elif held is not None:
+                candidates.update(held)
+        found = []
+        for candidate in candidates:
+            distance = plate_distance(key, candidate)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+        return sorted(found)
+
+
+class KnownPlates:
+    """The registered MotorCar plates, as a PlateIndex built on first use"""
+
+    def __init__(self, max_distance: float = CONFUSION_COST, refresh: Optional[float] = None,
+                 background: bool = True):
+        # Largest plate_distance nearest() is asked for
+        self.max_distance = max_distance
+        # Seconds after which the index is rebuilt from the database (None = never)
+        self.refresh = refresh
+        # Build on a background thread; False builds in the first lookup instead (tests)
+        self.background = background
+        self._lock = threading.Lock()
+        # Held for a whole build, so two builds don't run at once
+        self._load_lock = threading.Lock()
+        self._index: Optional[PlateIndex] = None
+        self._loaded_at = 0.0
+        self._loading = False
+        # Plates added while a build runs, replayed into the new index before it is swapped in
+        self._added: Optional[List[str]] = None
+
+    def _read_plates(self) -> Iterable[str]:
+        from rating.models import MotorCar
+        return MotorCar.objects.values_list('motor_car_number', flat=True).iterator(chunk_size=2000)
+
+    def load(self):
+        """Build a new index from the database and swap it in"""
+        with self._load_lock:
+            with self._lock:
+                self._added = []
+            started = time.perf_counter()
+            index = PlateIndex(max_edits=int(self.max_distance))
+            try:
+                for plate in self._read_plates():
+                    index.add(plate)
+            except Exception as e:
+                # Snapping is an extra; OCR goes on with what it had until the next refresh
+                logger.warning(f"Could not load known plates: {e}")
+                index = self._index or PlateIndex(max_edits=int(self.max_distance))
+            with self._lock:
+                for plate in self._added:
+                    index.add(plate)
+                self._added = None
+                self._index, self._loaded_at = index, time.monotonic()
+        logger.info(f"Loaded {len(index)} known plates in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def _load_in_background(self):
+        try:
+            self.load()
+        finally:
+            self._loading = False
+            # Don't hold a database connection open for the thread's sake
+            connection.close()
+
+    def _current(self) -> Optional[PlateIndex]:
+        index = self._index
+        if index is not None and (self.refresh is None or time.monotonic() - self._loaded_at <= self.refresh):
+            return index
+        if not self.background:
+            self.load()
+            return self._index
+        with self._lock:
+            if self._loading:
+                return index
+            self._loading = True
+        threading.Thread(target=self._load_in_background, name='ocr-known-plates', daemon=True).start()
+        return index
+
+    def add(self, plate: str):
+        """Add a newly registered plate; before the first build there is nothing to add it to"""
+        with self._lock:
+            if self._index is not None:
+                self._index.add(plate)
+            if self._added is not None:
+                self._added.append(plate)
+
+    def nearest(self, plate: str, max_distance: Optional[float] = None) -> Optional[str]:
+        """The known plate closest to `plate` within max_distance, None if there is none, a tie or no index yet"""
+        index = self._current()
+        if index is None:
+            return None
+        if max_distance is None:
+            max_distance = self.max_distance
+        matches = index.search(plate_key(plate), max_distance)
+        if not matches or (len(matches) > 1 and matches[1][0] == matches[0][0]):
+            return None
+        return index.plates.get(matches[0][1])
+
+
+_known_plates_instance = None
+
+
+def get_known_plates() -> Optional[KnownPlates]:
+    """The process's KnownPlates from PLATE_OCR settings; None when KNOWN_PLATES is off"""
+    global _known_plates_instance
+    from .conf import ocr_setting
+    if not ocr_setting('KNOWN_PLATES'):
+        return None
+    if _known_plates_instance is None:
+        _known_plates_instance = KnownPlates(refresh=ocr_setting('KNOWN_PLATES_REFRESH'))
+    return _known_plates_instance
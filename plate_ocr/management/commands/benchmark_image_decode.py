@@ -0,0 +1,74 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from plate_ocr.conf import ocr_setting
+from plate_ocr.decoding import decode_image
+
+
+def full_decode(path):
+    """The previous upload path: whole file into bytes, then a full-resolution decode"""
+    with open(path, 'rb') as f:
+        image_bytes = f.read()
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def synthetic_jpeg(path, megapixels, rng):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    texture = (rng.random((height // 10, width // 10, 3)) * 255).astype(np.uint8)
+    image = cv2.resize(texture, (width, height), interpolation=cv2.INTER_CUBIC)
+    cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory and time of the full-resolution upload decode with the header-first reduced decode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('images', nargs='*', help='JPEG/PNG files (default: synthetic 12 MP and 48 MP JPEGs)')
+        parser.add_argument('--target-edge', type=int, default=ocr_setting('DECODE_TARGET_EDGE'))
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per image; the fastest is reported')
+
+    @staticmethod
+    def _measure(fn, repeat):
+        """(peak traced MB, best ms); numpy/OpenCV arrays are traced by tracemalloc"""
+        best = float('inf')
+        for _ in range(max(repeat, 1)):
+            tracemalloc.start()
+            started = time.perf_counter()
+            image = fn()
+            best = min(best, (time.perf_counter() - started) * 1000)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del image
+        return peak / (1024 * 1024), best
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            images = options['images']
+            if not images:
+                rng = np.random.default_rng(0)
+                for megapixels in (12, 48):
+                    path = os.path.join(tmp, f'{megapixels}mp.jpg')
+                    synthetic_jpeg(path, megapixels, rng)
+                    images.append(path)
+
+            target_edge = options['target_edge']
+            self.stdout.write(f"{'image':<24}{'full MB':>10}{'full ms':>10}{'new MB':>10}{'new ms':>10}  decoded size")
+            for path in images:
+                full_mb, full_ms = self._measure(lambda: full_decode(path), options['repeat'])
+
+                def reduced():
+                    with open(path, 'rb') as f:
+                        return decode_image(f, target_edge=target_edge)
+                new_mb, new_ms = self._measure(reduced, options['repeat'])
+                height, width = reduced().shape[:2]
+                self.stdout.write(
+                    f"{os.path.basename(path)[:23]:<24}{full_mb:>10.1f}{full_ms:>10.1f}"
+                    f"{new_mb:>10.1f}{new_ms:>10.1f}  {width}x{height}"
+                )
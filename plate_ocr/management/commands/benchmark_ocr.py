@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from plate_ocr.backends import BACKENDS
+from plate_ocr.benchmark import load_labels, run_benchmark
+from plate_ocr.conf import ocr_setting
+
+
+class Command(BaseCommand):
+    help = ('Measure OCR accuracy and latency over a folder of photos with a labels.csv/labels.json '
+            '(filename -> expected plate)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('image_dir', help='Folder of labeled photos')
+        parser.add_argument('--labels', help='Labels file (default: labels.csv or labels.json in image_dir)')
+        parser.add_argument('--backends', default=','.join(ocr_setting('BACKENDS')),
+                            help=f"Comma-separated OCR backends, preferred first ({', '.join(BACKENDS)}; "
+                                 f"default: PLATE_OCR['BACKENDS'])")
+        parser.add_argument('--cascade', dest='cascade', action='store_true', default=ocr_setting('CASCADE'),
+                            help='Stop at the first good plate (default: PLATE_OCR["CASCADE"])')
+        parser.add_argument('--exhaustive', dest='cascade', action='store_false',
+                            help='Try every region/variant/engine combination')
+        parser.add_argument('--min-confidence', type=float, default=ocr_setting('CASCADE_MIN_CONFIDENCE'))
+        parser.add_argument('--max-ocr-calls', type=int, default=ocr_setting('MAX_OCR_CALLS'))
+        parser.add_argument('--max-ocr-ms', type=float, default=ocr_setting('MAX_OCR_MS'))
+        parser.add_argument('--detect-max-edge', type=int, default=ocr_setting('DETECT_MAX_EDGE'))
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes, each with its own engine (default: 1)')
+        parser.add_argument('--limit', type=int, help='Only use the first N labeled images')
+        parser.add_argument('--json', dest='json_path', help='Write the full report to this file')
+
+    def handle(self, *args, **options):
+        image_dir = Path(options['image_dir'])
+        if not image_dir.is_dir():
+            raise CommandError(f"{image_dir} is not a directory")
+        backends = [name.strip() for name in options['backends'].split(',') if name.strip()]
+        unknown = set(backends) - set(BACKENDS)
+        if unknown:
+            raise CommandError(f"Unknown backends: {', '.join(sorted(unknown))}")
+
+        try:
+            labels = load_labels(image_dir, Path(options['labels']) if options['labels'] else None)
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+
+        engine_options = {
+            'backends': backends,
+            'cascade': options['cascade'],
+            'min_confidence': options['min_confidence'],
+            'max_ocr_calls': options['max_ocr_calls'],
+            'max_ocr_ms': options['max_ocr_ms'],
+            'detect_max_edge': options['detect_max_edge'],
+            'region_max_edge': ocr_setting('REGION_MAX_EDGE'),
+        }
+        report = run_benchmark(image_dir, labels, engine_options,
+                               workers=max(options['workers'], 1), limit=options['limit'])
+        summary = report['summary']
+
+        if report['missing_files']:
+            self.stdout.write(self.style.WARNING(f"{len(report['missing_files'])} labeled files not found"))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{summary['images']} images, {summary['correct']} correct ({summary['accuracy']:.1%})"
+        ))
+        for fmt, stats in summary['per_format'].items():
+            self.stdout.write(f"  {fmt:<12}{stats['correct']:>5}/{stats['images']:<5} {stats['accuracy']:.1%}")
+        latency = summary['latency_ms']
+        self.stdout.write(
+            f"Latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}"
+        )
+        self.stdout.write(f"OCR calls per image: {summary['ocr_calls_per_image']}")
+        self.stdout.write("Stage ms per image: " + ', '.join(
+            f"{stage} {ms}" for stage, ms in summary['stage_ms_per_image'].items()
+        ))
+        self.stdout.write(
+            f"Throughput: {summary['images_per_s']} images/s; peak RSS {summary['peak_rss_mb']['self']} MB "
+            f"(workers {summary['peak_rss_mb']['workers']} MB)"
+        )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['json_path']}"))
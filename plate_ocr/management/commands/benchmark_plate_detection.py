@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import cv2
+from django.core.management.base import BaseCommand, CommandError
+
+from plate_ocr.conf import ocr_setting
+from plate_ocr.ocr_engine import ImagePreprocessor
+
+SAMPLE_IMAGE = Path(__file__).resolve().parents[2] / 'plate_image.jpg'
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+# Phone camera resolutions the sample photo is upscaled to
+SYNTHETIC_SIZES = {'12MP': (4032, 3024), '48MP': (8064, 6048)}
+
+
+class Command(BaseCommand):
+    help = ('Time plate detection stages at full resolution and on a downscaled working copy '
+            '(PLATE_OCR["DETECT_MAX_EDGE"])')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Images or folders of images (default: plate_ocr/plate_image.jpg)')
+        parser.add_argument('--max-edge', type=int, default=ocr_setting('DETECT_MAX_EDGE') or 1280,
+                            help='Long edge of the detection copy (default: PLATE_OCR["DETECT_MAX_EDGE"])')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per image and mode; the fastest is reported (default: 3)')
+        parser.add_argument('--no-synthetic', action='store_true',
+                            help='Skip the 12MP/48MP upscaled copies of the sample photo')
+
+    def _images(self, options):
+        paths = [Path(p) for p in options['paths']] or [SAMPLE_IMAGE]
+        images = []
+        for path in paths:
+            files = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES) \
+                if path.is_dir() else [path]
+            for file in files:
+                image = cv2.imread(str(file))
+                if image is None:
+                    raise CommandError(f"Could not read image {file}")
+                images.append((file.name, image))
+
+        if not options['no_synthetic']:
+            sample = cv2.imread(str(SAMPLE_IMAGE))
+            for label, size in SYNTHETIC_SIZES.items():
+                images.append((f"{SAMPLE_IMAGE.name} @ {label}", cv2.resize(sample, size, interpolation=cv2.INTER_CUBIC)))
+        return images
+
+    def _run(self, image, max_edge, repeat):
+        """Fastest of `repeat` runs: (stage timings, total ms, boxes)"""
+        best = None
+        for _ in range(repeat):
+            timings = {}
+            regions = ImagePreprocessor.detect_plate_region(image, max_edge=max_edge, timings=timings)
+            total = sum(timings.values())
+            if best is None or total < best[1]:
+                best = (timings, total, [bbox for _, bbox in regions])
+        return best
+
+    def handle(self, *args, **options):
+        max_edge, repeat = options['max_edge'], max(options['repeat'], 1)
+        for name, image in self._images(options):
+            height, width = image.shape[:2]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({width}x{height})"))
+
+            before = self._run(image, None, repeat)
+            after = self._run(image, max_edge, repeat)
+            stages = list(dict.fromkeys([*before[0], *after[0]]))
+
+            self.stdout.write(f"  {'stage':<14}{'full res':>12}{f'max {max_edge}px':>14}")
+            for stage in stages:
+                self.stdout.write(
+                    f"  {stage:<14}{before[0].get(stage, 0):>10.1f}ms{after[0].get(stage, 0):>12.1f}ms"
+                )
+            speedup = before[1] / after[1] if after[1] else float('inf')
+            self.stdout.write(f"  {'total':<14}{before[1]:>10.1f}ms{after[1]:>12.1f}ms   ({speedup:.1f}x)")
+            self.stdout.write(f"  regions: {before[2]} -> {after[2]}")
@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from plate_ocr.ocr_engine import ImagePreprocessor
+
+
+def python_nms(boxes, limit=5, max_overlap=0.5):
+    """The previous pure-Python overlap loop, kept as the reference implementation"""
+    boxes = sorted(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+    kept = []
+    for x1, y1, x2, y2 in boxes:
+        current_area = (x2 - x1) * (y2 - y1)
+        for ex1, ey1, ex2, ey2 in kept:
+            overlap_x = max(0, min(x2, ex2) - max(x1, ex1))
+            overlap_y = max(0, min(y2, ey2) - max(y1, ey1))
+            if current_area > 0 and overlap_x * overlap_y / current_area > max_overlap:
+                break
+        else:
+            kept.append((x1, y1, x2, y2))
+    return kept[:limit]
+
+
+def synthetic_boxes(count, rng, width=4000, height=3000):
+    """Plate-shaped boxes, many of them clustered like colour-mask hits on a busy scene"""
+    centres = rng.uniform((0, 0), (width, height), size=(max(count // 20, 1), 2))
+    cx, cy = (centres[rng.integers(0, len(centres), count)] + rng.normal(0, 40, (count, 2))).T
+    w = rng.uniform(60, 600, count)
+    h = w / rng.uniform(1.5, 6.0, count)
+    boxes = np.column_stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+    return np.clip(boxes, 0, (width, height, width, height)).astype(np.int64)
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark plate region overlap suppression: NumPy vs the old Python loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500, 1000, 5000],
+                            help='Candidate box counts to test (default: 10 100 500 1000 5000)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per size; the fastest is reported (default: 5)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    @staticmethod
+    def _best_ms(fn, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, (time.perf_counter() - started) * 1000)
+        return best
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        repeat = max(options['repeat'], 1)
+
+        self.stdout.write(f"{'boxes':>7}{'python':>12}{'numpy':>12}{'speedup':>10}  same result")
+        for size in options['sizes']:
+            boxes = synthetic_boxes(size, rng)
+            as_tuples = [tuple(box) for box in boxes.tolist()]
+
+            python_ms = self._best_ms(lambda: python_nms(as_tuples), repeat)
+            numpy_ms = self._best_ms(lambda: ImagePreprocessor._suppress_overlaps(boxes), repeat)
+
+            expected = python_nms(as_tuples)
+            actual = [tuple(box) for box in boxes[ImagePreprocessor._suppress_overlaps(boxes)].tolist()]
+            same = self.style.SUCCESS('yes') if actual == expected else self.style.ERROR('NO')
+            self.stdout.write(
+                f"{size:>7}{python_ms:>10.3f}ms{numpy_ms:>10.3f}ms{python_ms / numpy_ms:>9.1f}x  {same}"
+            )
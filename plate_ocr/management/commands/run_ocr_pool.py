@@ -0,0 +1,30 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from plate_ocr.conf import ocr_setting
+from plate_ocr.pool import OCRPoolServer
+
+
+class Command(BaseCommand):
+    help = ('Run the shared OCR process pool: prewarmed OCR processes that web workers '
+            'send photos to when PLATE_OCR["POOL_ENABLED"] is set')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=ocr_setting('POOL_SIZE'),
+                            help='Number of OCR processes (default: PLATE_OCR["POOL_SIZE"])')
+        parser.add_argument('--timeout', type=float, default=ocr_setting('POOL_TIMEOUT'),
+                            help='Seconds allowed per photo (default: PLATE_OCR["POOL_TIMEOUT"])')
+
+    def handle(self, *args, **options):
+        server = OCRPoolServer(size=options['size'], timeout=options['timeout'])
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"OCR pool of {server.size} processes listening on {server.address}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+        self.stdout.write("OCR pool stopped.")
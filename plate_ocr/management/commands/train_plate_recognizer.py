@@ -0,0 +1,124 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from plate_ocr.conf import ocr_setting
+from plate_ocr.plate_recognizer import (
+    ALPHABET, CHAR_SIZE, PlateCharRecognizer, random_plate_text, render_plate, training_samples,
+)
+
+
+def build_network(torch):
+    """Small CNN for one CHAR_SIZE character: ~170k parameters"""
+    nn = torch.nn
+    width, height = CHAR_SIZE
+    return nn.Sequential(
+        nn.Conv2d(1, 16, 3, padding=1), nn.ReLU(), nn.MaxPool2d(2),
+        nn.Conv2d(16, 32, 3, padding=1), nn.ReLU(), nn.MaxPool2d(2),
+        nn.Flatten(),
+        nn.Linear(32 * (height // 4) * (width // 4), 128), nn.ReLU(), nn.Dropout(0.2),
+        nn.Linear(128, len(ALPHABET)),
+    )
+
+
+class Command(BaseCommand):
+    help = ('Train the plate character recognizer (PLATE_OCR backend "platechar") on synthetic '
+            'plates and export it as ONNX. Needs torch; inference only needs OpenCV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--font', help='TTF/OTF of the plate font (default: OpenCV Hershey font)')
+        parser.add_argument('--font-size', type=int, default=90)
+        parser.add_argument('--plates', type=int, default=20000, help='Synthetic plates to render (default: 20000)')
+        parser.add_argument('--epochs', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--validation', type=float, default=0.1,
+                            help='Share of characters held out for validation (default: 0.1)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default=ocr_setting('PLATE_CHAR_MODEL'),
+                            help="ONNX file to write (default: PLATE_OCR['PLATE_CHAR_MODEL'])")
+
+    def handle(self, *args, **options):
+        try:
+            import torch
+        except ImportError:
+            raise CommandError("Training needs torch (pip install torch)")
+
+        font = None
+        if options['font']:
+            from PIL import ImageFont
+            font = ImageFont.truetype(options['font'], options['font_size'])
+        else:
+            self.stdout.write(self.style.WARNING(
+                "No --font given: rendering with OpenCV's Hershey font, use the plate font for real photos"
+            ))
+
+        rng = np.random.default_rng(options['seed'])
+        torch.manual_seed(options['seed'])
+
+        started = time.perf_counter()
+        images, labels = training_samples(options['plates'], rng, font)
+        if not len(images):
+            raise CommandError("No characters could be segmented from the rendered plates")
+        self.stdout.write(f"{len(images)} characters from {options['plates']} plates "
+                          f"in {time.perf_counter() - started:.0f}s")
+
+        order = rng.permutation(len(images))
+        held_out = int(len(images) * options['validation'])
+        val_idx, train_idx = order[:held_out], order[held_out:]
+        inputs = torch.from_numpy(images[:, None].astype(np.float32) / 255.0)
+        targets = torch.from_numpy(labels)
+
+        model = build_network(torch)
+        optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+        loss_fn = torch.nn.CrossEntropyLoss()
+        for epoch in range(options['epochs']):
+            model.train()
+            total = 0.0
+            for batch in torch.from_numpy(rng.permutation(train_idx)).split(options['batch_size']):
+                optimizer.zero_grad()
+                loss = loss_fn(model(inputs[batch]), targets[batch])
+                loss.backward()
+                optimizer.step()
+                total += loss.item() * len(batch)
+            accuracy = self._accuracy(torch, model, inputs[val_idx], targets[val_idx])
+            self.stdout.write(f"epoch {epoch + 1}: loss {total / len(train_idx):.4f}, "
+                              f"validation accuracy {accuracy:.2%}")
+
+        model.eval()
+        os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+        width, height = CHAR_SIZE
+        torch.onnx.export(
+            model, torch.zeros(1, 1, height, width), options['output'],
+            input_names=['chars'], output_names=['logits'],
+            dynamic_axes={'chars': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=11,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Model written to {options['output']}"))
+        self._check_export(options['output'], images[val_idx], labels[val_idx], rng, font)
+
+    @staticmethod
+    def _accuracy(torch, model, inputs, targets):
+        model.eval()
+        with torch.no_grad():
+            return (model(inputs).argmax(dim=1) == targets).float().mean().item() if len(targets) else 0.0
+
+    def _check_export(self, model_path, images, labels, rng, font):
+        """Run the exported model the way the backend does: OpenCV DNN, whole plates"""
+        recognizer = PlateCharRecognizer(model_path)
+        if len(images):
+            chars, _ = recognizer.classify(images)
+            accuracy = np.mean(np.array([ALPHABET.index(char) for char in chars]) == labels)
+            self.stdout.write(f"OpenCV DNN character accuracy: {accuracy:.2%}")
+
+        plates, correct, elapsed = 200, 0, 0.0
+        for _ in range(plates):
+            text = random_plate_text(rng)
+            image = render_plate(text, rng, font)
+            started = time.perf_counter()
+            reading = recognizer.read(image)
+            elapsed += time.perf_counter() - started
+            correct += reading is not None and reading[0].split() == text.replace(' ', '').split()
+        self.stdout.write(f"Synthetic plates read correctly: {correct}/{plates}, "
+                          f"{elapsed / plates * 1000:.1f} ms per plate")
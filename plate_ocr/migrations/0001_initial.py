@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-19 01:47
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OCRExtractionLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('extracted_plate', models.CharField(blank=True, max_length=20)),
+                ('formatted_plate', models.CharField(blank=True, max_length=20)),
+                ('confidence', models.FloatField(default=0.0)),
+                ('plate_format', models.CharField(blank=True, max_length=20)),
+                ('success', models.BooleanField(default=False)),
+                ('user_corrected', models.BooleanField(default=False)),
+                ('corrected_plate', models.CharField(blank=True, max_length=20)),
+                ('input_method', models.CharField(choices=[('photo', 'Photo'), ('text', 'Text'), ('voice', 'Voice')], default='photo', max_length=20)),
+                ('raw_detections', models.JSONField(blank=True, default=list)),
+                ('engine_used', models.CharField(blank=True, max_length=50)),
+                ('processing_time_ms', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.TextField(blank=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'OCR Extraction Log',
+                'verbose_name_plural': 'OCR Extraction Logs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OCRJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('session_key', models.CharField(blank=True, max_length=40)),
+                ('image', models.FileField(blank=True, upload_to='ocr_jobs/%Y/%m/')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'OCR Job',
+                'verbose_name_plural': 'OCR Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
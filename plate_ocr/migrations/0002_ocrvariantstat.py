@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plate_ocr', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OCRVariantStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variant', models.CharField(max_length=20, unique=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('successes', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'OCR Variant Statistic',
+                'verbose_name_plural': 'OCR Variant Statistics',
+                'ordering': ['variant'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plate_ocr', '0002_ocrvariantstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrextractionlog',
+            name='ocr_calls',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ocrextractionlog',
+            name='ref',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ocrextractionlog',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plate_ocr', '0003_extraction_log_timings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ocrextractionlog',
+            name='input_method',
+            field=models.CharField(choices=[('photo', 'Photo'), ('burst', 'Burst/video'), ('text', 'Text'), ('voice', 'Voice')], default='photo', max_length=20),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 
@@ -30,6 +32,7 @@ class OCRExtractionLog(models.Model):
         max_length=20,
         choices=[
             ('photo', 'Photo'),
+            ('burst', 'Burst/video'),
             ('text', 'Text'),
             ('voice', 'Voice'),
         ],
@@ -44,6 +47,12 @@ class OCRExtractionLog(models.Model):
 
     # Timing
     processing_time_ms = models.IntegerField(default=0)
+    # Milliseconds per stage: decode, detect, preprocess, ocr_<engine>, validate
+    timings = models.JSONField(default=dict, blank=True)
+    ocr_calls = models.IntegerField(default=0)
+
+    # Set when the row is queued, so a later correction by the user can find it
+    ref = models.UUIDField(null=True, blank=True, db_index=True, editable=False)
 
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
@@ -56,4 +65,76 @@ class OCRExtractionLog(models.Model):
         verbose_name_plural = 'OCR Extraction Logs'
 
     def __str__(self):
-        return f"{self.formatted_plate or 'Failed'} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.formatted_plate or 'Failed'} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+class OCRJob(models.Model):
+    """A photo queued for plate extraction on the OCR Celery queue"""
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    # Random id: it is handed to the browser and used in status/WebSocket URLs
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    # Owner of anonymous jobs (API uploads without a login)
+    session_key = models.CharField(max_length=40, blank=True)
+
+    # Removed once the job has been processed
+    image = models.FileField(upload_to='ocr_jobs/%Y/%m/', blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # PlateResult.to_dict() of a finished job
+    result = models.JSONField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'OCR Job'
+        verbose_name_plural = 'OCR Jobs'
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def belongs_to(self, user, session_key):
+        """True if the job was submitted by this user (or, for anonymous jobs, session)"""
+        if self.user_id is not None:
+            return user.is_authenticated and user.pk == self.user_id
+        return bool(self.session_key) and self.session_key == session_key
+
+
+class OCRVariantStat(models.Model):
+    """How often each preprocessing variant was tried and produced the accepted plate"""
+
+    variant = models.CharField(max_length=20, unique=True)
+    attempts = models.PositiveIntegerField(default=0)
+    successes = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['variant']
+        verbose_name = 'OCR Variant Statistic'
+        verbose_name_plural = 'OCR Variant Statistics'
+
+    def __str__(self):
+        return f"{self.variant}: {self.successes}/{self.attempts}"
@@ -9,15 +9,41 @@ Formats supported:
 """
 
 import re
+import threading
+import time
+from contextlib import contextmanager
 import cv2
 import numpy as np
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, List, Dict, Iterator, Sequence
 from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from .backends import OCRBackend, create_backend
+from .decoding import decode_image, upload_source
+from .governor import OCRBusy, OCRGovernor
+
 logger = logging.getLogger(__name__)
 
+# Error of a completed OCR run that found no plate (as opposed to a failure)
+NO_PLATE_ERROR = "No valid Uganda plate detected"
+
+# Error when every OCR slot is taken and the wait queue is full (see governor.py)
+OCR_BUSY_ERROR = "Plate reading is busy, please enter the plate manually"
+
+
+@contextmanager
+def stage_timer(timings: Optional[Dict[str, float]], stage: str):
+    """Add the duration of the block, in ms, to timings[stage] (no-op without timings)"""
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000
+
 
 class PlateFormat(Enum):
     LEGACY = "legacy"  # UAX 123Y - 3 letters, 3-4 digits, 1 letter
@@ -37,11 +63,58 @@ class PlateResult:
     bounding_box: Optional[Tuple[int, int, int, int]] = None
     raw_detections: Optional[List[str]] = None
     error: Optional[str] = None
+    ocr_calls: int = 0
+    # Where the accepted plate came from: OCR engine, preprocessing variant
+    # name and the region's position in the order regions were tried
+    engine: Optional[str] = None
+    variant: Optional[str] = None
+    region_rank: Optional[int] = None
+    # Milliseconds spent per stage: decode, detect, preprocess, ocr_<engine>, validate
+    timings: Optional[Dict[str, float]] = None
+    # Burst recognition (burst.py): number of frames that read each plate
+    votes: Optional[Dict[str, int]] = None
 
     @property
     def is_valid(self) -> bool:
         return self.error is None and self.confidence > 0.5
 
+    def to_dict(self) -> Dict:
+        """Plain-types form, e.g. for sending results between processes"""
+        return {
+            'plate_text': self.plate_text,
+            'formatted_plate': self.formatted_plate,
+            'confidence': self.confidence,
+            'plate_format': self.plate_format.value,
+            'bounding_box': list(self.bounding_box) if self.bounding_box else None,
+            'raw_detections': self.raw_detections,
+            'error': self.error,
+            'ocr_calls': self.ocr_calls,
+            'engine': self.engine,
+            'variant': self.variant,
+            'region_rank': self.region_rank,
+            'timings': self.timings,
+            'votes': self.votes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PlateResult':
+        data = dict(data)
+        data['plate_format'] = PlateFormat(data['plate_format'])
+        if data.get('bounding_box'):
+            data['bounding_box'] = tuple(data['bounding_box'])
+        return cls(**data)
+
+    @classmethod
+    def failed(cls, error: str) -> 'PlateResult':
+        """Empty result carrying an error message"""
+        return cls(
+            plate_text="",
+            formatted_plate="",
+            confidence=0.0,
+            plate_format=PlateFormat.UNKNOWN,
+            error=error,
+        )
+
 
 class UgandaPlatePatterns:
     """Regex patterns for Uganda number plate formats"""
@@ -75,194 +148,314 @@ class UgandaPlatePatterns:
     # Position-aware corrections (letters vs digits)
     DIGIT_CORRECTIONS = {'O': '0', 'I': '1', 'L': '1', 'S': '5', 'B': '8', 'G': '6', 'Z': '2'}
     LETTER_CORRECTIONS = {'0': 'O', '1': 'I', '5': 'S', '8': 'B', '6': 'G', '2': 'Z'}
+    DIGIT_TABLE = str.maketrans(DIGIT_CORRECTIONS)
+    LETTER_TABLE = str.maketrans(LETTER_CORRECTIONS)
+
+    # Letter/digit layout of each format as (start, stop, translate table)
+    # slices of the space-free text, e.g. UA 077AK: letters, 3 digits, letters
+    SEGMENTS = {
+        PlateFormat.LEGACY: ((0, 3, LETTER_TABLE), (3, -1, DIGIT_TABLE), (-1, None, LETTER_TABLE)),
+        PlateFormat.NEW_STANDARD: ((0, 2, LETTER_TABLE), (2, 5, DIGIT_TABLE), (5, None, LETTER_TABLE)),
+        PlateFormat.MOTORCYCLE: ((0, 3, LETTER_TABLE), (3, 6, DIGIT_TABLE), (6, None, LETTER_TABLE)),
+        PlateFormat.GOVERNMENT: ((0, 2, LETTER_TABLE), (2, None, DIGIT_TABLE)),
+    }
+
+    # All PATTERNS in one regex; the named group that matched is the format
+    # (alternatives are tried in PATTERNS order, like looping over PATTERNS)
+    COMBINED = re.compile('^(?:' + '|'.join(
+        f"(?P<{fmt.value}>{pattern.pattern[1:-1]})" for fmt, pattern in PATTERNS.items()
+    ) + ')$')
+
+    # Lengths of space-free text any pattern can match (UP6633 .. UAX1234Y)
+    PLATE_LENGTHS = range(6, 9)
 
 
 class ImagePreprocessor:
     """Image preprocessing for number plate detection"""
 
+    # Names of the preprocess_for_ocr variants, in the order they are returned
+    VARIANT_NAMES = ('clahe', 'adaptive', 'otsu', 'inverted', 'morphed', 'sharpened')
+
     @staticmethod
     def preprocess_for_ocr(image: np.ndarray) -> List[np.ndarray]:
         """
         Generate multiple preprocessed versions of the image for OCR.
         Returns list of processed images to try.
         """
-        results = []
-
-        # Convert to grayscale if needed
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image.copy()
-
-        # 1. Basic grayscale with contrast enhancement
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
-        results.append(enhanced)
-
-        # 2. Adaptive thresholding (good for varying lighting)
-        adaptive = cv2.adaptiveThreshold(
-            enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY, 11, 2
-        )
-        results.append(adaptive)
-
-        # 3. Otsu's thresholding (good for bimodal images)
-        _, otsu = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        results.append(otsu)
-
-        # 4. Inverted (for dark text on light background)
-        inverted = cv2.bitwise_not(adaptive)
-        results.append(inverted)
-
-        # 5. Morphological operations to clean up
-        kernel = np.ones((2, 2), np.uint8)
-        morphed = cv2.morphologyEx(adaptive, cv2.MORPH_CLOSE, kernel)
-        results.append(morphed)
-
-        # 6. Sharpened image
-        kernel_sharp = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
-        sharpened = cv2.filter2D(enhanced, -1, kernel_sharp)
-        results.append(sharpened)
-
-        return results
+        pipeline = PreprocessPipeline(reuse_buffers=False)
+        return [variant for _, variant in pipeline.variants(image)]
 
     @staticmethod
-    def detect_plate_region(image: np.ndarray) -> List[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+    def detect_plate_region(image: np.ndarray, max_edge: Optional[int] = None,
+                            region_max_edge: Optional[int] = None,
+                            timings: Optional[Dict[str, float]] = None,
+                            pipeline: Optional['PreprocessPipeline'] = None,
+                            ) -> List[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
         """
         Detect potential number plate regions in the image.
         Returns list of (cropped_region, bounding_box) tuples.
+
+        Detection runs on a copy downscaled so its long edge is at most
+        max_edge; boxes are mapped back and regions are cropped from the
+        original image (then shrunk to region_max_edge if larger). Stage
+        durations in ms are added to `timings` when given. When the image
+        is not downscaled, its grayscale version is kept on `pipeline` so
+        the regions' OCR variants start from it.
         """
+        height, width = image.shape[:2]
+        scale = 1.0
+        work = image
+        if max_edge and max(height, width) > max_edge:
+            scale = max_edge / max(height, width)
+            with stage_timer(timings, 'detect_resize'):
+                # Bilinear is ~10x cheaper than INTER_AREA at these sizes; the
+                # copy is only used to find boxes and gets bilateral-filtered anyway
+                work = cv2.resize(image, (round(width * scale), round(height * scale)),
+                                  interpolation=cv2.INTER_LINEAR)
+
+        gray = None
+        if work is image and pipeline is not None:
+            gray = pipeline.set_gray(image)
+        # (N, 4) array of x, y, w, h
+        boxes = ImagePreprocessor._candidate_boxes(work, timings, gray)
+        with stage_timer(timings, 'nms'):
+            # Back to original pixels; size limits and padding apply there
+            xy = np.floor(boxes[:, :2] / scale).astype(np.int64)
+            wh = np.rint(boxes[:, 2:] / scale).astype(np.int64)
+            large_enough = (wh[:, 0] > 60) & (wh[:, 1] > 20)
+            xy, wh = xy[large_enough], wh[large_enough]
+
+            # Add padding, as x1, y1, x2, y2
+            padding = 10
+            padded = np.empty((len(xy), 4), dtype=np.int64)
+            padded[:, :2] = np.maximum(xy - padding, 0)
+            padded[:, 2] = np.minimum(xy[:, 0] + wh[:, 0] + padding, width)
+            padded[:, 3] = np.minimum(xy[:, 1] + wh[:, 1] + padding, height)
+
+            # Remove duplicates based on overlap; only the survivors are cropped
+            keep = ImagePreprocessor._suppress_overlaps(padded)
+
         regions = []
+        for x1, y1, x2, y2 in padded[keep].tolist():
+            regions.append((image[y1:y2, x1:x2], (x1, y1, x2, y2)))
 
-        # Convert to grayscale
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image.copy()
+        # If no regions found, return the whole image
+        if not regions:
+            regions.append((image, (0, 0, width, height)))
+
+        if region_max_edge:
+            with stage_timer(timings, 'region_resize'):
+                regions = [
+                    (ImagePreprocessor._limit_size(region, region_max_edge), bbox)
+                    for region, bbox in regions
+                ]
+        return regions
 
-        # Apply bilateral filter to reduce noise while keeping edges sharp
-        filtered = cv2.bilateralFilter(gray, 11, 17, 17)
+    @staticmethod
+    def _candidate_boxes(image: np.ndarray, timings: Optional[Dict[str, float]] = None,
+                         gray: Optional[np.ndarray] = None) -> np.ndarray:
+        """Plate-shaped boxes found by edge and colour detection, as an (N, 4) x, y, w, h array in image pixels"""
+        boxes = []
 
-        # Edge detection
-        edges = cv2.Canny(filtered, 30, 200)
+        # Convert to grayscale (unless the caller already did)
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
 
-        # Find contours
-        contours, _ = cv2.findContours(edges.copy(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        # Apply bilateral filter to reduce noise while keeping edges sharp
+        with stage_timer(timings, 'bilateral'):
+            filtered = cv2.bilateralFilter(gray, 11, 17, 17)
 
-        # Sort by area and take top candidates
-        contours = sorted(contours, key=cv2.contourArea, reverse=True)[:30]
+        # Edge detection
+        with stage_timer(timings, 'canny'):
+            edges = cv2.Canny(filtered, 30, 200)
 
-        for contour in contours:
-            # Approximate the contour
-            peri = cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, 0.018 * peri, True)
+        with stage_timer(timings, 'contours'):
+            # Find contours
+            contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
 
-            # Look for rectangular shapes (4 corners)
-            if len(approx) >= 4 and len(approx) <= 6:
-                x, y, w, h = cv2.boundingRect(approx)
+            # Sort by area and take top candidates
+            contours = sorted(contours, key=cv2.contourArea, reverse=True)[:30]
 
-                # Check aspect ratio (plates are typically 2:1 to 5:1)
-                aspect_ratio = w / float(h) if h > 0 else 0
+            for contour in contours:
+                # Approximate the contour
+                peri = cv2.arcLength(contour, True)
+                approx = cv2.approxPolyDP(contour, 0.018 * peri, True)
 
-                if 1.5 <= aspect_ratio <= 6.0:
-                    # Check minimum size
-                    if w > 60 and h > 20:
-                        # Add padding
-                        padding = 10
-                        x1 = max(0, x - padding)
-                        y1 = max(0, y - padding)
-                        x2 = min(image.shape[1], x + w + padding)
-                        y2 = min(image.shape[0], y + h + padding)
+                # Look for rectangular shapes (4 corners)
+                if len(approx) >= 4 and len(approx) <= 6:
+                    x, y, w, h = cv2.boundingRect(approx)
 
-                        cropped = image[y1:y2, x1:x2]
-                        if cropped.size > 0:
-                            regions.append((cropped, (x1, y1, x2, y2)))
+                    # Check aspect ratio (plates are typically 2:1 to 5:1)
+                    aspect_ratio = w / float(h) if h > 0 else 0
+                    if 1.5 <= aspect_ratio <= 6.0:
+                        boxes.append((x, y, w, h))
 
         # Also try color-based detection for yellow plates
         if len(image.shape) == 3:
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-            # Yellow plate detection
-            lower_yellow = np.array([15, 80, 80])
-            upper_yellow = np.array([35, 255, 255])
-            yellow_mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
-
-            # White plate detection
-            lower_white = np.array([0, 0, 180])
-            upper_white = np.array([180, 30, 255])
-            white_mask = cv2.inRange(hsv, lower_white, upper_white)
-
-            for mask in [yellow_mask, white_mask]:
-                # Find contours in the mask
-                contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                for contour in contours:
-                    x, y, w, h = cv2.boundingRect(contour)
-                    aspect_ratio = w / float(h) if h > 0 else 0
-
-                    if 1.5 <= aspect_ratio <= 6.0 and w > 60 and h > 20:
-                        padding = 10
-                        x1 = max(0, x - padding)
-                        y1 = max(0, y - padding)
-                        x2 = min(image.shape[1], x + w + padding)
-                        y2 = min(image.shape[0], y + h + padding)
-
-                        cropped = image[y1:y2, x1:x2]
-                        if cropped.size > 0:
-                            regions.append((cropped, (x1, y1, x2, y2)))
-
-        # Remove duplicates based on overlap
-        regions = ImagePreprocessor._remove_overlapping_regions(regions)
-
-        # If no regions found, return the whole image
-        if not regions:
-            regions.append((image, (0, 0, image.shape[1], image.shape[0])))
-
-        return regions
+            with stage_timer(timings, 'color_masks'):
+                hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+                # Yellow plate detection
+                lower_yellow = np.array([15, 80, 80])
+                upper_yellow = np.array([35, 255, 255])
+                yellow_mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
+
+                # White plate detection
+                lower_white = np.array([0, 0, 180])
+                upper_white = np.array([180, 30, 255])
+                white_mask = cv2.inRange(hsv, lower_white, upper_white)
+
+                for mask in [yellow_mask, white_mask]:
+                    # Find contours in the mask
+                    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                    for contour in contours:
+                        x, y, w, h = cv2.boundingRect(contour)
+                        aspect_ratio = w / float(h) if h > 0 else 0
+                        if 1.5 <= aspect_ratio <= 6.0:
+                            boxes.append((x, y, w, h))
+
+        return np.array(boxes, dtype=np.int64).reshape(-1, 4)
 
     @staticmethod
-    def _remove_overlapping_regions(regions: List[Tuple[np.ndarray, Tuple[int, int, int, int]]]) -> List:
-        """Remove overlapping regions, keeping the larger ones"""
-        if len(regions) <= 1:
-            return regions
+    def _limit_size(image: np.ndarray, max_edge: int) -> np.ndarray:
+        """Shrink image so its long edge is at most max_edge"""
+        height, width = image.shape[:2]
+        if max(height, width) <= max_edge:
+            return image
+        scale = max_edge / max(height, width)
+        return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
 
-        # Sort by area (descending)
-        regions = sorted(regions, key=lambda r: (r[1][2] - r[1][0]) * (r[1][3] - r[1][1]), reverse=True)
+    @staticmethod
+    def _suppress_overlaps(boxes: np.ndarray, limit: int = 5, max_overlap: float = 0.5) -> np.ndarray:
+        """
+        Greedy non-maximum suppression over an (N, 4) array of x1, y1, x2, y2
+        boxes. Larger boxes win; a box is dropped when more than max_overlap of
+        its own area lies inside a kept box. Returns the indices of up to
+        `limit` kept boxes, largest first.
+        """
+        keep = []
+        if len(boxes) == 0:
+            return np.array(keep, dtype=np.intp)
+
+        x1, y1, x2, y2 = (boxes[:, i].astype(np.int64) for i in range(4))
+        areas = (x2 - x1) * (y2 - y1)
+        order = np.argsort(-areas, kind='stable')
+
+        while order.size and len(keep) < limit:
+            best, rest = order[0], order[1:]
+            keep.append(best)
+            overlap_x = np.clip(np.minimum(x2[rest], x2[best]) - np.maximum(x1[rest], x1[best]), 0, None)
+            overlap_y = np.clip(np.minimum(y2[rest], y2[best]) - np.maximum(y1[rest], y1[best]), 0, None)
+            own = areas[rest]
+            order = rest[~((own > 0) & (overlap_x * overlap_y > max_overlap * own))]
+
+        return np.array(keep, dtype=np.intp)
+
+
+# Kernels of the OCR variants, built once
+MORPH_KERNEL = np.ones((2, 2), np.uint8)
+SHARPEN_KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+
+# cv2.CLAHE keeps scratch buffers, so each thread gets its own
+_clahe_local = threading.local()
+
+
+def _clahe():
+    clahe = getattr(_clahe_local, 'clahe', None)
+    if clahe is None:
+        clahe = _clahe_local.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe
+
+
+class PreprocessPipeline:
+    """
+    Produces the preprocess_for_ocr variants of the plate regions of one
+    photo, lazily and in any order, so a cascade that stops early never
+    computes the variants it did not try.
+
+    Intermediates (grayscale, CLAHE, adaptive threshold) are computed once
+    per region and shared by the variants derived from them. A region that
+    is a plain crop of the photo takes its grayscale from the photo's, when
+    plate detection already converted it. Variants are written into buffers
+    reused from region to region, so a variant is only valid until the next
+    region is started.
+    """
+
+    # How each variant is made from the intermediate it is derived from
+    STEPS = {
+        'gray': (None, None),
+        'clahe': ('gray', lambda src, dst: _clahe().apply(src, dst)),
+        # Good for varying lighting
+        'adaptive': ('clahe', lambda src, dst: cv2.adaptiveThreshold(
+            src, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2, dst)),
+        # Good for bimodal images
+        'otsu': ('clahe', lambda src, dst: cv2.threshold(src, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst)[1]),
+        # Dark text on light background
+        'inverted': ('adaptive', lambda src, dst: cv2.bitwise_not(src, dst)),
+        # Cleaned up with a closing
+        'morphed': ('adaptive', lambda src, dst: cv2.morphologyEx(src, cv2.MORPH_CLOSE, MORPH_KERNEL, dst)),
+        'sharpened': ('clahe', lambda src, dst: cv2.filter2D(src, -1, SHARPEN_KERNEL, dst)),
+    }
 
-        filtered = []
-        for region, bbox in regions:
+    def __init__(self, reuse_buffers: bool = True):
+        self.reuse_buffers = reuse_buffers
+        self._buffers = {}
+        self._gray = None
+        self._computed = {}
+
+    def set_gray(self, image: np.ndarray) -> np.ndarray:
+        """Grayscale of the whole photo, shared with plate detection"""
+        self._gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        return self._gray
+
+    def variants(self, region: np.ndarray, bbox: Optional[Tuple[int, int, int, int]] = None,
+                 names: Sequence[str] = ImagePreprocessor.VARIANT_NAMES,
+                 timings: Optional[Dict[str, float]] = None) -> Iterator[Tuple[str, np.ndarray]]:
+        """(name, image) for each variant in `names`, computed as it is requested"""
+        self._computed = {'gray': self._region_gray(region, bbox)}
+        for name in names:
+            with stage_timer(timings, 'preprocess'):
+                variant = self._variant(name)
+            yield name, variant
+
+    def _region_gray(self, region: np.ndarray, bbox: Optional[Tuple[int, int, int, int]]) -> np.ndarray:
+        if self._gray is not None and bbox is not None:
             x1, y1, x2, y2 = bbox
-            is_overlap = False
-
-            for _, existing_bbox in filtered:
-                ex1, ey1, ex2, ey2 = existing_bbox
-
-                # Check if bboxes overlap significantly
-                overlap_x = max(0, min(x2, ex2) - max(x1, ex1))
-                overlap_y = max(0, min(y2, ey2) - max(y1, ey1))
-                overlap_area = overlap_x * overlap_y
-
-                current_area = (x2 - x1) * (y2 - y1)
-                if current_area > 0 and overlap_area / current_area > 0.5:
-                    is_overlap = True
-                    break
-
-            if not is_overlap:
-                filtered.append((region, bbox))
-
-        return filtered[:5]  # Return top 5 candidates
+            if region.shape[:2] == (y2 - y1, x2 - x1):
+                return self._gray[y1:y2, x1:x2]
+        if region.ndim == 2:
+            return region
+        return cv2.cvtColor(region, cv2.COLOR_BGR2GRAY, self._buffer('gray', region.shape[:2]))
+
+    def _variant(self, name: str) -> np.ndarray:
+        if name not in self._computed:
+            source, step = self.STEPS[name]
+            src = self._variant(source)
+            self._computed[name] = step(src, self._buffer(name, src.shape))
+        return self._computed[name]
+
+    def _buffer(self, name: str, shape: Tuple[int, int]) -> np.ndarray:
+        size = shape[0] * shape[1]
+        if not self.reuse_buffers:
+            return np.empty(shape, dtype=np.uint8)
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size:
+            buffer = self._buffers[name] = np.empty(size, dtype=np.uint8)
+        return buffer[:size].reshape(shape)
 
 
 class PlateValidator:
     """Validates and formats extracted plate text"""
 
+    NOISE = re.compile(r'[^A-Z0-9\s]')
+    SPACES = re.compile(r'\s+')
+
     @staticmethod
     def clean_text(text: str) -> str:
         """Remove unwanted characters and normalize"""
         # Remove common noise characters
-        text = text.upper().strip()
-        text = re.sub(r'[^A-Z0-9\s]', '', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text
+        text = PlateValidator.NOISE.sub('', text.upper().strip())
+        return PlateValidator.SPACES.sub(' ', text)
 
     @staticmethod
     def apply_corrections(text: str, format_type: PlateFormat = None) -> str:
@@ -270,53 +463,24 @@ class PlateValidator:
         # Remove all spaces first for analysis
         clean = text.replace(' ', '')
 
-        if not clean.startswith('U'):
-            # Try to fix if it starts with 0 (might be O misread as 0)
-            if clean.startswith('0'):
-                clean = 'U' + clean[1:]
-
-        # Apply position-aware corrections
-        result = []
-        for i, char in enumerate(clean):
-            if format_type == PlateFormat.GOVERNMENT:
-                # UP 6633 format: first 2 are letters, rest are digits
-                if i < 2:
-                    result.append(UgandaPlatePatterns.LETTER_CORRECTIONS.get(char, char))
-                else:
-                    result.append(UgandaPlatePatterns.DIGIT_CORRECTIONS.get(char, char))
-            elif format_type == PlateFormat.NEW_STANDARD:
-                # UA 077AK: 2 letters, 3 digits, 2 letters
-                if i < 2 or i >= 5:
-                    result.append(UgandaPlatePatterns.LETTER_CORRECTIONS.get(char, char))
-                else:
-                    result.append(UgandaPlatePatterns.DIGIT_CORRECTIONS.get(char, char))
-            elif format_type == PlateFormat.MOTORCYCLE:
-                # UMA 055AF: 3 letters, 3 digits, 2 letters
-                if i < 3 or i >= 6:
-                    result.append(UgandaPlatePatterns.LETTER_CORRECTIONS.get(char, char))
-                else:
-                    result.append(UgandaPlatePatterns.DIGIT_CORRECTIONS.get(char, char))
-            elif format_type == PlateFormat.LEGACY:
-                # UAX 123Y: 3 letters, 3-4 digits, 1 letter
-                if i < 3 or i == len(clean) - 1:
-                    result.append(UgandaPlatePatterns.LETTER_CORRECTIONS.get(char, char))
-                else:
-                    result.append(UgandaPlatePatterns.DIGIT_CORRECTIONS.get(char, char))
-            else:
-                result.append(char)
-
-        return ''.join(result)
+        # Try to fix if it starts with 0 (might be O misread as 0)
+        if clean.startswith('0'):
+            clean = 'U' + clean[1:]
+
+        segments = UgandaPlatePatterns.SEGMENTS.get(format_type)
+        if segments is None:
+            return clean
+        if format_type == PlateFormat.LEGACY and len(clean) < 4:
+            # Every position is one of the leading letters (the slices would overlap)
+            return clean.translate(UgandaPlatePatterns.LETTER_TABLE)
+        # Letter positions get LETTER_CORRECTIONS, digit positions DIGIT_CORRECTIONS
+        return ''.join(clean[start:stop].translate(table) for start, stop, table in segments)
 
     @staticmethod
     def detect_format(text: str) -> PlateFormat:
         """Detect the plate format from cleaned text"""
-        clean = text.replace(' ', '').upper()
-
-        for fmt, pattern in UgandaPlatePatterns.PATTERNS.items():
-            if pattern.match(clean):
-                return fmt
-
-        return PlateFormat.UNKNOWN
+        match = UgandaPlatePatterns.COMBINED.match(text.replace(' ', '').upper())
+        return PlateFormat(match.lastgroup) if match else PlateFormat.UNKNOWN
 
     @staticmethod
     def format_plate(text: str, format_type: PlateFormat) -> str:
@@ -353,110 +517,271 @@ class PlateValidator:
         """
         clean = PlateValidator.clean_text(text)
 
-        # Try each format with corrections
-        for fmt in PlateFormat:
-            if fmt == PlateFormat.UNKNOWN:
-                continue
-
-            corrected = PlateValidator.apply_corrections(clean, fmt)
-            detected_fmt = PlateValidator.detect_format(corrected)
-
-            if detected_fmt != PlateFormat.UNKNOWN:
-                formatted = PlateValidator.format_plate(corrected, detected_fmt)
-                return formatted, detected_fmt, True
+        # Corrections keep the length, so anything outside PLATE_LENGTHS can't match
+        if len(clean.replace(' ', '')) in UgandaPlatePatterns.PLATE_LENGTHS:
+            # Try each format's corrections; formats often yield the same string
+            tried = set()
+            for fmt in UgandaPlatePatterns.SEGMENTS:
+                corrected = PlateValidator.apply_corrections(clean, fmt)
+                if corrected in tried:
+                    continue
+                tried.add(corrected)
+
+                match = UgandaPlatePatterns.COMBINED.match(corrected)
+                if match:
+                    detected_fmt = PlateFormat(match.lastgroup)
+                    return PlateValidator.format_plate(corrected, detected_fmt), detected_fmt, True
 
         # If no valid format found, return cleaned text
         return clean, PlateFormat.UNKNOWN, False
 
+    @staticmethod
+    def validate_many(texts: Sequence[str]) -> List[Tuple[str, PlateFormat, bool]]:
+        """validate_and_format for a list of raw detections, each distinct string validated once"""
+        results = {}
+        for text in texts:
+            if text not in results:
+                results[text] = PlateValidator.validate_and_format(text)
+        return [results[text] for text in texts]
+
 
 class OCREngine:
     """Main OCR engine with multiple backend support"""
 
-    def __init__(self, use_easyocr: bool = True, use_tesseract: bool = True):
-        self.use_easyocr = use_easyocr
-        self.use_tesseract = use_tesseract
-        self._easyocr_reader = None
-        self._tesseract_available = None
+    # Order in which the cascade tries preprocess_for_ocr variants, most
+    # productive first, until a VariantScheduler has learned a better one
+    CASCADE_VARIANT_ORDER = ('clahe', 'otsu', 'sharpened', 'adaptive', 'morphed', 'inverted')
+
+    # Typical width/height of a Uganda plate crop; regions closer to it are tried first
+    PLATE_ASPECT_RATIO = 3.5
+
+    def __init__(self, use_easyocr: bool = True, use_tesseract: bool = True,
+                 cascade: bool = False, min_confidence: float = 0.85,
+                 max_ocr_calls: Optional[int] = None, max_ocr_ms: Optional[float] = None,
+                 detect_max_edge: Optional[int] = None, region_max_edge: Optional[int] = None,
+                 scheduler=None, backends: Optional[Sequence] = None,
+                 decode_target_edge: Optional[int] = None, max_image_bytes: Optional[int] = None,
+                 max_image_pixels: Optional[int] = None, governor: Optional[OCRGovernor] = None,
+                 known_plates=None, known_plate_boost: float = 1.2):
+        # OCRBackend instances or names (see backends.BACKENDS), preferred first;
+        # by default EasyOCR and/or Tesseract as selected by the use_* flags
+        if backends is None:
+            backends = [name for name, enabled in (('easyocr', use_easyocr), ('tesseract', use_tesseract))
+                        if enabled]
+        self.backends = [create_backend(backend) if isinstance(backend, str) else backend
+                         for backend in backends]
+        self._confidence_boosts = {backend.name: backend.confidence_boost for backend in self.backends}
+        self.cascade = cascade
+        self.min_confidence = min_confidence
+        self.max_ocr_calls = max_ocr_calls
+        self.max_ocr_ms = max_ocr_ms
+        self.detect_max_edge = detect_max_edge
+        self.region_max_edge = region_max_edge
+        # Uploads are decoded at reduced resolution down to decode_target_edge
+        # and rejected above max_image_bytes / max_image_pixels (see decoding.py)
+        self.decode_target_edge = decode_target_edge
+        self.max_image_bytes = max_image_bytes
+        self.max_image_pixels = max_image_pixels
+        # Optional VariantScheduler ordering/pruning variants by past success
+        self.scheduler = scheduler
+        # Optional OCRGovernor limiting concurrent extract_plate runs
+        self.governor = governor
+        # Optional KnownPlates: a read PlateValidator rejects that is one OCR
+        # confusion from a registered plate becomes that plate, confidence x
+        # known_plate_boost. Valid reads are never changed: a new car is valid too
+        self.known_plates = known_plates
+        self.known_plate_boost = known_plate_boost
         self.preprocessor = ImagePreprocessor()
         self.validator = PlateValidator()
 
-    @property
-    def easyocr_reader(self):
-        """Lazy load EasyOCR reader"""
-        if self._easyocr_reader is None and self.use_easyocr:
-            try:
-                import easyocr
-                self._easyocr_reader = easyocr.Reader(['en'], gpu=False)
-                logger.info("EasyOCR initialized successfully")
-            except ImportError:
-                logger.warning("EasyOCR not available")
-                self.use_easyocr = False
-            except Exception as e:
-                logger.error(f"Error initializing EasyOCR: {e}")
-                self.use_easyocr = False
-        return self._easyocr_reader
+    def warm_up(self, image: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Load every backend now instead of on the first photo; returns the
+        usable ones. With `image`, each also reads it once, so lazily
+        initialized parts of the models are ready too.
+        """
+        readers = self._readers()
+        if image is not None:
+            for name, read in readers:
+                self._run_reader(name, read, image)
+        return [name for name, _ in readers]
 
-    @property
-    def tesseract_available(self):
-        """Check if Tesseract is available"""
-        if self._tesseract_available is None:
-            try:
-                import pytesseract
-                pytesseract.get_tesseract_version()
-                self._tesseract_available = True
-                logger.info("Tesseract available")
-            except Exception:
-                self._tesseract_available = False
-                logger.warning("Tesseract not available")
-        return self._tesseract_available
-
-    def extract_plate(self, image: np.ndarray) -> PlateResult:
+    def _readers(self) -> List[Tuple[str, callable]]:
+        """Available OCR backends as (name, read function) pairs, preferred first"""
+        return [(backend.name, backend.read) for backend in self.backends if backend.available]
+
+    @staticmethod
+    def _region_readers(readers: List[Tuple[str, callable]], region: np.ndarray) -> List[Tuple[str, callable]]:
+        """Readers for the variants of one region, sharing work between them where the backend can (EasyOCR)"""
+        region_readers = []
+        for name, read in readers:
+            backend = getattr(read, '__self__', None)
+            if isinstance(backend, OCRBackend):
+                read = backend.region_reader(region)
+            region_readers.append((name, read))
+        return region_readers
+
+    @staticmethod
+    def _run_reader(name: str, read, image: np.ndarray, timings: Optional[Dict[str, float]] = None) -> List[Tuple[str, float]]:
+        try:
+            with stage_timer(timings, f'ocr_{name}'):
+                return read(image)
+        except Exception as e:
+            logger.error(f"{name} error: {e}")
+            return []
+
+    @classmethod
+    def _run_reader_many(cls, name: str, read, images: List[np.ndarray],
+                         timings: Optional[Dict[str, float]] = None) -> List[List[Tuple[str, float]]]:
+        """Read several images, in one call when the reader has read_many()"""
+        read_many = getattr(read, 'read_many', None)
+        if read_many is None:
+            return [cls._run_reader(name, read, image, timings) for image in images]
+        try:
+            with stage_timer(timings, f'ocr_{name}'):
+                return read_many(images)
+        except Exception as e:
+            logger.error(f"{name} error: {e}")
+            return [[] for _ in images]
+
+    def extract_plate(self, image: np.ndarray, regions: Optional[List] = None) -> PlateResult:
         """
         Extract number plate from image.
-        Tries multiple methods and returns best result.
+        In cascade mode stops at the first good plate; otherwise tries
+        every method and returns the best result. `regions`, as
+        (crop, bounding_box) pairs, skips plate detection (e.g. a plate
+        tracked from the previous video frame).
+        With a governor, waits for an OCR slot first and returns an
+        OCR_BUSY_ERROR result when none is free in time.
         """
+        timings = {}
+        if self.governor is None:
+            return self._extract(image, timings, regions)
+        try:
+            with self.governor.slot(timings):
+                return self._extract(image, timings, regions)
+        except OCRBusy as e:
+            logger.warning(f"OCR turned away: {e}")
+            result = PlateResult.failed(OCR_BUSY_ERROR)
+            result.timings = timings
+            return result
+
+    def _extract(self, image: np.ndarray, timings: Dict[str, float], regions: Optional[List]) -> PlateResult:
+        if self.cascade:
+            return self._extract_cascade(image, timings, regions)
+
         all_detections = []
+        readers = self._readers()
+        ocr_calls = 0
 
         # Step 1: Detect plate regions
-        regions = self.preprocessor.detect_plate_region(image)
+        pipeline = PreprocessPipeline()
+        if regions is None:
+            with stage_timer(timings, 'detect'):
+                regions = self._detect_regions(image, pipeline)
         logger.info(f"Found {len(regions)} potential plate regions")
 
-        for region_img, bbox in regions:
+        for rank, (region_img, bbox) in enumerate(regions):
             # Step 2: Preprocess each region
-            preprocessed = self.preprocessor.preprocess_for_ocr(region_img)
-
-            for processed_img in preprocessed:
-                # Step 3: Run OCR with available engines
-
-                # Try EasyOCR
-                if self.use_easyocr and self.easyocr_reader:
-                    try:
-                        results = self.easyocr_reader.readtext(processed_img)
-                        for detection in results:
-                            text = detection[1]
-                            confidence = detection[2]
-                            all_detections.append((text, confidence, bbox, 'easyocr'))
-                    except Exception as e:
-                        logger.error(f"EasyOCR error: {e}")
-
-                # Try Tesseract
-                if self.use_tesseract and self.tesseract_available:
-                    try:
-                        import pytesseract
-                        # Use specific config for license plates
-                        custom_config = r'--oem 3 --psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                        text = pytesseract.image_to_string(processed_img, config=custom_config)
-                        text = text.strip()
-                        if text:
-                            # Tesseract doesn't provide confidence for simple mode
-                            all_detections.append((text, 0.7, bbox, 'tesseract'))
-                    except Exception as e:
-                        logger.error(f"Tesseract error: {e}")
+            variants = list(pipeline.variants(region_img, bbox, timings=timings))
+            # Step 3: Run OCR with available engines, all variants of the region at once
+            readings = {
+                name: self._run_reader_many(name, read, [processed_img for _, processed_img in variants], timings)
+                for name, read in self._region_readers(readers, region_img)
+            }
+            for index, (variant, _) in enumerate(variants):
+                for name, _ in readers:
+                    ocr_calls += 1
+                    for text, confidence in readings[name][index]:
+                        all_detections.append((text, confidence, bbox, name, variant, rank))
 
         # Step 4: Find best valid plate from all detections
-        best_result = self._find_best_plate(all_detections)
+        best_result = self._find_best_plate(all_detections, timings)
+        tried = set(ImagePreprocessor.VARIANT_NAMES) if regions and readers else set()
+        return self._finish(best_result, all_detections, ocr_calls, tried, timings)
+
+    def _detect_regions(self, image: np.ndarray, pipeline: Optional[PreprocessPipeline] = None) -> List:
+        return self.preprocessor.detect_plate_region(
+            image, max_edge=self.detect_max_edge, region_max_edge=self.region_max_edge, pipeline=pipeline,
+        )
+
+    def _order_regions(self, regions: List) -> List:
+        """Most plate-like aspect ratio first; ties keep the detector's (area) order"""
+        def aspect_distance(region):
+            x1, y1, x2, y2 = region[1]
+            height = max(y2 - y1, 1)
+            return abs((x2 - x1) / height - self.PLATE_ASPECT_RATIO)
+        return sorted(regions, key=aspect_distance)
+
+    def _extract_cascade(self, image: np.ndarray, timings: Dict[str, float],
+                         regions: Optional[List] = None) -> PlateResult:
+        """
+        Try regions x variants x engines in expected-yield order, validating
+        each detection as it arrives. Stops when a valid plate reaches
+        min_confidence, when two separate OCR calls agree on the same plate,
+        or when the call/time budget runs out.
+        """
+        started = time.monotonic()
+        all_detections = []
+        agreeing = {}  # formatted plate -> candidates from separate OCR calls
+        readers = self._readers()
+        ocr_calls = 0
+        tried = set()
+
+        pipeline = PreprocessPipeline()
+        if regions is None:
+            with stage_timer(timings, 'detect'):
+                regions = self._order_regions(self._detect_regions(image, pipeline))
+        logger.info(f"Found {len(regions)} potential plate regions")
+        variant_order = self.scheduler.order() if self.scheduler else self.CASCADE_VARIANT_ORDER
+
+        for rank, (region_img, bbox) in enumerate(regions):
+            region_readers = self._region_readers(readers, region_img)
+            # Variants are only computed when the cascade gets to them
+            for variant, processed_img in pipeline.variants(region_img, bbox, variant_order, timings):
+                for name, read in region_readers:
+                    if self._budget_exhausted(ocr_calls, started):
+                        logger.info(f"OCR budget exhausted after {ocr_calls} calls")
+                        return self._finish(self._find_best_plate(all_detections, timings), all_detections,
+                                            ocr_calls, tried, timings)
+
+                    ocr_calls += 1
+                    tried.add(variant)
+                    call_candidates = {}
+                    for text, confidence in self._run_reader(name, read, processed_img, timings):
+                        detection = (text, confidence, bbox, name, variant, rank)
+                        all_detections.append(detection)
+                        with stage_timer(timings, 'validate'):
+                            candidate = self._candidate(*detection)
+                        if candidate is None:
+                            continue
+                        if candidate.confidence >= self.min_confidence:
+                            return self._finish(candidate, all_detections, ocr_calls, tried, timings)
+                        call_candidates[candidate.formatted_plate] = candidate
+
+                    for plate, candidate in call_candidates.items():
+                        agreeing.setdefault(plate, []).append(candidate)
+                        if len(agreeing[plate]) >= 2:
+                            best = max(agreeing[plate], key=lambda c: c.confidence)
+                            return self._finish(best, all_detections, ocr_calls, tried, timings)
+
+        return self._finish(self._find_best_plate(all_detections, timings), all_detections, ocr_calls, tried, timings)
+
+    def _budget_exhausted(self, ocr_calls: int, started: float) -> bool:
+        if self.max_ocr_calls is not None and ocr_calls >= self.max_ocr_calls:
+            return True
+        if self.max_ocr_ms is not None and (time.monotonic() - started) * 1000 >= self.max_ocr_ms:
+            return True
+        return False
+
+    def _finish(self, best_result: Optional[PlateResult], all_detections: List, ocr_calls: int,
+                tried_variants=(), timings: Optional[Dict[str, float]] = None) -> PlateResult:
+        if self.scheduler and tried_variants:
+            self.scheduler.record(tried_variants, best_result.variant if best_result else None)
 
         if best_result:
+            best_result.ocr_calls = ocr_calls
+            best_result.timings = timings
             return best_result
 
         # No valid plate found
@@ -466,29 +791,60 @@ class OCREngine:
             confidence=0.0,
             plate_format=PlateFormat.UNKNOWN,
             raw_detections=[d[0] for d in all_detections],
-            error="No valid Uganda plate detected"
+            error=NO_PLATE_ERROR,
+            ocr_calls=ocr_calls,
+            timings=timings,
         )
 
-    def _find_best_plate(self, detections: List[Tuple[str, float, Tuple, str]]) -> Optional[PlateResult]:
-        """Find the best valid plate from detections"""
-        candidates = []
-
-        for text, confidence, bbox, engine in detections:
-            formatted, fmt, is_valid = self.validator.validate_and_format(text)
+    def _candidate(self, text: str, confidence: float, bbox: Tuple, engine: str,
+                   variant: Optional[str] = None, region_rank: Optional[int] = None,
+                   validated: Optional[Tuple[str, PlateFormat, bool]] = None) -> Optional[PlateResult]:
+        """
+        Validate one raw detection; returns a PlateResult if it is a valid plate.
+        `validated` is the detection's validate_and_format result, if already known.
+        An invalid read one OCR confusion from a known plate is snapped to it,
+        with a confidence boost.
+        """
+        formatted, fmt, is_valid = validated or self.validator.validate_and_format(text)
+        if not is_valid:
+            if self.known_plates is None:
+                return None
+            known = self.known_plates.nearest(formatted)
+            if known is None:
+                return None
+            formatted, fmt, is_valid = self.validator.validate_and_format(known)
+            if not is_valid:
+                return None
+            confidence *= self.known_plate_boost
+
+        # Some backends' confidences run low (EasyOCR); see OCRBackend.confidence_boost
+        confidence *= self._confidence_boosts.get(engine, 1.0)
 
-            if is_valid:
-                # Boost confidence for EasyOCR results
-                if engine == 'easyocr':
-                    confidence *= 1.1
+        return PlateResult(
+            plate_text=text,
+            formatted_plate=formatted,
+            confidence=min(confidence, 1.0),
+            plate_format=fmt,
+            bounding_box=bbox,
+            raw_detections=[text],
+            engine=engine,
+            variant=variant,
+            region_rank=region_rank,
+        )
 
-                candidates.append(PlateResult(
-                    plate_text=text,
-                    formatted_plate=formatted,
-                    confidence=min(confidence, 1.0),
-                    plate_format=fmt,
-                    bounding_box=bbox,
-                    raw_detections=[text]
-                ))
+    def _find_best_plate(self, detections: List[Tuple],
+                         timings: Optional[Dict[str, float]] = None) -> Optional[PlateResult]:
+        """
+        Find the best valid plate from (text, confidence, bbox, engine, variant, region_rank)
+        detections; plates snapped to a known plate rank higher (see _candidate)
+        """
+        with stage_timer(timings, 'validate'):
+            validated = self.validator.validate_many([detection[0] for detection in detections])
+            candidates = [
+                candidate for candidate in (
+                    self._candidate(*detection, validated=result) for detection, result in zip(detections, validated)
+                ) if candidate
+            ]
 
         if not candidates:
             return None
@@ -499,57 +855,90 @@ class OCREngine:
 
     def extract_from_file(self, file_path: str) -> PlateResult:
         """Extract plate from image file"""
-        try:
-            image = cv2.imread(file_path)
-            if image is None:
-                return PlateResult(
-                    plate_text="",
-                    formatted_plate="",
-                    confidence=0.0,
-                    plate_format=PlateFormat.UNKNOWN,
-                    error="Could not read image file"
-                )
-            return self.extract_plate(image)
-        except Exception as e:
-            return PlateResult(
-                plate_text="",
-                formatted_plate="",
-                confidence=0.0,
-                plate_format=PlateFormat.UNKNOWN,
-                error=str(e)
-            )
+        return self._extract_from_source(file_path)
 
     def extract_from_bytes(self, image_bytes: bytes) -> PlateResult:
         """Extract plate from image bytes"""
+        return self._extract_from_source(image_bytes)
+
+    def extract_from_upload(self, upload) -> PlateResult:
+        """
+        Extract plate from a Django UploadedFile/File without reading it into
+        a bytes object: temporary uploads are decoded from disk, in-memory
+        ones from their buffer.
+        """
+        return self._extract_from_source(upload_source(upload))
+
+    def decode(self, source) -> np.ndarray:
+        """Decode a path, bytes or file object within this engine's size limits"""
+        return decode_image(
+            source,
+            target_edge=self.decode_target_edge,
+            max_bytes=self.max_image_bytes,
+            max_pixels=self.max_image_pixels,
+        )
+
+    def _extract_from_source(self, source) -> PlateResult:
         try:
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if image is None:
-                return PlateResult(
-                    plate_text="",
-                    formatted_plate="",
-                    confidence=0.0,
-                    plate_format=PlateFormat.UNKNOWN,
-                    error="Could not decode image"
-                )
-            return self.extract_plate(image)
+            decode_timings = {}
+            with stage_timer(decode_timings, 'decode'):
+                image = self.decode(source)
+            return self._with_decode_time(self.extract_plate(image), decode_timings)
         except Exception as e:
-            return PlateResult(
-                plate_text="",
-                formatted_plate="",
-                confidence=0.0,
-                plate_format=PlateFormat.UNKNOWN,
-                error=str(e)
-            )
+            return PlateResult.failed(str(e))
+
+    @staticmethod
+    def _with_decode_time(result: PlateResult, decode_timings: Dict[str, float]) -> PlateResult:
+        result.timings = {**decode_timings, **(result.timings or {})}
+        return result
 
 
 # Singleton instance for reuse
 _engine_instance = None
 
 
-def get_ocr_engine() -> OCREngine:
-    """Get or create OCR engine singleton"""
+def build_ocr_engine() -> OCREngine:
+    """New in-process OCR engine configured from settings.PLATE_OCR"""
+    from .conf import ocr_setting
+    from .governor import get_governor, limit_opencv_threads
+    from .known_plates import get_known_plates
+    from .scheduler import VariantScheduler
+    limit_opencv_threads()
+    return OCREngine(
+        cascade=ocr_setting('CASCADE'),
+        min_confidence=ocr_setting('CASCADE_MIN_CONFIDENCE'),
+        max_ocr_calls=ocr_setting('MAX_OCR_CALLS'),
+        max_ocr_ms=ocr_setting('MAX_OCR_MS'),
+        detect_max_edge=ocr_setting('DETECT_MAX_EDGE'),
+        region_max_edge=ocr_setting('REGION_MAX_EDGE'),
+        scheduler=VariantScheduler.from_settings() if ocr_setting('ADAPTIVE_VARIANTS') else None,
+        backends=ocr_setting('BACKENDS'),
+        decode_target_edge=ocr_setting('DECODE_TARGET_EDGE'),
+        max_image_bytes=ocr_setting('MAX_IMAGE_BYTES'),
+        max_image_pixels=ocr_setting('MAX_IMAGE_PIXELS'),
+        governor=get_governor(),
+        known_plates=get_known_plates(),
+        known_plate_boost=ocr_setting('KNOWN_PLATE_BOOST'),
+    )
+
+
+def get_ocr_engine():
+    """
+    Get or create the OCR engine singleton.
+    With PLATE_OCR['POOL_ENABLED'] this is a client of the shared OCR
+    process pool (`manage.py run_ocr_pool`) instead of a local engine, and
+    with RESULT_CACHE_SIZE it sits behind the OCR result cache.
+    """
     global _engine_instance
     if _engine_instance is None:
-        _engine_instance = OCREngine()
+        from .conf import ocr_setting
+        if ocr_setting('POOL_ENABLED'):
+            from .pool import OCRPoolClient
+            engine = OCRPoolClient()
+        else:
+            engine = build_ocr_engine()
+        if ocr_setting('RESULT_CACHE_SIZE'):
+            from .cache import CachedOCREngine
+            engine = CachedOCREngine(engine)
+        _engine_instance = engine
     return _engine_instance
\ No newline at end of file
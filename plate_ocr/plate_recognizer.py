@@ -0,0 +1,235 @@
+"""
+Dedicated plate character recognizer.
+
+Plates use a fixed alphabet of 36 characters in a few known layouts, so
+instead of a general text model the plate crop is binarized, split into
+characters with connected components (one or two rows), and every character
+is classified by a small CNN run through OpenCV DNN. All characters of a
+plate go through the network in one batch.
+
+The network is trained on synthetic plates rendered by render_plate() and
+cut up by the same segment_characters() used at inference time; see
+`manage.py train_plate_recognizer`, which writes the ONNX model read here.
+"""
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# Width, height of the character images the network takes
+CHAR_SIZE = (20, 32)
+
+# Plate crops are scaled to this height before segmentation
+SEGMENT_HEIGHT = 120
+
+# Characters on a plate: UP 6633 has 6, UAX 1234Y has 9
+MIN_CHARS, MAX_CHARS = 6, 9
+
+# Plate colours (BGR): white car plates, yellow commercial/motorcycle plates
+BACKGROUNDS = ((235, 235, 235), (40, 200, 240))
+
+
+def segment_characters(image: np.ndarray) -> List[List[np.ndarray]]:
+    """
+    Cut a plate crop into character images (white on black, CHAR_SIZE),
+    as rows of characters, top row first, each row left to right.
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    scale = SEGMENT_HEIGHT / gray.shape[0]
+    gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+
+    # Characters are darker than the plate; flip if the threshold picked the wrong side
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    if cv2.countNonZero(binary) > binary.size // 2:
+        binary = cv2.bitwise_not(binary)
+    binary = _remove_frame_lines(binary)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    x, y, w, h, area = stats[1:].T
+    plate_height, plate_width = binary.shape
+    # Character-shaped blobs: not border lines, bolts, dashes or specks. Blobs
+    # up to a few characters wide are kept, as blur can join neighbours.
+    keep = ((h >= 0.2 * plate_height) & (h <= 0.9 * plate_height)
+            & (w <= 4 * h) & (area >= 0.12 * w * h)
+            & (x > 0) & (y > 0) & (x + w < plate_width) & (y + h < plate_height))
+    boxes = stats[1:][keep, :4]
+    if not len(boxes):
+        return []
+    # Frame sides left over after _remove_frame_lines: thin and taller than the characters
+    frame = (boxes[:, 2] < 0.35 * boxes[:, 3]) & (boxes[:, 3] > 1.3 * np.median(boxes[:, 3]))
+    boxes = boxes[~frame]
+
+    rows = []
+    for row in _split_rows(boxes):
+        # Drop blobs much shorter than the row's characters
+        row = row[row[:, 3] >= 0.7 * np.median(row[:, 3])]
+        row = _split_joined(binary, row[np.argsort(row[:, 0])])
+        rows.append([_normalize_char(binary[by:by + bh, bx:bx + bw]) for bx, by, bw, bh in row])
+    return rows
+
+
+def _remove_frame_lines(binary: np.ndarray) -> np.ndarray:
+    """Erase long horizontal lines (plate frame, flag edges) that characters touch"""
+    width = binary.shape[1]
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (width // 3, 1))
+    return cv2.subtract(binary, cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel))
+
+
+def _split_rows(boxes: np.ndarray) -> List[np.ndarray]:
+    """Group (x, y, w, h) boxes into text rows by their vertical centre"""
+    centres = boxes[:, 1] + boxes[:, 3] / 2
+    order = np.argsort(centres)
+    boxes, centres = boxes[order], centres[order]
+    # A new row starts where the centres jump by more than half a character
+    breaks = np.flatnonzero(np.diff(centres) > 0.5 * np.median(boxes[:, 3])) + 1
+    return np.split(boxes, breaks)
+
+
+def _split_joined(binary: np.ndarray, row: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Cut blobs several characters wide at the emptiest columns"""
+    single = row[:, 2] <= 1.2 * row[:, 3]
+    typical = np.median(row[single, 2]) if single.any() else 0.7 * np.median(row[:, 3])
+
+    boxes = []
+    for x, y, w, h in row.tolist():
+        pieces = int(round(w / typical)) if w > 1.5 * typical else 1
+        if pieces == 1:
+            boxes.append((x, y, w, h))
+            continue
+        ink = binary[y:y + h, x:x + w].sum(axis=0)
+        window = max(int(typical / 3), 1)
+        edges = [0]
+        for i in range(1, pieces):
+            centre = int(i * w / pieces)
+            lo, hi = max(centre - window, edges[-1] + 1), min(centre + window, w - 1)
+            edges.append(lo + int(np.argmin(ink[lo:hi])) if hi > lo else centre)
+        edges.append(w)
+        boxes.extend((x + left, y, right - left, h) for left, right in zip(edges, edges[1:]))
+    return boxes
+
+
+def _normalize_char(char: np.ndarray) -> np.ndarray:
+    """Pad a character to the CHAR_SIZE aspect ratio (keeping its shape) and resize"""
+    width, height = CHAR_SIZE
+    h, w = char.shape
+    target_w = max(w, int(round(h * width / height)))
+    target_h = max(h, int(round(target_w * height / width)))
+    padded = np.zeros((target_h, target_w), dtype=np.uint8)
+    top, left = (target_h - h) // 2, (target_w - w) // 2
+    padded[top:top + h, left:left + w] = char
+    return cv2.resize(padded, CHAR_SIZE, interpolation=cv2.INTER_AREA)
+
+
+class PlateCharRecognizer:
+    """Segments a plate crop and classifies its characters with an ONNX CNN"""
+
+    def __init__(self, model_path: str):
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        # A cv2.dnn.Net must not run forward() from two threads at once
+        self._lock = threading.Lock()
+
+    def classify(self, chars: Sequence[np.ndarray]) -> Tuple[str, np.ndarray]:
+        """Characters and their probabilities for a batch of CHAR_SIZE images"""
+        blob = cv2.dnn.blobFromImages(list(chars), scalefactor=1 / 255.0, size=CHAR_SIZE)
+        with self._lock:
+            self.net.setInput(blob)
+            logits = self.net.forward()
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return ''.join(ALPHABET[i] for i in best), probabilities[np.arange(len(best)), best]
+
+    def read(self, image: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Plate text (rows separated by a space) and confidence, or None"""
+        rows = segment_characters(image)
+        chars = [char for row in rows for char in row]
+        if not MIN_CHARS <= len(chars) <= MAX_CHARS:
+            return None
+
+        text, probabilities = self.classify(chars)
+        row_texts, start = [], 0
+        for row in rows:
+            row_texts.append(text[start:start + len(row)])
+            start += len(row)
+        # A plate is only as certain as its least certain character
+        return ' '.join(row_texts), float(probabilities.min())
+
+
+def random_plate_text(rng: np.random.Generator) -> str:
+    """A random plate in one of the Uganda formats; two-row plates contain a newline"""
+    letters = lambda n: ''.join(rng.choice(list(ALPHABET[10:]), n))
+    digits = lambda n: ''.join(rng.choice(list(ALPHABET[:10]), n))
+    layout = rng.integers(4)
+    if layout == 0:
+        return f"U{letters(2)} {digits(int(rng.integers(3, 5)))}{letters(1)}"
+    if layout == 1:
+        return f"U{letters(1)} {digits(3)}{letters(2)}"
+    if layout == 2:
+        # Motorcycle plates are two rows
+        return f"U{letters(2)}\n{digits(3)}{letters(2)}"
+    return f"U{letters(1)} {digits(4)}"
+
+
+def render_plate(text: str, rng: np.random.Generator, font=None) -> np.ndarray:
+    """
+    Render `text` as a BGR plate image with random colours, stroke weight,
+    blur, noise and perspective. `font` is a PIL ImageFont (the plate
+    font); without one OpenCV's Hershey font is used.
+    """
+    lines = text.split('\n')
+    line_height = 100
+    width = int(70 * max(len(line) for line in lines) + 60)
+    height = line_height * len(lines) + 40
+    background = BACKGROUNDS[rng.integers(len(BACKGROUNDS))]
+    plate = np.full((height, width, 3), background, dtype=np.uint8)
+    cv2.rectangle(plate, (4, 4), (width - 5, height - 5), (20, 20, 20), int(rng.integers(2, 6)))
+
+    if font is not None:
+        from PIL import Image, ImageDraw
+        canvas = Image.fromarray(plate)
+        draw = ImageDraw.Draw(canvas)
+        for i, line in enumerate(lines):
+            left, top, right, bottom = draw.textbbox((0, 0), line, font=font)
+            draw.text(((width - right + left) / 2 - left, 20 + i * line_height + (line_height - bottom + top) / 2 - top),
+                      line, font=font, fill=(15, 15, 15))
+        plate = np.asarray(canvas).copy()
+    else:
+        thickness = int(rng.integers(5, 9))
+        for i, line in enumerate(lines):
+            (text_w, text_h), _ = cv2.getTextSize(line, cv2.FONT_HERSHEY_SIMPLEX, 2.6, thickness)
+            origin = ((width - text_w) // 2, 20 + i * line_height + (line_height + text_h) // 2)
+            cv2.putText(plate, line, origin, cv2.FONT_HERSHEY_SIMPLEX, 2.6, (15, 15, 15), thickness, cv2.LINE_AA)
+
+    # Camera effects: slight perspective, blur, lighting and sensor noise
+    jitter = rng.uniform(-0.04, 0.04, (4, 2)) * (width, height)
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    matrix = cv2.getPerspectiveTransform(corners, np.float32(corners + jitter))
+    plate = cv2.warpPerspective(plate, matrix, (width, height), borderValue=background)
+    plate = cv2.GaussianBlur(plate, (0, 0), rng.uniform(0.3, 1.8))
+    plate = plate.astype(np.float32) * rng.uniform(0.6, 1.2) + rng.normal(0, rng.uniform(2, 12), plate.shape)
+    return np.clip(plate, 0, 255).astype(np.uint8)
+
+
+def training_samples(count: int, rng: np.random.Generator, font=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Character images and ALPHABET indices cut from `count` synthetic plates.
+    Plates whose segmentation does not match their text are skipped, as the
+    labels could not be assigned.
+    """
+    images, labels = [], []
+    for _ in range(count):
+        text = random_plate_text(rng)
+        rows = segment_characters(render_plate(text, rng, font))
+        expected = [line.replace(' ', '') for line in text.split('\n')]
+        if [len(row) for row in rows] != [len(line) for line in expected]:
+            continue
+        for row, line in zip(rows, expected):
+            images.extend(row)
+            labels.extend(ALPHABET.index(char) for char in line)
+    return np.array(images, dtype=np.uint8), np.array(labels, dtype=np.int64)
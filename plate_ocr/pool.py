@@ -0,0 +1,207 @@
+"""
+Shared OCR process pool.
+
+`manage.py run_ocr_pool` starts a fixed number of OCR processes, each of which
+loads the OCR model once at start-up, and listens on a local socket. Web
+workers (with PLATE_OCR['POOL_ENABLED']) get an OCRPoolClient from
+get_ocr_engine() and send photo bytes over that socket instead of holding
+their own model, so model memory no longer grows with web concurrency.
+
+Wire protocol, one request per connection (multiprocessing.connection with
+an authkey): the client sends the raw image bytes, the server replies with
+PlateResult.to_dict().
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import AuthenticationError, get_context
+from multiprocessing.connection import Client, Listener
+from typing import List
+
+import cv2
+
+from .conf import ocr_setting, pool_authkey
+from .ocr_engine import PlateResult
+
+logger = logging.getLogger(__name__)
+
+# OCR engine of the current pool process
+_worker_engine = None
+
+
+def _pool_address():
+    address = ocr_setting('POOL_ADDRESS')
+    return tuple(address) if isinstance(address, list) else address
+
+
+def _init_worker():
+    """Runs once in every pool process: set up Django and load the model"""
+    global _worker_engine
+    import django
+    django.setup()
+
+    from .ocr_engine import build_ocr_engine
+    _worker_engine = build_ocr_engine()
+    # Load the models before the first photo
+    _worker_engine.warm_up()
+
+
+def _extract_in_worker(image_bytes: bytes) -> dict:
+    return _worker_engine.extract_from_bytes(image_bytes).to_dict()
+
+
+class OCRPoolServer:
+    """Serves OCR requests from a pool of prewarmed OCR processes"""
+
+    def __init__(self, address=None, size=None, timeout=None, max_image_bytes=None,
+                 max_tasks_per_child=None):
+        self.address = address or _pool_address()
+        self.size = size or ocr_setting('POOL_SIZE')
+        self.timeout = timeout or ocr_setting('POOL_TIMEOUT')
+        self.max_image_bytes = max_image_bytes or ocr_setting('POOL_MAX_IMAGE_BYTES')
+        self.max_tasks_per_child = max_tasks_per_child or ocr_setting('POOL_MAX_TASKS_PER_CHILD')
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._listener = None
+        self.restarts = 0
+
+    def _start_executor(self):
+        # spawn, not fork: the model must not be shared with a forked parent
+        # (and max_tasks_per_child requires it)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+        # Start every process now so the models load before the first request
+        for _ in range(self.size):
+            self._executor.submit(int)
+
+    def _restart_executor(self, broken):
+        """Replace the executor, unless another thread already replaced `broken`"""
+        with self._executor_lock:
+            if self._executor is not broken:
+                return
+            logger.warning("Restarting OCR pool")
+            # Kill stuck processes too; in-flight requests get BrokenProcessPool
+            for process in list((broken._processes or {}).values()):
+                process.kill()
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.restarts += 1
+            self._start_executor()
+
+    def extract(self, image_bytes: bytes) -> PlateResult:
+        if len(image_bytes) > self.max_image_bytes:
+            return PlateResult.failed("Image too large")
+
+        executor = self._executor
+        try:
+            future = executor.submit(_extract_in_worker, image_bytes)
+            return PlateResult.from_dict(future.result(timeout=self.timeout))
+        except FutureTimeoutError:
+            if not future.cancel():
+                # A process is stuck on this photo; it can only be freed by a restart
+                self._restart_executor(executor)
+            return PlateResult.failed("OCR timed out")
+        except BrokenProcessPool:
+            self._restart_executor(executor)
+            return PlateResult.failed("OCR worker crashed")
+
+    def _handle(self, conn):
+        try:
+            with conn:
+                try:
+                    image_bytes = conn.recv_bytes(maxlength=self.max_image_bytes)
+                except OSError:
+                    # recv_bytes refuses messages over maxlength
+                    conn.send(PlateResult.failed("Image too large").to_dict())
+                    return
+                conn.send(self.extract(image_bytes).to_dict())
+        except (EOFError, OSError) as e:
+            logger.warning(f"OCR pool client went away: {e}")
+        except Exception:
+            logger.exception("OCR pool request failed")
+
+    def serve_forever(self):
+        self._start_executor()
+        self._listener = Listener(self.address, authkey=pool_authkey())
+        logger.info(f"OCR pool of {self.size} listening on {self.address}")
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except AuthenticationError:
+                    logger.warning("Rejected OCR pool connection with a bad authkey")
+                    continue
+                except OSError:
+                    if self._listener is None:
+                        break  # shutdown() closed the listener
+                    logger.warning("OCR pool accept failed", exc_info=True)
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+
+class OCRPoolClient:
+    """
+    Drop-in replacement for OCREngine's extract_* methods that sends the
+    photo to the shared OCR pool. Failures come back as a PlateResult with
+    an error, like any other failed extraction.
+    """
+
+    def __init__(self, address=None, timeout=None, max_image_bytes=None):
+        self.address = address or _pool_address()
+        self.timeout = timeout or ocr_setting('POOL_TIMEOUT')
+        self.max_image_bytes = max_image_bytes or ocr_setting('POOL_MAX_IMAGE_BYTES')
+
+    def extract_from_bytes(self, image_bytes: bytes) -> PlateResult:
+        if len(image_bytes) > self.max_image_bytes:
+            return PlateResult.failed("Image too large")
+        try:
+            with Client(self.address, authkey=pool_authkey()) as conn:
+                conn.send_bytes(image_bytes)
+                # Leave the server a moment to report its own timeout first
+                if not conn.poll(self.timeout + 1):
+                    return PlateResult.failed("OCR timed out")
+                return PlateResult.from_dict(conn.recv())
+        except (OSError, EOFError, AuthenticationError) as e:
+            logger.error(f"OCR pool unavailable: {e}")
+            return PlateResult.failed("OCR service unavailable")
+
+    def warm_up(self) -> List[str]:
+        """
+        Check that the pool answers; its processes load their models when the
+        pool starts. An empty message comes back as a failed decode without OCR.
+        """
+        with Client(self.address, authkey=pool_authkey()) as conn:
+            conn.send_bytes(b'')
+            if not conn.poll(self.timeout + 1):
+                raise TimeoutError("OCR pool did not answer")
+            conn.recv()
+        return ['pool']
+
+    def extract_from_file(self, file_path: str) -> PlateResult:
+        try:
+            with open(file_path, 'rb') as f:
+                return self.extract_from_bytes(f.read())
+        except OSError:
+            return PlateResult.failed("Could not read image file")
+
+    def extract_from_upload(self, upload) -> PlateResult:
+        # The bytes have to cross the socket anyway
+        upload.seek(0)
+        return self.extract_from_bytes(upload.read())
+
+    def extract_plate(self, image) -> PlateResult:
+        ok, encoded = cv2.imencode('.png', image)
+        if not ok:
+            return PlateResult.failed("Could not encode image")
+        return self.extract_from_bytes(encoded.tobytes())
@@ -0,0 +1,175 @@
+"""
+Per-client admission control for OCR.
+
+The photo APIs need no login and run the most CPU-expensive code there is,
+so every client gets a quota of OCR requests per minute and of OCR runs in
+flight at once, by accounts user_type (Anonymous / Registered / Verified).
+Signed-in users are counted per account and everyone else per IP address.
+
+Counters live in the Django cache named by OCR_QUOTA_CACHE, so every web
+and Celery worker sharing that cache shares the quota. That cache must be
+Redis or Memcached: their incr/decr are atomic on the server, while the file
+and database caches read, add and write back, losing concurrent counts, and
+the local-memory cache counts per process. checks.py warns about any other
+backend (plate_ocr.W001). The check runs before the upload is parsed or
+decoded; a client over its quota gets HTTP 429. When the cache cannot be
+reached, requests are admitted unmetered rather than failing.
+"""
+import logging
+import time
+from typing import Dict, Optional
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Cache backends whose incr/decr are atomic across processes
+ATOMIC_CACHE_BACKENDS = frozenset({
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+})
+
+# In-flight counters expire after this many seconds, so a worker that died
+# mid-OCR cannot lock its client out for good
+INFLIGHT_TTL = 300
+
+
+class QuotaExceeded(Exception):
+    """The client is over its OCR quota; retry_after is in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def client_tier(user) -> str:
+    """Quota tier of a request's user: their accounts user_type, Anonymous when signed out"""
+    if user is None or not user.is_authenticated:
+        return 'Anonymous'
+    return getattr(user, 'user_type', None) or 'Registered'
+
+
+def client_key(request) -> str:
+    """Who a request is counted against: the account, or the IP address when signed out"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    # REMOTE_ADDR, not X-Forwarded-For, which the client controls
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class QuotaLease:
+    """One admitted OCR request; release() frees its in-flight slot (once)"""
+
+    def __init__(self, quota: 'OCRQuota', client: str):
+        self.quota = quota
+        self.client = client
+        self._held = True
+
+    def release(self):
+        if self._held:
+            self._held = False
+            self.quota.release(self.client)
+
+    def detach(self) -> str:
+        """Hand the slot over to someone else (an OCR job), who releases it by client key; '' if already released"""
+        client = self.client if self._held else ''
+        self._held = False
+        return client
+
+
+class OCRQuota:
+    """Requests-per-minute and in-flight limits per client, counted in a shared cache"""
+
+    def __init__(self, limits: Dict[str, Dict[str, int]], cache_alias: str = 'default', prefix: str = 'ocr-quota'):
+        # {tier: {'per_minute': n, 'concurrent': n}}; a missing or None limit is unlimited
+        self.limits = limits
+        self.cache_alias = cache_alias
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _incr(self, key: str, timeout: int) -> int:
+        self.cache.add(key, 0, timeout=timeout)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(key, 1, timeout=timeout)
+            return 1
+
+    def _inflight_key(self, client: str) -> str:
+        return f"{self.prefix}:inflight:{client}"
+
+    def admit(self, client: str, tier: str) -> QuotaLease:
+        """Count one OCR request against the client; raises QuotaExceeded when over quota"""
+        try:
+            return self._admit(client, tier)
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            # Quotas protect OCR and must not take it down with the cache
+            logger.warning(f"OCR quota cache unavailable, admitting {client} unmetered: {e}")
+            return QuotaLease(self, '')
+
+    def _admit(self, client: str, tier: str) -> QuotaLease:
+        limits = self.limits.get(tier) or self.limits.get('Registered') or {}
+        concurrent, per_minute = limits.get('concurrent'), limits.get('per_minute')
+
+        if concurrent is not None:
+            inflight_key = self._inflight_key(client)
+            if self._incr(inflight_key, INFLIGHT_TTL) > concurrent:
+                self.release(client)
+                raise QuotaExceeded(f"Only {concurrent} photo(s) can be read at a time", retry_after=5)
+
+        if per_minute is not None:
+            now = time.time()
+            rate_key = f"{self.prefix}:rate:{client}:{int(now // 60)}"
+            if self._incr(rate_key, 60) > per_minute:
+                if concurrent is not None:
+                    self.release(client)
+                raise QuotaExceeded(f"Too many photos, the limit is {per_minute} per minute",
+                                    retry_after=60 - int(now % 60))
+
+        return QuotaLease(self, client if concurrent is not None else '')
+
+    def release(self, client: str):
+        """Free one in-flight slot of the client"""
+        if not client:
+            return
+        key = self._inflight_key(client)
+        try:
+            if self.cache.decr(key) < 0:
+                self.cache.set(key, 0, timeout=INFLIGHT_TTL)
+        except ValueError:
+            pass  # Already expired
+        except Exception as e:
+            # The counter expires after INFLIGHT_TTL instead
+            logger.warning(f"OCR quota cache unavailable, could not release {client}: {e}")
+
+    def usage(self, client: str) -> Dict[str, Optional[int]]:
+        """Current counters of a client (for tests and debugging)"""
+        return {
+            'inflight': self.cache.get(self._inflight_key(client)),
+            'this_minute': self.cache.get(f"{self.prefix}:rate:{client}:{int(time.time() // 60)}"),
+        }
+
+
+def get_quota() -> Optional[OCRQuota]:
+    """OCRQuota from PLATE_OCR settings; None when OCR_QUOTAS is None"""
+    from .conf import ocr_setting
+    limits = ocr_setting('OCR_QUOTAS')
+    if limits is None:
+        return None
+    return OCRQuota(limits, cache_alias=ocr_setting('OCR_QUOTA_CACHE'))
+
+
+def admit_request(request) -> Optional[QuotaLease]:
+    """Admit a request's OCR against its client's quota (None when quotas are off); raises QuotaExceeded"""
+    quota = get_quota()
+    if quota is None:
+        return None
+    return quota.admit(client_key(request), client_tier(request.user))
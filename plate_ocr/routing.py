@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .consumers import OCRJobConsumer
+
+websocket_urlpatterns = [
+    path('ws/ocr/jobs/<uuid:job_id>/', OCRJobConsumer.as_asgi()),
+]
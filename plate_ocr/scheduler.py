@@ -0,0 +1,162 @@
+"""
+Adaptive ordering of preprocessing variants.
+
+The cascade in OCREngine tries preprocess_for_ocr variants one at a time and
+stops at the first good plate, so the order matters: a variant that rarely
+produces the accepted plate only costs OCR calls. VariantScheduler counts, per
+variant, the photos it was tried on and the photos where it produced the
+accepted plate, orders variants by that (smoothed) success rate and skips
+those that almost never win. A small share of photos puts a random variant
+first so every variant keeps being measured.
+
+Counts are buffered in memory and added to OCRVariantStat rows with F()
+updates, so several web/OCR processes can share the table; each flush also
+reloads the totals, picking up what the other processes learned. Flushes run
+on a daemon thread, like ExtractionLogWriter's, so they add no database
+round trips to the photo being read.
+"""
+import atexit
+import logging
+import random
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import DatabaseError, connection
+from django.db.models import F
+
+from .conf import ocr_setting
+from .models import OCRVariantStat
+
+logger = logging.getLogger(__name__)
+
+
+class VariantScheduler:
+    """Orders preprocessing variants by observed success rate"""
+
+    def __init__(self, default_order: Iterable[str] = None, exploration: float = 0.1,
+                 min_attempts: int = 200, prune_below: float = 0.02, flush_every: int = 20,
+                 rng: Optional[random.Random] = None, background: bool = True):
+        from .ocr_engine import OCREngine
+        self.default_order = tuple(default_order or OCREngine.CASCADE_VARIANT_ORDER)
+        self.exploration = exploration
+        self.min_attempts = min_attempts
+        self.prune_below = prune_below
+        self.flush_every = flush_every
+        # Flush on a daemon thread; False flushes in record() itself
+        self.background = background
+        self.rng = rng or random.Random()
+        # variant -> [attempts, successes]
+        self.stats: Dict[str, list] = {variant: [0, 0] for variant in self.default_order}
+        self._pending: Dict[str, list] = {variant: [0, 0] for variant in self.default_order}
+        self._pending_photos = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls) -> 'VariantScheduler':
+        scheduler = cls(
+            exploration=ocr_setting('VARIANT_EXPLORATION'),
+            min_attempts=ocr_setting('VARIANT_MIN_ATTEMPTS'),
+            prune_below=ocr_setting('VARIANT_PRUNE_BELOW'),
+            flush_every=ocr_setting('VARIANT_STATS_FLUSH_EVERY'),
+        )
+        scheduler.load()
+        atexit.register(scheduler.flush)
+        return scheduler
+
+    def load(self):
+        """Replace the in-memory totals with those stored in the database"""
+        try:
+            rows = list(OCRVariantStat.objects.filter(variant__in=self.default_order))
+        except DatabaseError as e:
+            logger.warning(f"Could not load OCR variant statistics: {e}")
+            return
+        with self._lock:
+            for row in rows:
+                self.stats[row.variant] = [row.attempts, row.successes]
+
+    def _counts(self, variant: str) -> Tuple[int, int]:
+        attempts, successes = self.stats[variant]
+        pending_attempts, pending_successes = self._pending[variant]
+        return attempts + pending_attempts, successes + pending_successes
+
+    def success_rate(self, variant: str) -> float:
+        attempts, successes = self._counts(variant)
+        # Laplace smoothing: unmeasured variants start at 0.5
+        return (successes + 1) / (attempts + 2)
+
+    def is_pruned(self, variant: str) -> bool:
+        attempts, successes = self._counts(variant)
+        return attempts >= self.min_attempts and successes / attempts < self.prune_below
+
+    def order(self) -> Tuple[str, ...]:
+        """Variants to try for the next photo, most likely to produce the plate first"""
+        with self._lock:
+            # sorted() is stable, so ties keep the default order
+            ranked = sorted(self.default_order, key=self.success_rate, reverse=True)
+            kept = [variant for variant in ranked if not self.is_pruned(variant)] or ranked[:1]
+
+        if self.rng.random() < self.exploration:
+            explored = self.rng.choice(self.default_order)
+            kept = [explored] + [variant for variant in kept if variant != explored]
+        return tuple(kept)
+
+    def record(self, tried: Iterable[str], winner: Optional[str]):
+        """Count one photo: the variants that were tried and the one that produced the plate"""
+        with self._lock:
+            for variant in tried:
+                if variant in self._pending:
+                    self._pending[variant][0] += 1
+            if winner in self._pending:
+                self._pending[winner][1] += 1
+            self._pending_photos += 1
+            due = self._pending_photos >= self.flush_every
+        if not due:
+            return
+        if self.background:
+            self._ensure_thread()
+            self._wakeup.set()
+        else:
+            self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ocr-variant-stats', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.flush()
+            # Don't hold a database connection open while idle
+            connection.close()
+
+    def flush(self):
+        """Add the buffered counts to OCRVariantStat and reload the shared totals"""
+        with self._lock:
+            pending = {variant: counts for variant, counts in self._pending.items() if counts[0]}
+            if not pending:
+                return
+            self._pending = {variant: [0, 0] for variant in self.default_order}
+            self._pending_photos = 0
+            for variant, (attempts, successes) in pending.items():
+                self.stats[variant][0] += attempts
+                self.stats[variant][1] += successes
+
+        try:
+            for variant, (attempts, successes) in pending.items():
+                OCRVariantStat.objects.get_or_create(variant=variant)
+                OCRVariantStat.objects.filter(variant=variant).update(
+                    attempts=F('attempts') + attempts,
+                    successes=F('successes') + successes,
+                )
+        except DatabaseError as e:
+            # The counts stay in memory for this process; only persistence is lost
+            logger.warning(f"Could not save OCR variant statistics: {e}")
+            return
+        self.load()
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rating.models import MotorCar
+from .known_plates import get_known_plates
+
+
+# New plates can be snapped to straight away in this process (see known_plates.py)
+@receiver(post_save, sender=MotorCar)
+def add_known_plate(sender, instance, **kwargs):
+    known_plates = get_known_plates()
+    if known_plates is None:
+        return
+    transaction.on_commit(lambda: known_plates.add(instance.motor_car_number))
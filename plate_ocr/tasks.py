@@ -0,0 +1,66 @@
+import logging
+
+from celery import shared_task
+from celery.signals import worker_process_init
+from django.utils import timezone
+
+from .conf import ocr_setting
+from .extraction_log import log_extraction
+from .jobs import notify_job
+from .models import OCRJob
+from .ocr_engine import get_ocr_engine
+from .quotas import get_quota
+
+logger = logging.getLogger(__name__)
+
+
+@worker_process_init.connect
+def warm_up_ocr(**kwargs):
+    """Load the OCR models in every worker process; in a thread, as this hook must return quickly"""
+    if ocr_setting('WARM_UP'):
+        from .warmup import start_warm_up
+        start_warm_up()
+
+
+@shared_task(queue='ocr')
+def run_ocr_job(job_id, quota_client=None):
+    """
+    Extract the plate from a queued OCRJob's photo and publish the result.
+    quota_client's in-flight OCR slot, taken when the photo was uploaded, is
+    freed once the job finishes.
+    """
+    updated = OCRJob.objects.filter(id=job_id, status=OCRJob.STATUS_PENDING).update(
+        status=OCRJob.STATUS_RUNNING
+    )
+    if not updated:
+        return f"OCR job {job_id} is not pending"
+    try:
+        return _run_job(OCRJob.objects.get(id=job_id))
+    finally:
+        if quota_client:
+            quota = get_quota()
+            if quota is not None:
+                quota.release(quota_client)
+
+
+def _run_job(job):
+    notify_job(job)
+
+    try:
+        with job.image.open('rb') as image_file:
+            result = get_ocr_engine().extract_from_upload(image_file)
+        log_extraction(result, user=job.user, ref=job.id)
+        job.result = result.to_dict()
+        job.status = OCRJob.STATUS_DONE
+    except Exception as e:
+        logger.error(f"OCR job {job.id} failed: {e}")
+        job.error = str(e)[:255]
+        job.status = OCRJob.STATUS_FAILED
+
+    # The photo is only needed for OCR
+    if job.image:
+        job.image.delete(save=False)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'error', 'status', 'image', 'finished_at'])
+    notify_job(job)
+    return f"OCR job {job.id} {job.status}"
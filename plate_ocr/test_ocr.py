@@ -146,6 +146,14 @@ def test_ocr_engines():
     except Exception as e:
         print(f"  ⚠ Tesseract: NOT AVAILABLE ({e})")
         print("    Install from: https://github.com/UB-Mannheim/tesseract/wiki")
+
+    # Test tesserocr (in-process Tesseract)
+    try:
+        import tesserocr
+        print(f"  ✓ tesserocr: {tesserocr.tesseract_version().splitlines()[0]}")
+    except ImportError:
+        print("  ⚠ tesserocr: NOT INSTALLED (optional, falls back to pytesseract)")
+        print("    Run: pip install tesserocr")
     
     return True
 
@@ -8,6 +8,18 @@ from django.contrib.auth import get_user_model
 import os
 
 
+def disable_ocr_quotas(test_case):
+    """
+    Turn per-client OCR quotas off for a test that posts photos: their
+    counters live in the shared cache and would carry over between tests.
+    Quotas themselves are tested in OCRQuotaTests.
+    """
+    from unittest import mock
+    patcher = mock.patch('plate_ocr.quotas.get_quota', return_value=None)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
 class PlateValidatorTests(TestCase):
     """Test the plate validation and formatting logic"""
 
@@ -81,6 +93,31 @@ class PlateValidatorTests(TestCase):
         formatted, fmt, is_valid = self.validator.validate_and_format("")
         self.assertFalse(is_valid)
 
+    def test_positional_corrections(self):
+        """Letters misread as digits and vice versa, by position"""
+        self.assertEqual(self.validator.validate_and_format("0A0T7AK")[0], "0A0T7AK")
+        self.assertEqual(self.validator.validate_and_format("0A O77 A K"),
+                         ("UA 077AK", self.PlateFormat.NEW_STANDARD, True))
+        self.assertEqual(self.validator.validate_and_format("UP 66S3"),
+                         ("UP 6653", self.PlateFormat.GOVERNMENT, True))
+        self.assertEqual(self.validator.apply_corrections("UDS1G4M", self.PlateFormat.LEGACY), "UDS164M")
+
+    def test_detect_format_uses_pattern_order(self):
+        """UAX123Y-shaped text is legacy, UMA055AF motorcycle"""
+        self.assertEqual(self.validator.detect_format("UAX 123Y"), self.PlateFormat.LEGACY)
+        self.assertEqual(self.validator.detect_format("UMA055AF"), self.PlateFormat.MOTORCYCLE)
+        self.assertEqual(self.validator.detect_format("UA077AKX"), self.PlateFormat.UNKNOWN)
+
+    def test_validate_many_deduplicates(self):
+        """Identical raw strings are validated once and results keep input order"""
+        from unittest import mock
+        texts = ["UA077AK", "noise", "UA077AK", "UP 6633", "noise"]
+        expected = [self.validator.validate_and_format(text) for text in texts]
+        with mock.patch.object(self.validator, 'validate_and_format',
+                               wraps=self.validator.validate_and_format) as validate:
+            self.assertEqual(self.validator.validate_many(texts), expected)
+        self.assertEqual(validate.call_count, 3)
+
 
 class PlatePatternTests(TestCase):
     """Test regex patterns for different plate formats"""
@@ -159,10 +196,1693 @@ class OCRAPITests(TestCase):
 
     def setUp(self):
         self.client = Client()
+        disable_ocr_quotas(self)
 
     def test_api_requires_photo(self):
         """Test API returns error without photo"""
         response = self.client.post(reverse('plate_ocr_api'))
         self.assertEqual(response.status_code, 400)
         data = response.json()
-        self.assertFalse(data['success'])
\ No newline at end of file
+        self.assertFalse(data['success'])
+
+class OCRCascadeTests(TestCase):
+    """Test the early-exit cascade in OCREngine.extract_plate"""
+
+    def setUp(self):
+        import numpy as np
+        from plate_ocr.ocr_engine import OCREngine
+        self.image = np.zeros((60, 200, 3), dtype=np.uint8)
+        self.OCREngine = OCREngine
+
+    def make_engine(self, easyocr_outputs, tesseract_outputs=(), regions=2, **kwargs):
+        """Engine with fake readers that replay the given outputs, one per call"""
+        engine = self.OCREngine(cascade=True, **kwargs)
+        easyocr_outputs, tesseract_outputs = iter(easyocr_outputs), iter(tesseract_outputs)
+        engine.calls = []
+
+        def reader(name, outputs):
+            def read(image):
+                engine.calls.append(name)
+                return next(outputs, [])
+            return read
+
+        engine._readers = lambda: [
+            ('easyocr', reader('easyocr', easyocr_outputs)),
+            ('tesseract', reader('tesseract', tesseract_outputs)),
+        ]
+        engine.preprocessor.detect_plate_region = lambda image, **kwargs: [
+            (image, (0, 0, 200, 60)) for _ in range(regions)
+        ]
+        return engine
+
+    def test_stops_at_first_confident_plate(self):
+        engine = self.make_engine([[('UA077AK', 0.9)]])
+        result = engine.extract_plate(self.image)
+        self.assertEqual(result.formatted_plate, 'UA 077AK')
+        self.assertEqual(result.ocr_calls, 1)
+        self.assertEqual(engine.calls, ['easyocr'])
+
+    def test_stops_when_two_calls_agree(self):
+        engine = self.make_engine([[('UA077AK', 0.5)]], [[('UA 077AK', 0.7)]])
+        result = engine.extract_plate(self.image)
+        self.assertEqual(result.formatted_plate, 'UA 077AK')
+        self.assertEqual(result.ocr_calls, 2)
+
+    def test_low_confidence_keeps_searching(self):
+        engine = self.make_engine([[('UA077AK', 0.3)], [('UMA055AF', 0.95)]])
+        result = engine.extract_plate(self.image)
+        self.assertEqual(result.formatted_plate, 'UMA 055AF')
+        self.assertEqual(result.ocr_calls, 3)
+
+    def test_call_budget_falls_back_to_best_seen(self):
+        engine = self.make_engine(
+            [[('UA077AK', 0.3)], [('UMA055AF', 0.4)]], max_ocr_calls=4,
+        )
+        result = engine.extract_plate(self.image)
+        self.assertEqual(result.formatted_plate, 'UMA 055AF')
+        self.assertEqual(result.ocr_calls, 4)
+        self.assertEqual(len(engine.calls), 4)
+
+    def test_no_plate_reports_every_call(self):
+        engine = self.make_engine([], regions=1)
+        result = engine.extract_plate(self.image)
+        self.assertEqual(result.formatted_plate, '')
+        self.assertEqual(result.ocr_calls, 12)  # 6 variants x 2 engines
+
+    def test_plate_like_regions_first(self):
+        engine = self.OCREngine(cascade=True)
+        square, wide = (None, (0, 0, 100, 100)), (None, (0, 0, 350, 100))
+        self.assertEqual(engine._order_regions([square, wide]), [wide, square])
+
+
+class OCRPoolTests(TestCase):
+    """Test the shared OCR process pool and its client"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from plate_ocr.ocr_engine import PlateResult, PlateFormat
+        from plate_ocr.pool import OCRPoolClient, OCRPoolServer
+        self.PlateResult = PlateResult
+        self.PlateFormat = PlateFormat
+        self.OCRPoolClient = OCRPoolClient
+        self.OCRPoolServer = OCRPoolServer
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        self.address = os.path.join(tmpdir, 'ocr.sock')
+
+    def start_server(self, **kwargs):
+        import threading
+        import time
+        server = self.OCRPoolServer(address=self.address, size=1, **kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        for _ in range(100):
+            if os.path.exists(self.address):
+                break
+            time.sleep(0.05)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_result_round_trip(self):
+        result = self.PlateResult(
+            plate_text='UA077AK', formatted_plate='UA 077AK', confidence=0.9,
+            plate_format=self.PlateFormat.NEW_STANDARD, bounding_box=(1, 2, 3, 4),
+            raw_detections=['UA077AK'], ocr_calls=3,
+        )
+        self.assertEqual(self.PlateResult.from_dict(result.to_dict()), result)
+
+    def test_client_rejects_oversized_image(self):
+        client = self.OCRPoolClient(address=self.address, max_image_bytes=10)
+        result = client.extract_from_bytes(b'x' * 11)
+        self.assertEqual(result.error, 'Image too large')
+
+    def test_client_reports_unavailable_pool(self):
+        client = self.OCRPoolClient(address=self.address)
+        result = client.extract_from_bytes(b'not an image')
+        self.assertEqual(result.error, 'OCR service unavailable')
+
+    def test_pool_processes_photo(self):
+        import cv2
+        import numpy as np
+        self.start_server(timeout=120)
+        client = self.OCRPoolClient(address=self.address, timeout=120)
+
+        _, blank = cv2.imencode('.png', np.zeros((60, 200, 3), dtype=np.uint8))
+        result = client.extract_from_bytes(blank.tobytes())
+        self.assertEqual(result.error, 'No valid Uganda plate detected')
+
+        result = client.extract_from_bytes(b'not an image')
+        self.assertEqual(result.error, 'Could not decode image')
+
+
+class PlateDetectionScalingTests(TestCase):
+    """Test plate detection on a downscaled working copy"""
+
+    def setUp(self):
+        import numpy as np
+        from plate_ocr.ocr_engine import ImagePreprocessor
+        self.preprocessor = ImagePreprocessor
+        # Large dark photo with one white plate-shaped rectangle
+        self.image = np.zeros((3000, 4000, 3), dtype=np.uint8)
+        self.image[1400:1600, 1500:2200] = 255
+
+    def test_boxes_are_in_original_pixels(self):
+        timings = {}
+        regions = self.preprocessor.detect_plate_region(self.image, max_edge=800, timings=timings)
+        region, (x1, y1, x2, y2) = regions[0]
+        self.assertLessEqual(abs(x1 - 1490), 10)
+        self.assertLessEqual(abs(y1 - 1390), 10)
+        self.assertLessEqual(abs(x2 - 2210), 10)
+        self.assertLessEqual(abs(y2 - 1610), 10)
+        # Cropped from the full-resolution photo
+        self.assertEqual(region.shape[:2], (y2 - y1, x2 - x1))
+        self.assertIn('detect_resize', timings)
+        self.assertIn('bilateral', timings)
+
+    def test_matches_full_resolution_detection(self):
+        full = self.preprocessor.detect_plate_region(self.image)
+        scaled = self.preprocessor.detect_plate_region(self.image, max_edge=1000)
+        for (_, full_box), (_, scaled_box) in zip(full, scaled):
+            for a, b in zip(full_box, scaled_box):
+                self.assertLessEqual(abs(a - b), 10)
+
+    def test_region_max_edge_shrinks_large_regions(self):
+        import numpy as np
+        blank = np.zeros((3000, 4000, 3), dtype=np.uint8)
+        region, bbox = self.preprocessor.detect_plate_region(blank, max_edge=800, region_max_edge=1000)[0]
+        self.assertEqual(bbox, (0, 0, 4000, 3000))
+        self.assertEqual(region.shape[:2], (750, 1000))
+
+
+class PreprocessPipelineTests(TestCase):
+    """Test lazily computed OCR variants with shared intermediates and reused buffers"""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+        rng = np.random.default_rng(0)
+        self.image = cv2.resize(rng.integers(0, 255, (12, 16, 3), dtype=np.uint8), (640, 480))
+
+    def test_variants_match_reference(self):
+        import cv2
+        import numpy as np
+        from plate_ocr.ocr_engine import ImagePreprocessor
+        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+        adaptive = cv2.adaptiveThreshold(clahe, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        expected = [
+            clahe, adaptive,
+            cv2.threshold(clahe, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],
+            cv2.bitwise_not(adaptive),
+            cv2.morphologyEx(adaptive, cv2.MORPH_CLOSE, np.ones((2, 2), np.uint8)),
+            cv2.filter2D(clahe, -1, np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])),
+        ]
+        for variant, reference in zip(ImagePreprocessor.preprocess_for_ocr(self.image), expected):
+            np.testing.assert_array_equal(variant, reference)
+
+    def test_only_requested_variants_are_computed(self):
+        from plate_ocr.ocr_engine import PreprocessPipeline
+        pipeline = PreprocessPipeline()
+        variants = pipeline.variants(self.image, names=('otsu', 'inverted'))
+        self.assertEqual(next(variants)[0], 'otsu')
+        self.assertEqual(set(pipeline._computed), {'gray', 'clahe', 'otsu'})
+
+    def test_buffers_reused_and_gray_shared_with_detection(self):
+        import numpy as np
+        from plate_ocr.ocr_engine import ImagePreprocessor, PreprocessPipeline
+        pipeline = PreprocessPipeline()
+        first = dict(pipeline.variants(self.image[:100, :300], (0, 0, 300, 100)))
+        second = dict(pipeline.variants(self.image[200:260, 100:300], (100, 200, 300, 260)))
+        self.assertTrue(np.shares_memory(first['otsu'], second['otsu']))
+
+        ImagePreprocessor.detect_plate_region(self.image, pipeline=pipeline)
+        variants = dict(pipeline.variants(self.image[200:260, 100:300], (100, 200, 300, 260), names=('clahe',)))
+        self.assertTrue(np.shares_memory(pipeline._computed['gray'], pipeline._gray))
+        np.testing.assert_array_equal(variants['clahe'], second['clahe'])
+
+
+class OCRResultCacheTests(TestCase):
+    """Test the content-addressed OCR result cache"""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+        from plate_ocr.cache import CachedOCREngine, OCRResultCache
+        from plate_ocr.ocr_engine import PlateResult, PlateFormat
+
+        class FakeEngine:
+            calls = 0
+
+            def extract_from_bytes(self, image_bytes):
+                self.calls += 1
+                if image_bytes == b'broken':
+                    return PlateResult.failed('OCR service unavailable')
+                return PlateResult(
+                    plate_text='UA077AK', formatted_plate='UA 077AK', confidence=0.9,
+                    plate_format=PlateFormat.NEW_STANDARD,
+                )
+
+        self.engine = FakeEngine()
+        self.make_cached = lambda **kwargs: CachedOCREngine(
+            self.engine, OCRResultCache(**{'max_size': 2, 'ttl': 60, **kwargs}),
+        )
+        rng = np.random.default_rng(0)
+        photo = cv2.resize(rng.integers(0, 255, (8, 8, 3), dtype=np.uint8), (400, 300))
+        self.png = cv2.imencode('.png', photo)[1].tobytes()
+        self.jpeg = cv2.imencode('.jpg', photo, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+    def test_same_bytes_hit(self):
+        cached = self.make_cached()
+        first = cached.extract_from_bytes(self.png)
+        second = cached.extract_from_bytes(self.png)
+        self.assertEqual(self.engine.calls, 1)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+    def test_failures_are_not_cached(self):
+        cached = self.make_cached()
+        cached.extract_from_bytes(b'broken')
+        cached.extract_from_bytes(b'broken')
+        self.assertEqual(self.engine.calls, 2)
+
+    def test_lru_eviction(self):
+        cached = self.make_cached()
+        for image in (b'a', b'b', b'a', b'c', b'a', b'b'):
+            cached.extract_from_bytes(image)
+        # b was the least recently used when c arrived
+        self.assertEqual(self.engine.calls, 4)
+
+    def test_ttl_expiry(self):
+        cached = self.make_cached(ttl=0)
+        cached.extract_from_bytes(self.png)
+        cached.extract_from_bytes(self.png)
+        self.assertEqual(self.engine.calls, 2)
+
+    def test_reencoded_photo_needs_phash(self):
+        cached = self.make_cached()
+        cached.extract_from_bytes(self.png)
+        cached.extract_from_bytes(self.jpeg)
+        self.assertEqual(self.engine.calls, 2)
+
+        cached = self.make_cached(use_phash=True)
+        cached.extract_from_bytes(self.png)
+        cached.extract_from_bytes(self.jpeg)
+        self.assertEqual(self.engine.calls, 3)
+
+
+class OCRJobTests(TestCase):
+    """Test asynchronous OCR jobs, the status endpoint and the wizard hand-off"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from unittest import mock
+        from django.conf import settings
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from plate_ocr.ocr_engine import PlateResult, PlateFormat
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        # Users are saved with the default profile picture
+        shutil.copy(os.path.join(settings.MEDIA_ROOT, 'default.jpg'), media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.photo = lambda: SimpleUploadedFile('plate.jpg', b'photo bytes', content_type='image/jpeg')
+        self.result = PlateResult(
+            plate_text='UA077AK', formatted_plate='UA 077AK', confidence=0.9,
+            plate_format=PlateFormat.NEW_STANDARD,
+        )
+        engine = mock.Mock()
+        engine.extract_from_upload.return_value = self.result
+        patcher = mock.patch('plate_ocr.tasks.get_ocr_engine', return_value=engine)
+        self.engine = engine
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        from plate_ocr.extraction_log import ExtractionLogWriter
+        self.log_writer = ExtractionLogWriter(background=False)
+        patcher = mock.patch('plate_ocr.extraction_log.get_log_writer', return_value=self.log_writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        disable_ocr_quotas(self)
+
+    def submit(self, client, url, data):
+        from unittest import mock
+        from plate_ocr.tasks import run_ocr_job
+        with mock.patch.object(run_ocr_job, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post(url, data)
+        return response, delay
+
+    def test_api_returns_job_and_runs_it(self):
+        from plate_ocr.models import OCRJob
+        from plate_ocr.tasks import run_ocr_job
+
+        client = Client()
+        response, delay = self.submit(client, reverse('plate_ocr_api'), {'photo': self.photo()})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        delay.assert_called_once_with(job_id)
+
+        status_url = reverse('plate_ocr_job_status', args=[job_id])
+        self.assertEqual(client.get(status_url).json()['status'], 'pending')
+        # Another browser cannot see the job
+        self.assertEqual(Client().get(status_url).status_code, 404)
+
+        read = []
+        self.engine.extract_from_upload.side_effect = lambda upload: read.append(upload.read()) or self.result
+        run_ocr_job(job_id)
+        self.assertEqual(read, [b'photo bytes'])
+        payload = client.get(status_url).json()
+        self.assertEqual(payload['status'], 'done')
+        self.assertTrue(payload['success'])
+        self.assertEqual(payload['result']['formatted_plate'], 'UA 077AK')
+        self.assertFalse(OCRJob.objects.get(id=job_id).image)
+
+    def test_job_notifies_websocket_group(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from plate_ocr.jobs import job_group, submit_job
+        from plate_ocr.tasks import run_ocr_job
+
+        from django.test import override_settings
+
+        job = submit_job(self.photo(), session_key='abc')
+        # Web and worker share one process here, so the in-memory layer stands in for redis
+        with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+            layer = get_channel_layer()
+            channel = async_to_sync(layer.new_channel)()
+            async_to_sync(layer.group_add)(job_group(job.id), channel)
+
+            run_ocr_job(str(job.id))
+            statuses = [async_to_sync(layer.receive)(channel)['job']['status'] for _ in range(2)]
+        self.assertEqual(statuses, ['running', 'done'])
+
+    def test_notify_survives_unavailable_layer(self):
+        from unittest import mock
+        from plate_ocr.jobs import notify_job, submit_job
+        from plate_ocr.models import OCRJob
+        from plate_ocr.tasks import run_ocr_job
+
+        job = submit_job(self.photo(), session_key='abc')
+        with mock.patch('plate_ocr.jobs.get_channel_layer', side_effect=ConnectionError('redis is down')), \
+                self.assertLogs('plate_ocr.jobs', 'WARNING') as logs:
+            self.assertIsNone(notify_job(job))
+            run_ocr_job(str(job.id))
+        self.assertIn('redis is down', logs.output[0])
+        # The job still finishes; clients fall back to polling the status endpoint
+        job = OCRJob.objects.get(id=job.id)
+        self.assertEqual(job.status, OCRJob.STATUS_DONE)
+        self.assertEqual(job.result['formatted_plate'], 'UA 077AK')
+
+    def test_failed_ocr_marks_job_failed(self):
+        from plate_ocr.jobs import submit_job
+        from plate_ocr.models import OCRJob
+        from plate_ocr.tasks import run_ocr_job
+
+        self.engine.extract_from_upload.side_effect = RuntimeError('boom')
+        job = submit_job(self.photo(), session_key='abc')
+        run_ocr_job(str(job.id))
+        job = OCRJob.objects.get(id=job.id)
+        self.assertEqual(job.status, OCRJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'boom')
+
+    def test_wizard_waits_for_job_then_confirms(self):
+        from plate_ocr.tasks import run_ocr_job
+
+        User = get_user_model()
+        User.objects.create_user(id=1, added_by_id=1, email='ocr@example.com', password='testpass123')
+        client = Client()
+        client.login(email='ocr@example.com', password='testpass123')
+        wizard = reverse('photo_rating_wizard')
+
+        response, _ = self.submit(client, wizard, {
+            'motor_type': 'car', 'input_method': 'photo',
+            'current_step': 'capture', 'photo': self.photo(),
+        })
+        self.assertRedirects(response, wizard + '?step=processing', fetch_redirect_response=False)
+        job_id = client.session['photo_rating']['ocr_job']
+
+        # Still queued: the confirm step sends the user back to wait
+        response = client.get(wizard + '?step=confirm_plate')
+        self.assertRedirects(response, wizard + '?step=processing', fetch_redirect_response=False)
+
+        run_ocr_job(job_id)
+        response = client.get(wizard + '?step=confirm_plate')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'UA 077AK')
+        self.assertNotIn('ocr_job', client.session['photo_rating'])
+
+    def test_wizard_releases_slot_when_submit_fails(self):
+        from unittest import mock
+        from django.core.cache import caches
+        from django.test import override_settings
+        from plate_ocr.quotas import OCRQuota
+
+        User = get_user_model()
+        User.objects.create_user(id=1, added_by_id=1, email='ocr@example.com', password='testpass123')
+        client = Client()
+        client.login(email='ocr@example.com', password='testpass123')
+        quota = OCRQuota({'Registered': {'concurrent': 1}}, cache_alias='ocr-job-tests')
+        cache = {'ocr-job-tests': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                   'LOCATION': 'ocr-job-tests'}}
+        with override_settings(CACHES=cache), \
+                mock.patch('plate_ocr.quotas.get_quota', return_value=quota), \
+                mock.patch('plate_ocr.views.submit_job', side_effect=OSError('disk full')) as submit:
+            caches['ocr-job-tests'].clear()
+            response = client.post(reverse('photo_rating_wizard'), {
+                'motor_type': 'car', 'input_method': 'photo',
+                'current_step': 'capture', 'photo': self.photo(),
+            })
+            self.assertRedirects(response, reverse('photo_rating_wizard'), fetch_redirect_response=False)
+            submit.assert_called_once()
+            self.assertIsNotNone(quota.usage('user:1')['inflight'])
+            self.assertEqual(quota.usage('user:1')['inflight'], 0)
+
+    def test_job_extraction_is_logged_and_correction_recorded(self):
+        from plate_ocr.models import OCRExtractionLog
+        from plate_ocr.tasks import run_ocr_job
+
+        User = get_user_model()
+        User.objects.create_user(id=1, added_by_id=1, email='ocr@example.com', password='testpass123')
+        client = Client()
+        client.login(email='ocr@example.com', password='testpass123')
+        wizard = reverse('photo_rating_wizard')
+        self.submit(client, wizard, {
+            'motor_type': 'car', 'input_method': 'photo',
+            'current_step': 'capture', 'photo': self.photo(),
+        })
+        job_id = client.session['photo_rating']['ocr_job']
+        run_ocr_job(job_id)
+        client.get(wizard + '?step=confirm_plate')
+
+        # Nothing is written until the buffer is flushed
+        self.assertFalse(OCRExtractionLog.objects.exists())
+        self.log_writer.flush()
+        log = OCRExtractionLog.objects.get(ref=job_id)
+        self.assertTrue(log.success)
+        self.assertEqual(log.formatted_plate, 'UA 077AK')
+        self.assertEqual(log.user.email, 'ocr@example.com')
+
+        response = client.post(wizard, {
+            'current_step': 'confirm_plate', 'action': 'correct', 'corrected_plate': 'UAX 123Y',
+        })
+        self.assertRedirects(response, wizard + '?step=rate', fetch_redirect_response=False)
+        self.log_writer.flush()
+        log.refresh_from_db()
+        self.assertTrue(log.user_corrected)
+        self.assertEqual(log.corrected_plate, 'UAX 123Y')
+
+
+class RegionSuppressionTests(TestCase):
+    """Test vectorized overlap suppression of plate region candidates"""
+
+    def setUp(self):
+        import numpy as np
+        from plate_ocr.ocr_engine import ImagePreprocessor
+        self.np = np
+        self.suppress = ImagePreprocessor._suppress_overlaps
+
+    def test_larger_box_wins(self):
+        boxes = self.np.array([[10, 10, 110, 40], [0, 0, 200, 60], [300, 0, 400, 30]])
+        self.assertEqual(self.suppress(boxes).tolist(), [1, 2])
+
+    def test_small_overlap_is_kept(self):
+        # Only 40% of the second box lies inside the first
+        boxes = self.np.array([[0, 0, 200, 100], [160, 0, 260, 100]])
+        self.assertEqual(self.suppress(boxes).tolist(), [0, 1])
+
+    def test_empty_and_limit(self):
+        self.assertEqual(self.suppress(self.np.empty((0, 4))).tolist(), [])
+        boxes = self.np.array([[i * 100, 0, i * 100 + 90, 30] for i in range(8)])
+        self.assertEqual(len(self.suppress(boxes)), 5)
+
+    def test_matches_python_reference(self):
+        from plate_ocr.management.commands.benchmark_region_nms import python_nms, synthetic_boxes
+        rng = self.np.random.default_rng(1)
+        for count in (1, 20, 300):
+            boxes = synthetic_boxes(count, rng)
+            kept = [tuple(box) for box in boxes[self.suppress(boxes)].tolist()]
+            self.assertEqual(kept, python_nms([tuple(box) for box in boxes.tolist()]))
+
+
+class VariantSchedulerTests(TestCase):
+    """Test the adaptive preprocessing-variant scheduler"""
+
+    def setUp(self):
+        import random
+        from plate_ocr.scheduler import VariantScheduler
+        self.make = lambda **kwargs: VariantScheduler(**{
+            'exploration': 0, 'min_attempts': 10, 'prune_below': 0.1, 'flush_every': 5,
+            'rng': random.Random(0), 'background': False, **kwargs,
+        })
+
+    def test_default_order_without_data(self):
+        from plate_ocr.ocr_engine import OCREngine
+        self.assertEqual(self.make().order(), OCREngine.CASCADE_VARIANT_ORDER)
+
+    def test_orders_by_success_and_prunes_losers(self):
+        scheduler = self.make()
+        for _ in range(12):
+            scheduler.record(['clahe', 'otsu', 'inverted'], 'otsu')
+        order = scheduler.order()
+        self.assertEqual(order[0], 'otsu')
+        self.assertNotIn('clahe', order)
+        self.assertNotIn('inverted', order)
+        # Untried variants are still in play
+        self.assertIn('sharpened', order)
+
+    def test_exploration_puts_random_variant_first(self):
+        scheduler = self.make(exploration=1.0)
+        for _ in range(12):
+            scheduler.record(['clahe', 'otsu', 'inverted'], 'otsu')
+        firsts = {scheduler.order()[0] for _ in range(50)}
+        self.assertIn('inverted', firsts)
+
+    def test_statistics_persist_and_reload(self):
+        from plate_ocr.models import OCRVariantStat
+        scheduler = self.make()
+        for _ in range(5):
+            scheduler.record(['clahe', 'otsu'], 'otsu')
+        self.assertEqual(OCRVariantStat.objects.get(variant='otsu').successes, 5)
+        self.assertEqual(OCRVariantStat.objects.get(variant='clahe').attempts, 5)
+
+        reloaded = self.make()
+        reloaded.load()
+        self.assertEqual(reloaded.order()[0], 'otsu')
+
+    def test_background_flush_adds_no_queries(self):
+        import threading
+        from unittest import mock
+        scheduler = self.make(background=True)
+        flushed = threading.Event()
+        with mock.patch.object(scheduler, 'flush', side_effect=flushed.set):
+            with self.assertNumQueries(0):
+                for _ in range(5):
+                    scheduler.record(['clahe', 'otsu'], 'otsu')
+            self.assertTrue(flushed.wait(5))
+        self.assertEqual(scheduler._thread.name, 'ocr-variant-stats')
+
+    def test_engine_records_winning_variant(self):
+        import numpy as np
+        from plate_ocr.ocr_engine import OCREngine
+        scheduler = self.make(flush_every=100)
+        engine = OCREngine(cascade=True, scheduler=scheduler)
+        outputs = iter([[], [('UA077AK', 0.95)]])
+        engine._readers = lambda: [('easyocr', lambda image: next(outputs, []))]
+        engine.preprocessor.detect_plate_region = lambda image, **kwargs: [(image, (0, 0, 200, 60))]
+
+        result = engine.extract_plate(np.zeros((60, 200, 3), dtype=np.uint8))
+        self.assertEqual(result.variant, 'otsu')
+        self.assertEqual(result.region_rank, 0)
+        self.assertEqual(scheduler._counts('clahe'), (1, 0))
+        self.assertEqual(scheduler._counts('otsu'), (1, 1))
+
+
+class OCRBenchmarkTests(TestCase):
+    """Tests for the labeled-image benchmark harness"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        self.image_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.image_dir, True)
+        for name in ('a.jpg', 'b.jpg'):
+            shutil.copy(os.path.join(os.path.dirname(__file__), 'plate_image.jpg'),
+                        os.path.join(self.image_dir, name))
+
+    def test_load_labels_csv_and_json(self):
+        import json
+        from pathlib import Path
+        from plate_ocr.benchmark import load_labels
+        image_dir = Path(self.image_dir)
+        (image_dir / 'labels.csv').write_text("filename,plate\na.jpg,UAX 123Y\nb.jpg, UA 077AK\n")
+        self.assertEqual(load_labels(image_dir), {'a.jpg': 'UAX 123Y', 'b.jpg': 'UA 077AK'})
+
+        (image_dir / 'other.json').write_text(json.dumps({'a.jpg': 'UP 6633'}))
+        self.assertEqual(load_labels(image_dir, image_dir / 'other.json'), {'a.jpg': 'UP 6633'})
+
+    def test_summarize_percentiles_and_formats(self):
+        from plate_ocr.benchmark import summarize
+        records = [
+            {'expected_format': 'new', 'correct': i % 2 == 0, 'latency_ms': float(i), 'ocr_calls': 2,
+             'timings': {'detect': 1.0}}
+            for i in range(1, 101)
+        ]
+        summary = summarize(records)
+        self.assertEqual(summary['accuracy'], 0.5)
+        self.assertEqual(summary['per_format']['new'], {'images': 100, 'correct': 50, 'accuracy': 0.5})
+        self.assertEqual(summary['latency_ms']['p50'], 50.5)
+        self.assertEqual(summary['latency_ms']['max'], 100.0)
+        self.assertEqual(summary['ocr_calls_per_image'], 2)
+        self.assertEqual(summary['stage_ms_per_image'], {'detect': 1.0})
+
+    def test_run_benchmark_report(self):
+        from pathlib import Path
+        from unittest import mock
+        from plate_ocr.benchmark import run_benchmark
+        from plate_ocr.ocr_engine import OCREngine
+
+        labels = {'a.jpg': 'UA 077AK', 'b.jpg': 'UAX 123Y', 'missing.jpg': 'UP 6633'}
+        # Both photos "read" as UA 077AK, so one of the two is correct
+        with mock.patch.object(OCREngine, '_readers',
+                               lambda engine: [('easyocr', lambda image: [('UA077AK', 0.95)])]):
+            report = run_benchmark(Path(self.image_dir), labels,
+                                   {'backends': [], 'cascade': True})
+
+        summary = report['summary']
+        self.assertEqual(report['missing_files'], ['missing.jpg'])
+        self.assertEqual(summary['images'], 2)
+        self.assertEqual(summary['correct'], 1)
+        self.assertEqual(summary['per_format']['new']['accuracy'], 1.0)
+        self.assertEqual(summary['per_format']['legacy']['accuracy'], 0.0)
+        self.assertIn('detect', report['results'][0]['timings'])
+        self.assertIn('decode', report['results'][0]['timings'])
+        self.assertEqual(report['results'][0]['ocr_calls'], 1)
+
+
+class ExtractionLogTests(TestCase):
+    """Test buffered OCRExtractionLog writing and the OCR report"""
+
+    def setUp(self):
+        from unittest import mock
+        from plate_ocr.extraction_log import ExtractionLogWriter
+        self.writer = ExtractionLogWriter(batch_size=3, background=False)
+        patcher = mock.patch('plate_ocr.extraction_log.get_log_writer', return_value=self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def result(self, plate='UA 077AK', engine='easyocr', total_ms=100):
+        from plate_ocr.ocr_engine import PlateResult, PlateFormat, NO_PLATE_ERROR
+        timings = {'detect': total_ms * 0.4, 'ocr_easyocr': total_ms * 0.6}
+        if plate is None:
+            result = PlateResult.failed(NO_PLATE_ERROR)
+            result.timings = timings
+            return result
+        return PlateResult(
+            plate_text=plate.replace(' ', ''), formatted_plate=plate, confidence=0.9,
+            plate_format=PlateFormat.NEW_STANDARD, engine=engine, ocr_calls=2, timings=timings,
+        )
+
+    def test_rows_are_buffered_until_flush(self):
+        from plate_ocr.extraction_log import log_extraction
+        from plate_ocr.models import OCRExtractionLog
+        ref = log_extraction(self.result(), ip_address='10.0.0.1')
+        log_extraction(self.result(plate=None))
+        self.assertFalse(OCRExtractionLog.objects.exists())
+
+        self.writer.flush()
+        log = OCRExtractionLog.objects.get(ref=ref)
+        self.assertEqual(log.engine_used, 'easyocr')
+        self.assertEqual(log.processing_time_ms, 100)
+        self.assertEqual(log.timings, {'detect': 40.0, 'ocr_easyocr': 60.0})
+        self.assertEqual(log.ocr_calls, 2)
+        failed = OCRExtractionLog.objects.get(success=False)
+        # Failures are attributed to the engines that ran
+        self.assertEqual(failed.engine_used, 'easyocr')
+        self.assertEqual(failed.plate_format, '')
+
+    def test_correction_of_buffered_row(self):
+        from plate_ocr.extraction_log import log_extraction, mark_corrected
+        from plate_ocr.models import OCRExtractionLog
+        ref = log_extraction(self.result())
+        mark_corrected(str(ref), 'UAX 123Y')
+        self.writer.flush()
+        self.assertEqual(OCRExtractionLog.objects.get(ref=ref).corrected_plate, 'UAX 123Y')
+
+    def test_disabled(self):
+        from django.test import override_settings
+        from plate_ocr.extraction_log import log_extraction
+        with override_settings(PLATE_OCR={'EXTRACTION_LOG': False}):
+            self.assertIsNone(log_extraction(self.result()))
+        self.assertEqual(self.writer._rows, {})
+
+    def test_report_percentiles_and_rates(self):
+        from plate_ocr.extraction_log import extraction_report, log_extraction
+        for ms in range(10, 101, 10):
+            log_extraction(self.result(total_ms=ms))
+        log_extraction(self.result(plate=None, total_ms=1000))
+        self.writer.flush()
+
+        report = extraction_report(days=1)
+        self.assertEqual(report['overall']['photos'], 11)
+        self.assertEqual(report['overall']['successes'], 10)
+        self.assertEqual(report['overall']['p50_ms'], 60)
+        self.assertEqual(report['by_format'][0]['plate_format'], 'new')
+        self.assertEqual(report['by_format'][0]['p50_ms'], 55)
+        self.assertAlmostEqual(report['stages']['detect'], 1550 * 0.4 / 11, places=1)
+
+    def test_report_view_is_staff_only(self):
+        User = get_user_model()
+        User.objects.create_user(id=1, added_by_id=1, email='staff@example.com', password='testpass123')
+        client = Client()
+        client.login(email='staff@example.com', password='testpass123')
+        self.assertEqual(client.get(reverse('plate_ocr_report')).status_code, 302)
+
+        User.objects.filter(id=1).update(is_staff=True)
+        response = client.get(reverse('plate_ocr_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'By engine')
+
+
+class OCRBackendTests(TestCase):
+    """Test pluggable OCR backends and the plate character recognizer"""
+
+    def test_engine_backends_from_names_and_flags(self):
+        from plate_ocr.backends import EasyOCRBackend, PlateCharBackend
+        from plate_ocr.ocr_engine import OCREngine
+        engine = OCREngine(backends=['platechar', 'easyocr'])
+        self.assertEqual([b.name for b in engine.backends], ['platechar', 'easyocr'])
+        self.assertIsInstance(engine.backends[0], PlateCharBackend)
+        self.assertEqual([b.name for b in OCREngine(use_tesseract=False).backends], ['easyocr'])
+        self.assertIsInstance(OCREngine().backends[0], EasyOCRBackend)
+        with self.assertRaises(ValueError):
+            OCREngine(backends=['nope'])
+
+    def test_custom_backend_feeds_validator(self):
+        import numpy as np
+        from plate_ocr.backends import OCRBackend
+        from plate_ocr.ocr_engine import OCREngine
+
+        class FixedBackend(OCRBackend):
+            name = 'fixed'
+
+            def load(self):
+                return True
+
+            def read(self, image):
+                return [('UA 077AK', 0.9)]
+
+        engine = OCREngine(backends=[FixedBackend()], cascade=True)
+        engine.preprocessor.detect_plate_region = lambda image, **kwargs: [(image, (0, 0, 200, 60))]
+        self.assertEqual(engine.warm_up(), ['fixed'])
+        result = engine.extract_plate(np.zeros((60, 200, 3), dtype=np.uint8))
+        self.assertEqual(result.formatted_plate, 'UA 077AK')
+        self.assertEqual(result.engine, 'fixed')
+        self.assertEqual(result.confidence, 0.9)
+
+    def test_tesserocr_handle_reused_per_thread(self):
+        import sys
+        import threading
+        import types
+        import numpy as np
+        from unittest import mock
+        from plate_ocr.backends import TesserocrBackend
+
+        handles = []
+
+        class FakeAPI:
+            def __init__(self, lang, psm):
+                self.psm, self.variables, self.images = psm, {}, []
+                handles.append(self)
+
+            def SetVariable(self, name, value):
+                self.variables[name] = value
+
+            def SetImageBytes(self, data, width, height, bytes_per_pixel, bytes_per_line):
+                self.images.append((len(data), width, height, bytes_per_pixel, bytes_per_line))
+
+            def GetUTF8Text(self):
+                return 'UAX 123Y\n'
+
+            def AllWordConfidences(self):
+                return [91, 78]
+
+        fake = types.SimpleNamespace(PyTessBaseAPI=FakeAPI, PSM=types.SimpleNamespace(SINGLE_LINE=7))
+        with mock.patch.dict(sys.modules, {'tesserocr': fake}):
+            backend = TesserocrBackend()
+            self.assertTrue(backend.available)
+            self.assertEqual(backend.read(np.zeros((40, 120), dtype=np.uint8)), [('UAX 123Y', 0.78)])
+            backend.read(np.zeros((40, 120, 3), dtype=np.uint8))
+            thread = threading.Thread(target=backend.read, args=(np.zeros((40, 120), dtype=np.uint8),))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(len(handles), 2)
+        self.assertEqual(handles[0].psm, 7)
+        self.assertEqual(handles[0].variables['tessedit_char_whitelist'], TesserocrBackend.WHITELIST)
+        self.assertEqual(handles[0].images, [(4800, 120, 40, 1, 120), (14400, 120, 40, 3, 360)])
+
+    def fake_easyocr(self, reader):
+        import sys
+        import types
+        from unittest import mock
+        patcher = mock.patch.dict(sys.modules, {'easyocr': types.SimpleNamespace(Reader=lambda *a, **kw: reader)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_easyocr_detects_once_per_region(self):
+        import numpy as np
+        from unittest import mock
+        from django.test import override_settings
+        from plate_ocr.backends import EasyOCRBackend
+        from plate_ocr.ocr_engine import ImagePreprocessor, OCREngine
+
+        reader = mock.Mock()
+        # One straight and one slanted box, the latter partly outside the region
+        reader.detect.return_value = ([[[10, 90, 5, 35]]], [[[[100, 2], [190, -3], [195, 40], [98, 45]]]])
+
+        def recognize(image, horizontal_list, free_list, batch_size):
+            self.assertEqual(image.shape, (60 * len(ImagePreprocessor.VARIANT_NAMES), 200))
+            self.assertEqual(batch_size, len(horizontal_list))
+            # Sorted by position, as EasyOCR returns them
+            boxes = sorted(horizontal_list, key=lambda box: box[2])
+            return [([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], 'UA 077AK' if y1 // 60 == 2 else 'X', 0.9)
+                    for x1, x2, y1, y2 in boxes]
+        reader.recognize.side_effect = recognize
+        self.fake_easyocr(reader)
+
+        with override_settings(PLATE_OCR={'TORCH_THREADS': None, 'EASYOCR_DETECT_ONCE': True}):
+            backend = EasyOCRBackend()
+            self.assertTrue(backend.available)
+        engine = OCREngine(backends=[backend])
+        engine.preprocessor.detect_plate_region = lambda image, **kwargs: [
+            (image, (0, 0, 200, 60)), (image, (0, 0, 200, 60)),
+        ]
+        result = engine.extract_plate(np.zeros((60, 200, 3), dtype=np.uint8))
+
+        self.assertEqual(result.formatted_plate, 'UA 077AK')
+        self.assertEqual(result.variant, ImagePreprocessor.VARIANT_NAMES[2])
+        self.assertEqual(result.ocr_calls, 2 * len(ImagePreprocessor.VARIANT_NAMES))
+        # Detection once per region, one recognizer call over every variant
+        self.assertEqual(reader.detect.call_count, 2)
+        self.assertEqual(reader.recognize.call_count, 2)
+        reader.readtext.assert_not_called()
+        boxes = reader.recognize.call_args[1]['horizontal_list']
+        self.assertEqual(boxes[:2], [[10, 90, 5, 35], [98, 195, 0, 45]])
+        self.assertEqual(boxes[2], [10, 90, 65, 95])
+
+    def test_easyocr_cascade_reuses_boxes(self):
+        import numpy as np
+        from unittest import mock
+        from django.test import override_settings
+        from plate_ocr.backends import EasyOCRBackend
+        from plate_ocr.ocr_engine import OCREngine
+
+        reader = mock.Mock()
+        reader.detect.return_value = ([[]], [[]])
+        reader.recognize.return_value = [([[0, 0], [200, 0], [200, 60], [0, 60]], 'X', 0.2)]
+        self.fake_easyocr(reader)
+        with override_settings(PLATE_OCR={'TORCH_THREADS': None, 'EASYOCR_DETECT_ONCE': True}):
+            backend = EasyOCRBackend()
+            self.assertTrue(backend.available)
+        engine = OCREngine(backends=[backend], cascade=True, max_ocr_calls=3)
+        engine.preprocessor.detect_plate_region = lambda image, **kwargs: [(image, (0, 0, 200, 60))]
+        result = engine.extract_plate(np.zeros((60, 200, 3), dtype=np.uint8))
+
+        self.assertEqual(result.ocr_calls, 3)
+        self.assertEqual(reader.detect.call_count, 1)
+        self.assertEqual(reader.recognize.call_count, 3)
+        # Nothing detected: the whole region is read
+        self.assertEqual(reader.recognize.call_args[1]['horizontal_list'], [[0, 200, 0, 60]])
+
+        with override_settings(PLATE_OCR={'TORCH_THREADS': None, 'EASYOCR_DETECT_ONCE': False}):
+            backend = EasyOCRBackend()
+            self.assertTrue(backend.available)
+        self.assertEqual(backend.region_reader(None), backend.read)
+
+    def test_tesserocr_falls_back_to_subprocess(self):
+        import sys
+        from unittest import mock
+        from plate_ocr.backends import TesseractBackend, TesserocrBackend
+        with mock.patch.dict(sys.modules, {'tesserocr': None}), \
+                mock.patch.object(TesseractBackend, 'load', return_value=True), \
+                mock.patch.object(TesseractBackend, 'read', return_value=[('UAX 123Y', 0.7)]):
+            backend = TesserocrBackend()
+            self.assertTrue(backend.available)
+            self.assertEqual(backend.read(None), [('UAX 123Y', 0.7)])
+
+    def test_platechar_unavailable_without_model(self):
+        from plate_ocr.backends import PlateCharBackend
+        self.assertFalse(PlateCharBackend(model_path='/nonexistent/plate_chars.onnx').available)
+
+    def test_segmentation_of_synthetic_plates(self):
+        import numpy as np
+        from plate_ocr.plate_recognizer import CHAR_SIZE, render_plate, segment_characters
+        rng = np.random.default_rng(1)
+        rows = segment_characters(render_plate('UAX 123Y', rng))
+        self.assertEqual([len(row) for row in rows], [7])
+        self.assertEqual(rows[0][0].shape, (CHAR_SIZE[1], CHAR_SIZE[0]))
+        rows = segment_characters(render_plate('UMA\n055AF', rng))
+        self.assertEqual([len(row) for row in rows], [3, 5])
+
+    def test_recognizer_reads_rows(self):
+        import numpy as np
+        from unittest import mock
+        from plate_ocr.plate_recognizer import PlateCharRecognizer, render_plate
+
+        recognizer = PlateCharRecognizer.__new__(PlateCharRecognizer)
+        recognizer.classify = mock.Mock(return_value=('UMA055AF', np.array([0.99] * 7 + [0.8])))
+        image = render_plate('UMA\n055AF', np.random.default_rng(2))
+        self.assertEqual(recognizer.read(image), ('UMA 055AF', 0.8))
+        self.assertEqual(len(recognizer.classify.call_args[0][0]), 8)
+        # Too few characters for a plate
+        self.assertIsNone(recognizer.read(np.full((60, 200, 3), 255, dtype=np.uint8)))
+
+
+class ImageDecodingTests(TestCase):
+    """Test the header-first, reduced-resolution upload decode"""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+        rng = np.random.default_rng(0)
+        photo = cv2.resize(rng.integers(0, 255, (8, 8, 3), dtype=np.uint8), (800, 600))
+        self.jpeg = cv2.imencode('.jpg', photo)[1].tobytes()
+        self.png = cv2.imencode('.png', photo)[1].tobytes()
+
+    def test_reduced_flag_from_header_size(self):
+        import cv2
+        from plate_ocr.decoding import ImageInfo, reduced_decode_flag
+        flag = lambda fmt, w, h: reduced_decode_flag(ImageInfo(fmt, w, h, 0), 1600)
+        self.assertEqual(flag('JPEG', 4000, 3000), cv2.IMREAD_REDUCED_COLOR_2)
+        self.assertEqual(flag('MPO', 8000, 6000), cv2.IMREAD_REDUCED_COLOR_4)
+        self.assertEqual(flag('JPEG', 2000, 1500), cv2.IMREAD_COLOR)
+        # Only the JPEG decoder scales while decoding
+        self.assertEqual(flag('PNG', 8000, 6000), cv2.IMREAD_COLOR)
+        self.assertEqual(reduced_decode_flag(ImageInfo('JPEG', 8000, 6000, 0), None), cv2.IMREAD_COLOR)
+
+    def test_reduced_decode(self):
+        from plate_ocr.decoding import decode_image
+        self.assertEqual(decode_image(self.jpeg).shape, (600, 800, 3))
+        self.assertEqual(decode_image(self.jpeg, target_edge=200).shape, (150, 200, 3))
+        self.assertEqual(decode_image(self.png, target_edge=200).shape, (600, 800, 3))
+
+    def test_rejected_before_decoding(self):
+        import io
+        from PIL import Image
+        from plate_ocr.decoding import ImageRejected, decode_image
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, 'GIF')
+        gif = buffer.getvalue()
+
+        with self.assertRaisesMessage(ImageRejected, 'too large'):
+            decode_image(self.jpeg, max_bytes=100)
+        with self.assertRaisesMessage(ImageRejected, '800x600'):
+            decode_image(self.jpeg, max_pixels=400 * 300)
+        with self.assertRaisesMessage(ImageRejected, 'Could not decode image'):
+            decode_image(b'not an image')
+        with self.assertRaisesMessage(ImageRejected, 'GIF'):
+            decode_image(gif)
+
+    def test_file_sources_match_bytes(self):
+        import io
+        import tempfile
+        import numpy as np
+        from plate_ocr.decoding import decode_image
+        expected = decode_image(self.jpeg, target_edge=400)
+        np.testing.assert_array_equal(decode_image(io.BytesIO(self.jpeg), target_edge=400), expected)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as f:
+            f.write(self.jpeg)
+            f.flush()
+            np.testing.assert_array_equal(decode_image(f.name, target_edge=400), expected)
+            f.seek(0)
+            np.testing.assert_array_equal(decode_image(f, target_edge=400), expected)
+
+    def test_engine_upload_and_cache_key(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from plate_ocr.cache import OCRResultCache
+        from plate_ocr.ocr_engine import OCREngine, PlateResult
+
+        engine = OCREngine(backends=[], decode_target_edge=400, max_image_pixels=1_000_000)
+        with mock.patch.object(engine, 'extract_plate', return_value=PlateResult.failed('x')) as extract:
+            engine.extract_from_upload(SimpleUploadedFile('car.jpg', self.jpeg))
+        self.assertEqual(extract.call_args[0][0].shape, (300, 400, 3))
+
+        engine.max_image_pixels = 1000
+        result = engine.extract_from_upload(SimpleUploadedFile('car.jpg', self.jpeg))
+        self.assertIn('too large', result.error)
+
+        cache = OCRResultCache(max_size=2, ttl=60)
+        self.assertEqual(cache.upload_key(SimpleUploadedFile('car.jpg', self.jpeg)), cache.key(self.jpeg))
+
+
+class BurstRecognitionTests(TestCase):
+    """Test frame selection, plate tracking and voting over bursts and video clips"""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+        from plate_ocr.plate_recognizer import render_plate
+        disable_ocr_quotas(self)
+        rng = np.random.default_rng(3)
+        plate = render_plate('UAX 123Y', rng)
+        self.plate_shape = plate.shape[:2]
+
+        def frame(dx, blur=0):
+            scene = cv2.resize(rng.integers(60, 120, (12, 24, 3), dtype=np.uint8), (960, 480))
+            scene[200:200 + plate.shape[0], 100 + dx:100 + dx + plate.shape[1]] = plate
+            return cv2.GaussianBlur(scene, (0, 0), blur) if blur else scene
+        self.frame = frame
+
+    def _engine(self):
+        from plate_ocr.backends import OCRBackend
+        from plate_ocr.ocr_engine import OCREngine
+
+        class FixedBackend(OCRBackend):
+            name = 'fixed'
+
+            def load(self):
+                return True
+
+            def read(self, image):
+                return [('UAX 123Y', 0.9)]
+
+        engine = OCREngine(backends=[FixedBackend()], cascade=True)
+        height, width = self.plate_shape
+        engine.detections = 0
+
+        def detect(image, **kwargs):
+            engine.detections += 1
+            bbox = (100, 200, 100 + width, 200 + height)
+            return [(image[200:200 + height, 100:100 + width], bbox)]
+        engine.preprocessor.detect_plate_region = detect
+        return engine
+
+    def test_sharpest_frames_streamed_in_order(self):
+        from plate_ocr.burst import sharpest_frames, sharpness
+        self.assertGreater(sharpness(self.frame(0)), sharpness(self.frame(0, blur=3)))
+        frames = [self.frame(0, blur=4), self.frame(0), self.frame(0, blur=2), self.frame(0, blur=0.5)]
+        selected, seen = sharpest_frames(iter(frames), 2)
+        self.assertEqual(seen, 4)
+        self.assertEqual([index for index, _ in selected], [1, 3])
+
+    def test_tracker_follows_plate(self):
+        from plate_ocr.burst import PlateTracker
+        height, width = self.plate_shape
+        tracker = PlateTracker()
+        tracker.update(self.frame(0), (100, 200, 100 + width, 200 + height))
+        self.assertEqual(tracker.locate(self.frame(25)), (125, 200, 125 + width, 200 + height))
+        blank = self.frame(0)
+        blank[:] = 90
+        self.assertIsNone(tracker.locate(blank))
+
+    def test_vote(self):
+        from plate_ocr.burst import vote
+        from plate_ocr.ocr_engine import NO_PLATE_ERROR, PlateFormat, PlateResult
+        read = lambda plate, confidence: PlateResult(
+            plate_text=plate, formatted_plate=plate, confidence=confidence,
+            plate_format=PlateFormat.LEGACY, raw_detections=[plate],
+        )
+        result = vote([read('UAX 123Y', 0.7), read('UAX 128Y', 0.95), read('UAX 123Y', 0.8),
+                       PlateResult.failed(NO_PLATE_ERROR)])
+        self.assertEqual(result.formatted_plate, 'UAX 123Y')
+        self.assertAlmostEqual(result.confidence, 0.8 * 2 / 3)
+        self.assertEqual(result.votes, {'UAX 123Y': 2, 'UAX 128Y': 1})
+        self.assertEqual(len(result.raw_detections), 3)
+
+        self.assertEqual(vote([PlateResult.failed(NO_PLATE_ERROR)]).error, NO_PLATE_ERROR)
+        self.assertEqual(vote([PlateResult.failed('Could not decode image')]).error, 'Could not decode image')
+
+    def test_burst_detects_once_and_tracks(self):
+        import cv2
+        from plate_ocr.burst import BurstRecognizer
+        engine = self._engine()
+        photos = [cv2.imencode('.jpg', self.frame(dx))[1].tobytes() for dx in (0, 10, 20, 30)]
+        result = BurstRecognizer(engine, top_frames=3).recognize_photos(photos + [b'not an image'])
+        self.assertEqual(result.formatted_plate, 'UAX 123Y')
+        self.assertEqual(result.votes, {'UAX 123Y': 3})
+        self.assertEqual(engine.detections, 1)
+        self.assertIn('select', result.timings)
+        self.assertIn('track', result.timings)
+
+        self.assertEqual(BurstRecognizer(engine).recognize_photos([b'x']).error, 'No frames could be decoded')
+
+    def test_video_frames(self):
+        import os
+        import tempfile
+        import cv2
+        from plate_ocr.burst import iter_video_frames
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'clip.avi')
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (960, 480))
+            if not writer.isOpened():
+                self.skipTest('OpenCV was built without a video writer')
+            for dx in range(10):
+                writer.write(self.frame(dx * 3))
+            writer.release()
+
+            frames = list(iter_video_frames(path, stride=3, max_edge=320))
+            self.assertEqual(len(frames), 4)
+            self.assertEqual(frames[0].shape, (160, 320, 3))
+            self.assertEqual(len(list(iter_video_frames(path, max_frames=2))), 2)
+
+    def test_burst_api(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from plate_ocr.ocr_engine import PlateFormat, PlateResult
+        recognizer = mock.Mock()
+        recognizer.recognize_photos.return_value = PlateResult(
+            plate_text='UAX123Y', formatted_plate='UAX 123Y', confidence=0.9,
+            plate_format=PlateFormat.LEGACY, votes={'UAX 123Y': 2},
+        )
+        url = reverse('plate_ocr_burst_api')
+        with mock.patch('plate_ocr.views.get_burst_recognizer', return_value=recognizer), \
+                mock.patch('plate_ocr.views.log_extraction') as log:
+            self.assertEqual(self.client.post(url).status_code, 400)
+            response = self.client.post(url, {'frames': [SimpleUploadedFile('a.jpg', b'a'),
+                                                         SimpleUploadedFile('b.jpg', b'b')]})
+        self.assertEqual(response.json()['plate'], 'UAX 123Y')
+        self.assertEqual(response.json()['votes'], {'UAX 123Y': 2})
+        self.assertEqual(len(recognizer.recognize_photos.call_args[0][0]), 2)
+        self.assertEqual(log.call_args[1]['input_method'], 'burst')
+
+
+class OCRWarmUpTests(TestCase):
+    """Test background OCR warm-up and the readiness endpoint"""
+
+    def setUp(self):
+        from unittest import mock
+        from plate_ocr import warmup
+        patcher = mock.patch.dict(warmup._state, {'status': warmup.COLD, 'backends': [],
+                                                  'duration_ms': None, 'error': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _engine(self, backends):
+        from plate_ocr.backends import OCRBackend
+        from plate_ocr.ocr_engine import OCREngine
+
+        class RecordingBackend(OCRBackend):
+            name = 'recording'
+            images = []
+
+            def load(self):
+                return True
+
+            def read(self, image):
+                self.images.append(image.shape)
+                return []
+
+        return OCREngine(backends=[RecordingBackend() for _ in range(backends)])
+
+    def test_warm_up_runs_inference_and_reports_ready(self):
+        from unittest import mock
+        from django.test import override_settings
+        from plate_ocr import warmup
+        engine = self._engine(1)
+        url = reverse('plate_ocr_ready')
+        with override_settings(PLATE_OCR={'WARM_UP': True}), \
+                mock.patch.dict('os.environ', {warmup.WARM_UP_ENV: '1'}):
+            with mock.patch('plate_ocr.warmup.start_warm_up') as start:
+                response = self.client.get(url)
+            # The probe itself starts the warm-up
+            start.assert_called_once_with()
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()['status'], 'cold')
+
+            with mock.patch('plate_ocr.ocr_engine.get_ocr_engine', return_value=engine):
+                warmup.warm_up_engine()
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['backends'], ['recording'])
+        self.assertIsNotNone(response.json()['duration_ms'])
+        self.assertEqual(len(engine.backends[0].images), 1)
+
+    def test_failed_warm_up_is_not_ready(self):
+        from unittest import mock
+        from django.test import override_settings
+        from plate_ocr import warmup
+        with mock.patch('plate_ocr.ocr_engine.get_ocr_engine', return_value=self._engine(0)):
+            warmup.warm_up_engine()
+        with override_settings(PLATE_OCR={'WARM_UP': True}), \
+                mock.patch.dict('os.environ', {warmup.WARM_UP_ENV: '1'}):
+            state = warmup.readiness()
+        self.assertEqual(state['status'], 'failed')
+        self.assertEqual(state['error'], 'No OCR backend available')
+        self.assertFalse(state['ready'])
+        # Without warm-up models load on first use, so the process is always ready
+        with override_settings(PLATE_OCR={'WARM_UP': False}):
+            self.assertTrue(warmup.readiness()['ready'])
+
+    def test_started_once_and_only_when_opted_in(self):
+        import os
+        from unittest import mock
+        from plate_ocr import warmup
+        with mock.patch('plate_ocr.warmup.threading.Thread') as thread:
+            self.assertTrue(warmup.start_warm_up())
+            self.assertFalse(warmup.start_warm_up())
+        self.assertEqual(thread.call_count, 1)
+
+        warmup._state['status'] = warmup.COLD
+        environ = {key: value for key, value in os.environ.items() if key != warmup.WARM_UP_ENV}
+        with mock.patch.dict('os.environ', environ, clear=True), \
+                mock.patch('plate_ocr.warmup.start_warm_up') as start:
+            # Scripts, shells and management commands serving no request with the variable unset
+            self.client.get(reverse('plate_ocr_ready'))
+            start.assert_not_called()
+            # Not opted in: models load on first use, so the probe passes
+            self.assertEqual(self.client.get(reverse('plate_ocr_ready')).status_code, 200)
+
+    def test_fork_during_warm_up_leaves_child_cold(self):
+        from plate_ocr import warmup
+        warmup._state['status'] = warmup.WARMING
+        warmup._after_fork()
+        self.assertEqual(warmup._state['status'], warmup.COLD)
+        warmup._state['status'] = warmup.READY
+        warmup._after_fork()
+        self.assertEqual(warmup._state['status'], warmup.READY)
+
+
+class OCRGovernorTests(TestCase):
+    """Test the per-process OCR concurrency limit and its wait queue"""
+
+    def setUp(self):
+        disable_ocr_quotas(self)
+
+    def test_queue_then_reject(self):
+        import threading
+        from plate_ocr.governor import OCRBusy, OCRGovernor
+        governor = OCRGovernor(1, max_waiting=1, timeout=5)
+        holding, release = threading.Event(), threading.Event()
+        timings = {}
+
+        def hold():
+            with governor.slot():
+                holding.set()
+                release.wait()
+
+        def wait():
+            with governor.slot(timings):
+                pass
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        holding.wait()
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        while governor.stats()['waiting'] < 1:
+            pass
+        # One running, one waiting: the next is turned away at once
+        with self.assertRaises(OCRBusy):
+            with governor.slot():
+                pass
+        release.set()
+        holder.join()
+        waiter.join()
+
+        stats = governor.stats()
+        self.assertEqual((stats['running'], stats['waiting'], stats['admitted'], stats['rejected']), (0, 0, 2, 1))
+        self.assertEqual(stats['peak_waiting'], 1)
+        self.assertGreater(timings['queue'], 0)
+
+    def test_wait_timeout(self):
+        from plate_ocr.governor import OCRBusy, OCRGovernor
+        governor = OCRGovernor(1, max_waiting=1, timeout=0.01)
+        with governor.slot():
+            with self.assertRaises(OCRBusy):
+                with governor.slot():
+                    pass
+        self.assertEqual(governor.stats()['timed_out'], 1)
+
+    def test_busy_engine_and_api(self):
+        from unittest import mock
+        import numpy as np
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from plate_ocr.governor import OCRGovernor
+        from plate_ocr.ocr_engine import OCR_BUSY_ERROR, OCREngine, PlateResult
+
+        governor = OCRGovernor(1, max_waiting=0)
+        engine = OCREngine(backends=[], governor=governor)
+        with governor.slot():
+            result = engine.extract_plate(np.zeros((60, 200, 3), dtype=np.uint8))
+        self.assertEqual(result.error, OCR_BUSY_ERROR)
+        self.assertIn('queue', result.timings)
+
+        busy = mock.Mock()
+        busy.extract_from_upload.return_value = PlateResult.failed(OCR_BUSY_ERROR)
+        with override_settings(PLATE_OCR={'ASYNC_JOBS': False}), \
+                mock.patch('plate_ocr.views.get_ocr_engine', return_value=busy), \
+                mock.patch('plate_ocr.views.log_extraction') as log:
+            response = self.client.post(reverse('plate_ocr_api'), {'photo': SimpleUploadedFile('car.jpg', b'x')})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['manual_entry_url'], reverse('photo_rating_wizard'))
+        self.assertIn('Retry-After', response)
+        log.assert_not_called()
+
+    def test_metrics_for_staff_and_token_only(self):
+        from django.test import override_settings
+        User = get_user_model()
+        url = reverse('plate_ocr_metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        with override_settings(PLATE_OCR={'METRICS_TOKEN': 's3cret'}):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('waiting', response.json()['governor'])
+
+        User.objects.create_user(id=1, added_by_id=1, email='ops@example.com', password='testpass123')
+        self.client.login(email='ops@example.com', password='testpass123')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        User.objects.filter(id=1).update(is_staff=True)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class OCRQuotaTests(TestCase):
+    """Test per-client OCR quotas and their enforcement in the API and the job hand-off"""
+
+    def setUp(self):
+        from django.core.cache import caches
+        from django.test import override_settings
+        cache = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ocr-quota-tests'},
+        })
+        cache.enable()
+        self.addCleanup(cache.disable)
+        caches['default'].clear()
+
+    def quota(self, **limits):
+        from plate_ocr.quotas import OCRQuota
+        return OCRQuota({'Anonymous': limits})
+
+    def test_rate_limit(self):
+        from plate_ocr.quotas import QuotaExceeded
+        quota = self.quota(per_minute=2)
+        quota.admit('ip:1.2.3.4', 'Anonymous')
+        quota.admit('ip:1.2.3.4', 'Anonymous')
+        with self.assertRaises(QuotaExceeded) as raised:
+            quota.admit('ip:1.2.3.4', 'Anonymous')
+        self.assertTrue(1 <= raised.exception.retry_after <= 60)
+        # Other clients have their own count
+        quota.admit('ip:5.6.7.8', 'Anonymous')
+        self.assertEqual(quota.usage('ip:1.2.3.4')['this_minute'], 3)
+
+    def test_concurrency_limit_and_release(self):
+        from plate_ocr.quotas import QuotaExceeded
+        quota = self.quota(concurrent=1, per_minute=10)
+        lease = quota.admit('user:1', 'Anonymous')
+        with self.assertRaises(QuotaExceeded):
+            quota.admit('user:1', 'Anonymous')
+        self.assertEqual(quota.usage('user:1')['inflight'], 1)
+        lease.release()
+        lease.release()
+        self.assertEqual(quota.usage('user:1')['inflight'], 0)
+        quota.admit('user:1', 'Anonymous')
+
+    def test_tiers(self):
+        from types import SimpleNamespace
+        from plate_ocr.quotas import OCRQuota, QuotaExceeded, client_tier
+        self.assertEqual(client_tier(SimpleNamespace(is_authenticated=False)), 'Anonymous')
+        self.assertEqual(client_tier(SimpleNamespace(is_authenticated=True, user_type='Verified')), 'Verified')
+
+        quota = OCRQuota({'Registered': {'per_minute': 1}, 'Verified': {'per_minute': 3}})
+        for _ in range(3):
+            quota.admit('user:2', 'Verified')
+        quota.admit('user:3', 'Registered')
+        with self.assertRaises(QuotaExceeded):
+            quota.admit('user:3', 'Registered')
+
+    def test_api_answers_429_before_reading_the_upload(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from plate_ocr.ocr_engine import PlateFormat, PlateResult
+
+        engine = mock.Mock()
+        engine.extract_from_upload.return_value = PlateResult(
+            plate_text='UA077AK', formatted_plate='UA 077AK', confidence=0.9,
+            plate_format=PlateFormat.NEW_STANDARD,
+        )
+        quotas = {'Anonymous': {'per_minute': 1, 'concurrent': 1}}
+        with override_settings(PLATE_OCR={'ASYNC_JOBS': False, 'OCR_QUOTAS': quotas}), \
+                mock.patch('plate_ocr.views.get_ocr_engine', return_value=engine), \
+                mock.patch('plate_ocr.views.log_extraction'):
+            url = reverse('plate_ocr_api')
+            response = self.client.post(url, {'photo': SimpleUploadedFile('car.jpg', b'x')})
+            self.assertEqual(response.status_code, 200)
+            response = self.client.post(url, {'photo': SimpleUploadedFile('car.jpg', b'x')})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('per minute', response.json()['error'])
+        self.assertIn('Retry-After', response)
+        self.assertEqual(engine.extract_from_upload.call_count, 1)
+
+        from plate_ocr.quotas import get_quota
+        with override_settings(PLATE_OCR={'OCR_QUOTAS': quotas}):
+            # The first request's in-flight slot was released when it finished
+            self.assertEqual(get_quota().usage('ip:127.0.0.1')['inflight'], 0)
+
+    def test_check_requires_atomic_shared_cache(self):
+        from django.test import override_settings
+        from plate_ocr.checks import check_quota_cache
+        redis = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/2'}
+        files = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/tra-cache'}
+        quotas = {'Anonymous': {'per_minute': 6}}
+        with override_settings(CACHES={'default': files, 'ocr_quota': redis},
+                               PLATE_OCR={'OCR_QUOTAS': quotas, 'OCR_QUOTA_CACHE': 'ocr_quota'}):
+            self.assertEqual(check_quota_cache(None), [])
+        with override_settings(CACHES={'default': files}, PLATE_OCR={'OCR_QUOTAS': quotas}):
+            self.assertEqual([message.id for message in check_quota_cache(None)], ['plate_ocr.W001'])
+        with override_settings(CACHES={'default': files}, PLATE_OCR={'OCR_QUOTAS': quotas, 'OCR_QUOTA_CACHE': 'ocr_quota'}):
+            self.assertEqual([message.id for message in check_quota_cache(None)], ['plate_ocr.E001'])
+        with override_settings(CACHES={'default': files}, PLATE_OCR={'OCR_QUOTAS': None}):
+            self.assertEqual(check_quota_cache(None), [])
+
+    def test_job_releases_slot(self):
+        from unittest import mock
+        from django.test import override_settings
+        from plate_ocr.jobs import submit_job
+        from plate_ocr.quotas import get_quota
+        from plate_ocr.tasks import run_ocr_job
+
+        with override_settings(PLATE_OCR={'OCR_QUOTAS': {'Anonymous': {'concurrent': 1}}}):
+            quota = get_quota()
+            lease = quota.admit('ip:1.2.3.4', 'Anonymous')
+            with mock.patch.object(run_ocr_job, 'delay') as delay, \
+                    self.captureOnCommitCallbacks(execute=True):
+                job = submit_job(None, session_key='abc', quota_lease=lease)
+            delay.assert_called_once_with(str(job.id), quota_client='ip:1.2.3.4')
+            # The request's own release no longer frees the job's slot
+            lease.release()
+            self.assertEqual(quota.usage('ip:1.2.3.4')['inflight'], 1)
+
+            with mock.patch('plate_ocr.tasks._run_job', return_value='done'):
+                run_ocr_job(str(job.id), quota_client='ip:1.2.3.4')
+            self.assertEqual(quota.usage('ip:1.2.3.4')['inflight'], 0)
+
+    def test_slot_released_when_job_is_not_queued(self):
+        from unittest import mock
+        from django.db import transaction
+        from plate_ocr.jobs import submit_job
+        from plate_ocr.tasks import run_ocr_job
+
+        quota = self.quota(concurrent=1)
+        # Rolled back: the job is never queued and the request keeps the slot to release
+        lease = quota.admit('ip:1.2.3.4', 'Anonymous')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                submit_job(None, session_key='abc', quota_lease=lease)
+                raise RuntimeError('rolled back')
+        self.assertEqual(callbacks, [])
+        lease.release()
+        self.assertEqual(quota.usage('ip:1.2.3.4')['inflight'], 0)
+
+        # The broker is down: queueing fails and the slot goes back
+        lease = quota.admit('ip:1.2.3.4', 'Anonymous')
+        with mock.patch.object(run_ocr_job, 'delay', side_effect=OSError('broker down')), \
+                self.assertRaises(OSError), self.captureOnCommitCallbacks(execute=True):
+            submit_job(None, session_key='abc', quota_lease=lease)
+        lease.release()
+        self.assertEqual(quota.usage('ip:1.2.3.4')['inflight'], 0)
+
+    def test_unreachable_cache_admits_unmetered(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from plate_ocr.ocr_engine import PlateFormat, PlateResult
+
+        cache = mock.Mock()
+        cache.add.side_effect = cache.incr.side_effect = cache.decr.side_effect = ConnectionError('redis is down')
+        quota = self.quota(concurrent=1, per_minute=1)
+        with mock.patch('plate_ocr.quotas.caches', {'default': cache}), \
+                self.assertLogs('plate_ocr.quotas', 'WARNING') as logs:
+            lease = quota.admit('ip:1.2.3.4', 'Anonymous')
+            lease.release()
+            quota.release('ip:1.2.3.4')
+        self.assertIn('redis is down', logs.output[0])
+        self.assertEqual(len(logs.output), 2)
+
+        engine = mock.Mock()
+        engine.extract_from_upload.return_value = PlateResult(
+            plate_text='UA077AK', formatted_plate='UA 077AK', confidence=0.9,
+            plate_format=PlateFormat.NEW_STANDARD,
+        )
+        quotas = {'Anonymous': {'per_minute': 1, 'concurrent': 1}}
+        with override_settings(PLATE_OCR={'ASYNC_JOBS': False, 'OCR_QUOTAS': quotas}), \
+                mock.patch('plate_ocr.quotas.caches', {'default': cache}), \
+                mock.patch('plate_ocr.views.get_ocr_engine', return_value=engine), \
+                mock.patch('plate_ocr.views.log_extraction'), \
+                self.assertLogs('plate_ocr.quotas', 'WARNING'):
+            for _ in range(2):
+                response = self.client.post(reverse('plate_ocr_api'), {'photo': SimpleUploadedFile('car.jpg', b'x')})
+                self.assertEqual(response.status_code, 200)
+
+
+class KnownPlateTests(TestCase):
+    """Test the index of registered plates and snapping OCR reads to them"""
+
+    def setUp(self):
+        from rating.models import MotorCar
+        for plate in ('UAX 123Y', 'UA 077AK', 'UA 078AK'):
+            MotorCar.objects.create(motor_car_number=plate, motor_type='car')
+
+    def test_confusion_pairs_cost_half(self):
+        from plate_ocr.known_plates import plate_distance
+        self.assertEqual(plate_distance('UAX123Y', 'UAX123Y'), 0)
+        self.assertEqual(plate_distance('UAX1Z3Y', 'UAX123Y'), 0.5)
+        self.assertEqual(plate_distance('UAX128Y', 'UAX123Y'), 1)
+        self.assertEqual(plate_distance('UAX13Y', 'UAX123Y'), 1)
+
+    def test_search_matches_brute_force(self):
+        import random
+        from plate_ocr.known_plates import PlateIndex, plate_distance
+        rng = random.Random(5)
+        plates = {'UA' + ''.join(rng.choice('0123') for _ in range(3)) + rng.choice(['AK', 'AB', 'BK'])
+                  for _ in range(200)}
+        index = PlateIndex(max_edits=1)
+        for plate in plates:
+            index.add(plate)
+        self.assertEqual(len(index), len(plates))
+        self.assertFalse(index.add(next(iter(plates))))
+        # Two confusion pairs (O/0, I/1) are still within one edit
+        for query in ('UA012AK', 'UA0I2AB', 'UA33BK', 'UAOI2AK', 'UA0123AK'):
+            for max_distance in (0, 0.5, 1, 1.5):
+                expected = sorted((plate_distance(query, plate), plate) for plate in plates
+                                  if plate_distance(query, plate) <= max_distance)
+                self.assertEqual(index.search(query, max_distance), expected)
+        with self.assertRaises(ValueError):
+            index.search('UA012AK', 2)
+
+    def test_lookup_time_with_many_plates(self):
+        import random
+        import time
+        from plate_ocr.known_plates import PlateIndex
+        rng = random.Random(7)
+        letters, digits = 'ABCDEFGHJKLMNPRSTUVWXYZ', '0123456789'
+
+        def plate():
+            if rng.random() < 0.5:
+                return 'U' + ''.join(rng.choices(letters, k=2)) + ' ' + ''.join(rng.choices(digits, k=3)) + rng.choice(letters)
+            return 'UA ' + ''.join(rng.choices(digits, k=3)) + ''.join(rng.choices(letters, k=2))
+
+        plates = [plate() for _ in range(50_000)]
+        started = time.perf_counter()
+        index = PlateIndex(max_edits=1)
+        for registered in plates:
+            index.add(registered)
+        self.assertLess(time.perf_counter() - started, 10)
+
+        queries = [registered.replace(' ', '')[:-1] + 'Q' for registered in rng.sample(plates, 1000)]
+        started = time.perf_counter()
+        for query in queries:
+            self.assertTrue(index.search(query, 1))
+        # About 0.1 ms a lookup here; a full scan of 50k plates takes seconds
+        self.assertLess((time.perf_counter() - started) / len(queries), 0.002)
+
+    def test_nearest_and_ties(self):
+        from plate_ocr.known_plates import KnownPlates
+        known = KnownPlates(background=False)
+        # By default only one confusion pair away
+        self.assertEqual(known.nearest('UAQ 77AK'), 'UA 077AK')
+        self.assertEqual(known.nearest('UAX 123Y', 0), 'UAX 123Y')
+        self.assertIsNone(known.nearest('UAX 128Y'))
+
+        known = KnownPlates(max_distance=1, background=False)
+        self.assertEqual(known.nearest('UAX 128Y'), 'UAX 123Y')
+        self.assertIsNone(known.nearest('UBX 128Y'))
+        # UA 079AK is one edit from both UA 077AK and UA 078AK
+        self.assertIsNone(known.nearest('UA 079AK'))
+
+    def test_new_motor_car_is_added(self):
+        from unittest import mock
+        from plate_ocr.known_plates import KnownPlates
+        from rating.models import MotorCar
+        known = KnownPlates(background=False)
+        self.assertIsNone(known.nearest('UBA 456M', 0))
+        with mock.patch('plate_ocr.signals.get_known_plates', return_value=known), \
+                self.captureOnCommitCallbacks(execute=True):
+            MotorCar.objects.create(motor_car_number='UBA 456M', motor_type='motorcycle')
+        self.assertEqual(known.nearest('UBA 456M', 0), 'UBA 456M')
+
+    def test_cascade_stops_on_snapped_plate(self):
+        import numpy as np
+        from plate_ocr.known_plates import KnownPlates
+        from plate_ocr.ocr_engine import OCREngine
+
+        def engine(known_plates, read):
+            reads = iter([[(read, 0.75)]])
+            engine = OCREngine(cascade=True, known_plates=known_plates)
+            engine._readers = lambda: [('tesseract', lambda image: next(reads, []))]
+            engine.preprocessor.detect_plate_region = lambda image, **kwargs: [(image, (0, 0, 200, 60))]
+            return engine
+
+        image = np.zeros((60, 200, 3), dtype=np.uint8)
+        # Q for 0 where PlateValidator expects a digit: not a valid plate on its own
+        result = engine(None, 'UAQ77AK').extract_plate(image)
+        self.assertFalse(result.is_valid)
+        self.assertEqual(result.ocr_calls, 6)
+
+        result = engine(KnownPlates(background=False), 'UAQ77AK').extract_plate(image)
+        self.assertEqual(result.formatted_plate, 'UA 077AK')
+        self.assertEqual(result.plate_text, 'UAQ77AK')
+        self.assertAlmostEqual(result.confidence, 0.9)
+        self.assertEqual(result.ocr_calls, 1)
+
+    def test_valid_unregistered_plate_is_kept(self):
+        from plate_ocr.known_plates import KnownPlates
+        from plate_ocr.ocr_engine import OCREngine
+        engine = OCREngine(cascade=True, known_plates=KnownPlates(max_distance=1, background=False))
+        # One ordinary edit from the registered UAX 123Y: a new car, not a misread
+        for read in ('UAX124Y', 'UAX128Y'):
+            candidate = engine._candidate(read, 0.75, (0, 0, 200, 60), 'tesseract')
+            self.assertEqual(candidate.formatted_plate, read[:3] + ' ' + read[3:])
+            self.assertEqual(candidate.confidence, 0.75)
+        # A read that is already a valid plate is not boosted either
+        self.assertEqual(engine._candidate('UAX123Y', 0.75, (0, 0, 200, 60), 'tesseract').confidence, 0.75)
+
+    def test_background_build_never_blocks_lookups(self):
+        import threading
+        from unittest import mock
+        from plate_ocr.known_plates import KnownPlates
+        release = threading.Event()
+
+        def read_plates():
+            release.wait(5)
+            return iter(['UAX 123Y'])
+
+        known = KnownPlates(refresh=None)
+        with mock.patch.object(known, '_read_plates', side_effect=read_plates) as read, \
+                mock.patch('plate_ocr.known_plates.connection'):
+            # Nothing to snap to until the first build is swapped in
+            self.assertIsNone(known.nearest('UAX 1Z3Y'))
+            self.assertIsNone(known.nearest('UAX 1Z3Y'))
+            known.add('UBA 456M')
+            release.set()
+            for _ in range(100):
+                if known._index is not None and not known._loading:
+                    break
+                threading.Event().wait(0.05)
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(known.nearest('UAX 1Z3Y'), 'UAX 123Y')
+        # A plate registered during the build is not lost when the new index is swapped in
+        self.assertEqual(known.nearest('UBA 456M', 0), 'UBA 456M')
+
+    def test_warm_up_builds_index(self):
+        from unittest import mock
+        from plate_ocr import warmup
+        engine = mock.Mock(spec=['warm_up'])
+        engine.warm_up.return_value = ['tesseract']
+        known = mock.Mock()
+        with mock.patch.dict(warmup._state, status=warmup.COLD), \
+                mock.patch('plate_ocr.ocr_engine.get_ocr_engine', return_value=engine), \
+                mock.patch('plate_ocr.known_plates.get_known_plates', return_value=known):
+            warmup.warm_up_engine()
+            self.assertEqual(warmup._state['status'], warmup.READY)
+        known.load.assert_called_once_with()
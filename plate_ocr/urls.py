@@ -1,5 +1,8 @@
 from django.urls import path
-from .views import PhotoRatingWizardView, PlateOCRAPIView, voice_plate_entry
+from .views import (
+    OCRJobStatusView, PhotoRatingWizardView, PlateBurstAPIView, PlateOCRAPIView, ocr_metrics, ocr_readiness,
+    ocr_report, voice_plate_entry,
+)
 
 urlpatterns = [
     # Main wizard flow
@@ -7,6 +10,16 @@ urlpatterns = [
 
     # API endpoint for AJAX OCR
     path('api/extract/', PlateOCRAPIView.as_view(), name='plate_ocr_api'),
+    path('api/extract-burst/', PlateBurstAPIView.as_view(), name='plate_ocr_burst_api'),
+    path('api/jobs/<uuid:job_id>/', OCRJobStatusView.as_view(), name='plate_ocr_job_status'),
+
+    # Load balancer readiness probe (OCR models warmed up)
+    path('ready/', ocr_readiness, name='plate_ocr_ready'),
+    # OCR queue depth and wait times of the answering process
+    path('metrics/', ocr_metrics, name='plate_ocr_metrics'),
+
+    # Latency and success report for staff
+    path('report/', ocr_report, name='plate_ocr_report'),
 
     # Voice entry fallback
     path('voice/', voice_plate_entry, name='voice_plate_entry'),
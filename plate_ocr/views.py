@@ -3,20 +3,30 @@ Views for photo-based number plate extraction and rating flow.
 Integrates with existing rating system.
 """
 
+import hmac
 import json
 import logging
 from django.shortcuts import render, redirect
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
 from django.http import JsonResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.contrib import messages
 from decimal import Decimal
 
+from .burst import get_burst_recognizer
+from .conf import ocr_setting
+from .extraction_log import extraction_report, log_extraction, mark_corrected
 from .forms import PhotoUploadForm, PlateConfirmationForm, ManualPlateEntryForm
-from .ocr_engine import get_ocr_engine, PlateResult, PlateFormat
+from .jobs import job_payload, submit_job
+from .models import OCRJob
+from .governor import get_governor
+from .ocr_engine import get_ocr_engine, OCR_BUSY_ERROR, PlateResult, PlateFormat
+from .quotas import QuotaExceeded, admit_request
+from .warmup import readiness
 from rating.models import MotorCar, Rating, MotorCarConflict
 from rating.forms import RatingForm
 from rating.utils import validate_ug_plate_format
@@ -48,6 +58,8 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
 
         if step == 'capture':
             return self._render_capture_step(request)
+        elif step == 'processing':
+            return self._render_processing_step(request)
         elif step == 'confirm_plate':
             return self._render_confirm_plate_step(request)
         elif step == 'rate':
@@ -107,36 +119,43 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
             photo = request.FILES['photo']
 
             try:
-                # Read image bytes
-                image_bytes = photo.read()
+                lease = admit_request(request)
+            except QuotaExceeded as e:
+                messages.warning(request, f"{e}. Please enter the plate manually.")
+                return redirect('photo_rating_wizard')
 
-                # Extract plate using OCR
+            try:
+                if ocr_setting('ASYNC_JOBS'):
+                    # OCR runs on the Celery "ocr" queue; the processing step waits for it
+                    job = submit_job(photo, user=request.user, quota_lease=lease)
+                    # run_ocr_job logs the extraction under the job's id
+                    request.session['photo_rating'].update({'ocr_job': str(job.id), 'ocr_log_ref': str(job.id)})
+                    return redirect(reverse('photo_rating_wizard') + '?step=processing')
+
+                # Extract plate using OCR, straight from the uploaded file
                 engine = get_ocr_engine()
-                result = engine.extract_from_bytes(image_bytes)
-
-                if result.is_valid:
-                    # Store extraction result
-                    request.session['photo_rating'].update({
-                        'extracted_plate': result.formatted_plate,
-                        'confidence': result.confidence,
-                        'plate_format': result.plate_format.value,
-                        'raw_detections': result.raw_detections or [],
-                    })
-                    return redirect('photo_rating_wizard') + '?step=confirm_plate'
-                else:
-                    # Extraction failed, offer manual entry
-                    messages.warning(
-                        request,
-                        "Could not extract plate from photo. Please enter manually or try voice input."
-                    )
-                    request.session['photo_rating']['extraction_failed'] = True
-                    request.session['photo_rating']['raw_detections'] = result.raw_detections or []
-                    return redirect('photo_rating_wizard') + '?step=confirm_plate'
+                result = engine.extract_from_upload(photo)
+                if result.error == OCR_BUSY_ERROR:
+                    messages.warning(request, "Photo reading is busy right now. Please enter the plate manually.")
+                    return redirect('photo_rating_wizard')
+                log_ref = log_extraction(
+                    result,
+                    user=request.user,
+                    ip_address=self._get_client_ip(request),
+                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                )
+                if log_ref:
+                    request.session['photo_rating']['ocr_log_ref'] = str(log_ref)
+                self._apply_ocr_result(request, result)
+                return redirect(reverse('photo_rating_wizard') + '?step=confirm_plate')
 
             except Exception as e:
                 logger.error(f"Photo processing error: {e}")
                 messages.error(request, "Error processing photo. Please try again or enter manually.")
                 return redirect('photo_rating_wizard')
+            finally:
+                if lease:
+                    lease.release()
 
         elif input_method == 'text':
             # Manual text entry
@@ -150,7 +169,7 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
                         'confidence': 1.0,
                         'input_method': 'text',
                     })
-                    return redirect('photo_rating_wizard') + '?step=rate'
+                    return redirect(reverse('photo_rating_wizard') + '?step=rate')
                 except Exception as e:
                     messages.error(request, f"Invalid plate format: {e}")
                     return redirect('photo_rating_wizard')
@@ -167,6 +186,61 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
             messages.error(request, "Please upload a photo or enter the plate manually")
             return redirect('photo_rating_wizard')
 
+    def _apply_ocr_result(self, request, result):
+        """Store an OCR result in the wizard session for the confirm step"""
+        session_data = request.session['photo_rating']
+        if result.is_valid:
+            # Store extraction result
+            session_data.update({
+                'extracted_plate': result.formatted_plate,
+                'confidence': result.confidence,
+                'plate_format': result.plate_format.value,
+                'raw_detections': result.raw_detections or [],
+            })
+        else:
+            # Extraction failed, offer manual entry
+            messages.warning(
+                request,
+                "Could not extract plate from photo. Please enter manually or try voice input."
+            )
+            session_data['extraction_failed'] = True
+            session_data['raw_detections'] = result.raw_detections or []
+        request.session['photo_rating'] = session_data
+
+    def _render_processing_step(self, request):
+        """Render the wait page shown while the photo's OCR job runs"""
+        session_data = request.session.get('photo_rating', {})
+        job_id = session_data.get('ocr_job')
+        if not job_id:
+            return redirect('photo_rating_wizard')
+
+        context = {
+            'step': 'processing',
+            'motor_type_name': session_data.get('motor_type_name'),
+            'job_id': job_id,
+            'status_url': reverse('plate_ocr_job_status', args=[job_id]),
+            'confirm_url': reverse('photo_rating_wizard') + '?step=confirm_plate',
+        }
+        return render(request, 'plate_ocr/processing.html', context)
+
+    def _collect_ocr_job(self, request):
+        """
+        Move a finished OCR job's result into the session.
+        Returns False while the job is still queued or running.
+        """
+        session_data = request.session['photo_rating']
+        job = OCRJob.objects.filter(id=session_data['ocr_job'], user=request.user).first()
+        if job is not None and not job.is_finished:
+            return False
+
+        del session_data['ocr_job']
+        request.session['photo_rating'] = session_data
+        if job is not None and job.status == OCRJob.STATUS_DONE:
+            self._apply_ocr_result(request, PlateResult.from_dict(job.result))
+        else:
+            self._apply_ocr_result(request, PlateResult.failed(job.error if job else "OCR job not found"))
+        return True
+
     def _render_confirm_plate_step(self, request):
         """Render plate confirmation step"""
         session_data = request.session.get('photo_rating', {})
@@ -174,6 +248,11 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
         if not session_data.get('motor_type'):
             return redirect('photo_rating_wizard')
 
+        if session_data.get('ocr_job'):
+            if not self._collect_ocr_job(request):
+                return redirect(reverse('photo_rating_wizard') + '?step=processing')
+            session_data = request.session['photo_rating']
+
         extraction_failed = session_data.get('extraction_failed', False)
         extracted_plate = session_data.get('extracted_plate', '')
         confidence = session_data.get('confidence', 0)
@@ -199,7 +278,7 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
 
         if action == 'confirm':
             # User confirmed the extracted plate
-            return redirect('photo_rating_wizard') + '?step=rate'
+            return redirect(reverse('photo_rating_wizard') + '?step=rate')
 
         elif action == 'correct':
             # User wants to correct the plate
@@ -211,13 +290,14 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
                     session_data['confidence'] = 1.0
                     session_data['input_method'] = 'text_corrected'
                     request.session['photo_rating'] = session_data
-                    return redirect('photo_rating_wizard') + '?step=rate'
+                    mark_corrected(session_data.get('ocr_log_ref'), formatted_plate)
+                    return redirect(reverse('photo_rating_wizard') + '?step=rate')
                 except Exception as e:
                     messages.error(request, f"Invalid plate format: {e}")
-                    return redirect('photo_rating_wizard') + '?step=confirm_plate'
+                    return redirect(reverse('photo_rating_wizard') + '?step=confirm_plate')
             else:
                 messages.error(request, "Please enter the correct plate number")
-                return redirect('photo_rating_wizard') + '?step=confirm_plate'
+                return redirect(reverse('photo_rating_wizard') + '?step=confirm_plate')
 
         elif action == 'voice':
             # Switch to voice input
@@ -227,7 +307,7 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
             # Go back to capture step
             return redirect('photo_rating_wizard')
 
-        return redirect('photo_rating_wizard') + '?step=confirm_plate'
+        return redirect(reverse('photo_rating_wizard') + '?step=confirm_plate')
 
     def _render_rating_step(self, request):
         """Render rating form step"""
@@ -266,7 +346,7 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
             session_data['pending_rating'] = pending_data
             request.session['photo_rating'] = session_data
 
-            return redirect('photo_rating_wizard') + '?step=review'
+            return redirect(reverse('photo_rating_wizard') + '?step=review')
         else:
             context = {
                 'step': 'rate',
@@ -303,10 +383,10 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
         action = request.POST.get('action')
 
         if action == 'edit':
-            return redirect('photo_rating_wizard') + '?step=rate'
+            return redirect(reverse('photo_rating_wizard') + '?step=rate')
 
         if action != 'confirm':
-            return redirect('photo_rating_wizard') + '?step=review'
+            return redirect(reverse('photo_rating_wizard') + '?step=review')
 
         # Save the rating
         try:
@@ -353,12 +433,12 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
             }
             del request.session['photo_rating']
 
-            return redirect('photo_rating_wizard') + '?step=thanks'
+            return redirect(reverse('photo_rating_wizard') + '?step=thanks')
 
         except Exception as e:
             logger.error(f"Error saving rating: {e}")
             messages.error(request, f"Error saving rating: {e}")
-            return redirect('photo_rating_wizard') + '?step=review'
+            return redirect(reverse('photo_rating_wizard') + '?step=review')
 
     def _render_thanks_step(self, request):
         """Render thank you page"""
@@ -379,8 +459,42 @@ class PhotoRatingWizardView(LoginRequiredMixin, View):
         return request.META.get('REMOTE_ADDR')
 
 
+def busy_response(error=OCR_BUSY_ERROR, retry_after=None):
+    """429 for an upload the OCR governor or the client's quota turned away, pointing to manual entry"""
+    response = JsonResponse({
+        'success': False,
+        'error': error,
+        'manual_entry_url': reverse('photo_rating_wizard'),
+    }, status=429)
+    response['Retry-After'] = str(retry_after or ocr_setting('OCR_QUEUE_TIMEOUT') or 1)
+    return response
+
+
+class OCRQuotaMixin:
+    """
+    Counts POSTs against the client's OCR quota (quotas.py) before the
+    upload is parsed, answering 429 when over it. The admitted request's
+    lease is self.quota_lease (None without quotas), released afterwards
+    unless detached.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self.quota_lease = None
+        if request.method != 'POST':
+            return super().dispatch(request, *args, **kwargs)
+        try:
+            self.quota_lease = admit_request(request)
+        except QuotaExceeded as e:
+            return busy_response(str(e), retry_after=e.retry_after)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.quota_lease:
+                self.quota_lease.release()
+
+
 @method_decorator(csrf_exempt, name='dispatch')
-class PlateOCRAPIView(View):
+class PlateOCRAPIView(OCRQuotaMixin, View):
     """
     API endpoint for AJAX-based plate extraction.
     Returns JSON response with extraction results.
@@ -395,10 +509,31 @@ class PlateOCRAPIView(View):
 
         try:
             photo = request.FILES['photo']
-            image_bytes = photo.read()
+
+            if ocr_setting('ASYNC_JOBS'):
+                # Anonymous uploads are tied to the session that made them
+                if not request.session.session_key:
+                    request.session.save()
+                job = submit_job(
+                    photo, user=request.user, session_key=request.session.session_key,
+                    quota_lease=self.quota_lease,
+                )
+                return JsonResponse({
+                    **job_payload(job),
+                    'status_url': reverse('plate_ocr_job_status', args=[job.id]),
+                    'websocket_url': f"/ws/ocr/jobs/{job.id}/",
+                }, status=202)
 
             engine = get_ocr_engine()
-            result = engine.extract_from_bytes(image_bytes)
+            result = engine.extract_from_upload(photo)
+            if result.error == OCR_BUSY_ERROR:
+                return busy_response()
+            log_extraction(
+                result,
+                user=request.user,
+                ip_address=request.META.get('REMOTE_ADDR'),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            )
 
             return JsonResponse({
                 'success': result.is_valid,
@@ -417,6 +552,94 @@ class PlateOCRAPIView(View):
             }, status=500)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class PlateBurstAPIView(OCRQuotaMixin, View):
+    """
+    Plate extraction from a burst of photos (several `frames` files) or a
+    short `video` clip: the sharpest frames are read and voted on.
+    """
+
+    def post(self, request):
+        frames = request.FILES.getlist('frames')
+        video = request.FILES.get('video')
+        if not frames and not video:
+            return JsonResponse({
+                'success': False,
+                'error': 'No frames or video provided'
+            }, status=400)
+
+        try:
+            recognizer = get_burst_recognizer()
+            result = recognizer.recognize_video(video) if video else recognizer.recognize_photos(frames)
+            if result.error == OCR_BUSY_ERROR:
+                return busy_response()
+            log_extraction(
+                result,
+                user=request.user,
+                ip_address=request.META.get('REMOTE_ADDR'),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                input_method='burst',
+            )
+
+            return JsonResponse({
+                'success': result.is_valid,
+                'plate': result.formatted_plate if result.is_valid else '',
+                'confidence': result.confidence,
+                'format': result.plate_format.value if result.is_valid else 'unknown',
+                'votes': result.votes or {},
+                'raw_detections': result.raw_detections or [],
+                'error': result.error,
+            })
+
+        except Exception as e:
+            logger.error(f"Burst OCR API error: {e}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+
+class OCRJobStatusView(View):
+    """Status (and, once finished, result) of an asynchronous OCR job"""
+
+    def get(self, request, job_id):
+        job = OCRJob.objects.filter(id=job_id).first()
+        if job is None or not job.belongs_to(request.user, request.session.session_key):
+            return JsonResponse({'success': False, 'error': 'Job not found'}, status=404)
+        return JsonResponse(job_payload(job))
+
+
+def ocr_readiness(request):
+    """Readiness probe: 200 once this process's OCR models are warmed up, 503 before"""
+    state = readiness()
+    return JsonResponse(state, status=200 if state['ready'] else 503)
+
+
+def ocr_metrics(request):
+    """
+    OCR queue depth and wait times of this process (see governor.py), for
+    staff or a scraper sending `Authorization: Bearer <METRICS_TOKEN>`
+    """
+    token = ocr_setting('METRICS_TOKEN')
+    sent = request.headers.get('Authorization', '')
+    if not (request.user.is_staff
+            or (token and hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()))):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    governor = get_governor()
+    return JsonResponse({'governor': governor.stats() if governor else None})
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def ocr_report(request):
+    """Staff report of photo OCR latency and success rates from OCRExtractionLog"""
+    try:
+        days = max(int(request.GET.get('days', 7)), 1)
+    except ValueError:
+        days = 7
+    return render(request, 'plate_ocr/report.html', {'report': extraction_report(days)})
+
+
 @login_required
 def voice_plate_entry(request):
     """
@@ -435,7 +658,7 @@ def voice_plate_entry(request):
                 session_data['confidence'] = 1.0
                 session_data['input_method'] = 'voice'
                 request.session['photo_rating'] = session_data
-                return redirect('photo_rating_wizard') + '?step=rate'
+                return redirect(reverse('photo_rating_wizard') + '?step=rate')
             except Exception as e:
                 messages.error(request, f"Invalid plate format: {e}")
         else:
@@ -0,0 +1,120 @@
+"""
+OCR warm-up at process start.
+
+Loading EasyOCR's model takes seconds, and without a warm-up the first
+photo after a deploy or worker recycle pays for it. With
+PLATE_OCR['WARM_UP'], a background thread loads every OCR backend, runs
+one inference on a rendered plate and builds the known-plate index
+(known_plates.py):
+
+- in web processes started with PLATE_OCR_WARM_UP=1 in their environment
+  (e.g. `PLATE_OCR_WARM_UP=1 gunicorn tra_ratings.wsgi`), on the first
+  request the process serves, which is normally the readiness probe.
+  Starting on a request rather than at import means a preloading server
+  warms up each forked worker, not the master. Management commands,
+  shells and scripts never warm up;
+- in Celery worker processes, from worker_process_init.
+
+readiness() reports how far that got; the readiness endpoint returns it so
+a load balancer only routes photo traffic to warmed workers.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+COLD, WARMING, READY, FAILED = 'cold', 'warming', 'ready', 'failed'
+
+# Environment variable a web server's start command sets to opt its processes in
+WARM_UP_ENV = 'PLATE_OCR_WARM_UP'
+
+_lock = threading.Lock()
+_state = {'status': COLD, 'backends': [], 'duration_ms': None, 'error': None}
+
+
+def _after_fork():
+    # A warm-up thread started before a fork does not exist in the child
+    if _state['status'] == WARMING:
+        _state['status'] = COLD
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def sample_plate():
+    """Small rendered plate the backends run on once"""
+    import numpy as np
+    from .plate_recognizer import render_plate
+    return render_plate('UAX 123Y', np.random.default_rng(0))
+
+
+def warm_up_engine():
+    """Load the shared OCR engine's models and run one inference, recording the outcome"""
+    from .known_plates import get_known_plates
+    from .ocr_engine import OCREngine, get_ocr_engine
+
+    _state.update(status=WARMING, error=None)
+    started = time.perf_counter()
+    try:
+        engine = get_ocr_engine()
+        # Behind the result cache is the engine that holds the models
+        engine = getattr(engine, 'engine', engine)
+        if isinstance(engine, OCREngine):
+            backends = engine.warm_up(sample_plate())
+        else:
+            backends = engine.warm_up()
+        if not backends:
+            raise RuntimeError("No OCR backend available")
+        # Build the known-plate index now rather than leave the first photos unsnapped
+        known_plates = get_known_plates()
+        if known_plates is not None:
+            known_plates.load()
+    except Exception as e:
+        logger.exception("OCR warm-up failed")
+        _state.update(status=FAILED, error=str(e), duration_ms=round((time.perf_counter() - started) * 1000))
+        return
+
+    duration_ms = round((time.perf_counter() - started) * 1000)
+    _state.update(status=READY, backends=backends, duration_ms=duration_ms)
+    logger.info(f"OCR warmed up in {duration_ms} ms ({', '.join(backends)})")
+
+
+def start_warm_up() -> bool:
+    """Warm up in a background thread, once per process; False if already started"""
+    with _lock:
+        if _state['status'] != COLD:
+            return False
+        _state['status'] = WARMING
+    threading.Thread(target=_warm_up_in_background, name='ocr-warm-up', daemon=True).start()
+    return True
+
+
+def _warm_up_in_background():
+    try:
+        warm_up_engine()
+    finally:
+        # The thread ends here; don't leave its database connection open
+        connection.close()
+
+
+def warm_up_requested() -> bool:
+    """Whether this process was started with WARM_UP_ENV set"""
+    return os.environ.get(WARM_UP_ENV) == '1'
+
+
+def warm_up_on_request(**kwargs):
+    """request_started receiver: warm up when an opted-in process serves its first request"""
+    if _state['status'] == COLD and warm_up_requested():
+        start_warm_up()
+
+
+def readiness() -> dict:
+    """Warm-up state; `ready` is always true when warm-up is disabled (models load on first use)"""
+    from .conf import ocr_setting
+    state = dict(_state, enabled=bool(ocr_setting('WARM_UP') and warm_up_requested()))
+    state['ready'] = state['status'] == READY or not state['enabled']
+    return state
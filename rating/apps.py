@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RatingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rating'
+
+    def ready(self):
+        import rating.signals  # image derivative pipeline
@@ -1,36 +1,46 @@
-from rating.models import ArchivedRating, Rating,MotorCar
+from django.core.management.base import BaseCommand, CommandError
 from django.utils.timezone import now
-from datetime import timedelta
+from rating.services.archiving import ARCHIVE_AFTER, archive_old_ratings, count_eligible
 
 
-def archive_old_ratings():
-    cutoff_date = now() - timedelta(days=5*365)  # 5 years
-    motorcars = MotorCar.objects.all()
+class Command(BaseCommand):
+    help = ('Archive ratings older than five years for cars that are still being rated, '
+            'in resumable id-range chunks')
 
-    for motorcar in motorcars:
-        # Check if the motorcar has received a rating within the cutoff date
-        has_recent_rating = Rating.objects.filter(motor_car=motorcar, created_at__gte=cutoff_date).exists()
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rating ids covered by each chunk/transaction (default: 5000)')
+        parser.add_argument('--sleep', type=float, default=0.5,
+                            help='Seconds to pause between chunks (default: 0.5)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the ratings that would be archived')
+        parser.add_argument('--restart', action='store_true',
+                            help='Abandon an unfinished run instead of resuming it')
 
-        if not has_recent_rating:
-            # If no recent rating exists, preserve all ratings for this motorcar
-            print(f"Preserving ratings for motorcar {motorcar.motor_car_number} due to no recent ratings.")
-            continue  # Skip archiving for this motorcar's ratings
+    def handle(self, *args, **options):
+        # A chunk of 0 ids never advances the checkpoint
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        if options['sleep'] < 0:
+            raise CommandError('--sleep cannot be negative')
 
-        # Archive ratings older than the cutoff date for this motorcar
-        old_ratings = Rating.objects.filter(motor_car=motorcar, created_at__lt=cutoff_date)
-        for rating in old_ratings:
-            ArchivedRating.objects.create(
-                motor_car=rating.motor_car,
-                user=rating.user,
-                user_type=rating.user_type,
-                ip_address=rating.ip_address,
-                score=rating.score,
-                motor_type=rating.motor_type,
-                system_comments=rating.system_comments,
-                comment=rating.comment,
-                location=rating.location,
-                device_id=rating.device_id,
-                is_anonymous=rating.is_anonymous,
-                created_at=rating.created_at
-            )
-            rating.delete()  # Remove the archived rating from the main table
+        if options['dry_run']:
+            count = count_eligible(now() - ARCHIVE_AFTER)
+            self.stdout.write(f"{count} ratings would be archived.")
+            return
+
+        def report(checkpoint):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"  up to id {checkpoint.last_id}/{checkpoint.max_id}: {checkpoint.rows_archived} archived"
+                )
+
+        checkpoint = archive_old_ratings(
+            chunk_size=options['chunk_size'],
+            pause=options['sleep'],
+            restart=options['restart'],
+            progress=report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {checkpoint.rows_archived} ratings created before {checkpoint.cutoff:%Y-%m-%d}."
+        ))
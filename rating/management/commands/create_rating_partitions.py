@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rating.services.partitions import ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = 'Create the monthly rating partitions for the current month and the next few months'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=getattr(settings, 'RATING_PARTITION_MONTHS_AHEAD', 3),
+            help='How many months beyond the current one to create (default: RATING_PARTITION_MONTHS_AHEAD)',
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError('The rating table is not partitioned. Run partition_rating_table first.')
+
+        created = ensure_partitions(options['months_ahead'])
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"Created partitions: {', '.join(created)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('All rating partitions already exist.'))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+from rating.services.cold_storage import export_older_than, storage_dir
+
+
+class Command(BaseCommand):
+    help = ('Move old ArchivedRating rows into compressed monthly segment files '
+            '(RATING_COLD_STORAGE_DIR) and delete them from the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=getattr(settings, 'RATING_COLD_STORAGE_AFTER_DAYS', 6 * 365),
+            help='Export archived ratings created more than this many days ago',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows exported and deleted per transaction (default: 5000)')
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(days=options['older_than_days'])
+        exported = export_older_than(cutoff, batch_size=options['batch_size'])
+
+        for month, rows in exported.items():
+            self.stdout.write(f"  {month:%Y-%m}: {rows} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {sum(exported.values())} archived ratings to {storage_dir()}."
+        ))
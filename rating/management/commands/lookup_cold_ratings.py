@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import ValidationError
+from rating.services.cold_storage import iter_plate_ratings
+from rating.utils import validate_ug_plate_format
+
+
+class Command(BaseCommand):
+    help = 'Print the cold-stored ratings of one plate as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('plate', help='Number plate, e.g. "UAX 123Y"')
+
+    def handle(self, *args, **options):
+        try:
+            plate = validate_ug_plate_format(options['plate'])
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        count = 0
+        for record in iter_plate_ratings(plate):
+            self.stdout.write(json.dumps(record))
+            count += 1
+        self.stderr.write(f"{count} cold-stored ratings for {plate}")
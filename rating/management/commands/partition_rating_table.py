@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rating.services.partitions import convert_to_partitioned, is_partitioned
+
+
+class Command(BaseCommand):
+    help = ('Convert the rating table into a monthly range-partitioned table (PostgreSQL). '
+            'Locks the table while every row is copied; run it in a maintenance window.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=getattr(settings, 'RATING_PARTITION_MONTHS_AHEAD', 3),
+            help='How many future monthly partitions to create up front',
+        )
+
+    def handle(self, *args, **options):
+        if is_partitioned():
+            raise CommandError('The rating table is already partitioned.')
+
+        try:
+            copied = convert_to_partitioned(options['months_ahead'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f'Rating table partitioned by month; {copied} rows copied.'))
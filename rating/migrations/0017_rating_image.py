@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 01:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rating', '0016_rating_rate_method'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rating',
+            name='image',
+            field=models.ImageField(blank=True, help_text="The photo used to extract the vehicle's number plate.", null=True, upload_to='photo_rate/images/'),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='rate_method',
+            field=models.CharField(choices=[('Text', 'Text'), ('Image', 'Image Rating'), ('Audio', 'Audio')], default='Text', max_length=25, verbose_name='Method Used'),
+        ),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('image__isnull', False), ('rate_method', 'Image')), models.Q(('rate_method', 'Image'), _negated=True), _connector='OR'), name='ck_rating_image_required_when_method_is_image'),
+        ),
+    ]
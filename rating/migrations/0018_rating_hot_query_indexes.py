@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-19 01:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; building the
+    # indexes this way keeps rating inserts flowing on a large table.
+    atomic = False
+
+    dependencies = [
+        ('rating', '0017_rating_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='rating',
+            index=models.Index(fields=['motor_car', 'user_type', 'created_at'], name='rating_car_usertype_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='rating',
+            index=models.Index(fields=['motor_car', 'created_at'], name='rating_car_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='rating',
+            index=models.Index(fields=['created_at'], name='rating_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='rating',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['created_at', 'user'], name='rating_recent_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='rating',
+            index=models.Index(condition=models.Q(('device_id__isnull', False)), fields=['device_id', 'motor_car'], name='rating_device_car_idx'),
+        ),
+        # Drop the standalone motor_car_id index only once the composites exist.
+        migrations.AlterField(
+            model_name='rating',
+            name='motor_car',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='rating.motorcar'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rating', '0019_ratingarchivecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rating',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -59,7 +59,8 @@ class MotorCar(models.Model):
 
 
 class Rating(models.Model):
-    motor_car = models.ForeignKey('MotorCar', on_delete=models.CASCADE, related_name='ratings')
+    # No standalone FK index: the (motor_car, ...) composites below cover it.
+    motor_car = models.ForeignKey('MotorCar', on_delete=models.CASCADE, related_name='ratings', db_index=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     user_type = models.CharField(max_length=50, default="Anonymous")
     ip_address = models.GenericIPAddressField(_('User IP Address'), null=True, blank=True)
@@ -86,8 +87,31 @@ class Rating(models.Model):
         null=True,    # allow NULL in DB
         blank=True    # allow empty in forms/admin
     )
+    # Resized, EXIF-stripped copies of `image` written by the derivative task,
+    # keyed "<size>.<format>" (see rating.services.images)
+    image_derivatives = models.JSONField(default=dict, blank=True)
 
     class Meta:
+        indexes = [
+            # Per-car averages / counts / latest comment by user type (compute_average_ratings)
+            models.Index(fields=['motor_car', 'user_type', 'created_at'], name='rating_car_usertype_idx'),
+            # Newest-first listing per car (MotorCarRatingsListView) and archiving
+            models.Index(fields=['motor_car', 'created_at'], name='rating_car_created_idx'),
+            # Time-window counts (check_weekly_activity_drop, dashboard)
+            models.Index(fields=['created_at'], name='rating_created_at_idx'),
+            # Active raters in a window (award_weekly_bonus)
+            models.Index(
+                fields=['created_at', 'user'],
+                name='rating_recent_user_idx',
+                condition=Q(user__isnull=False),
+            ),
+            # Repeat-rating guard in the API (RatingCreateView)
+            models.Index(
+                fields=['device_id', 'motor_car'],
+                name='rating_device_car_idx',
+                condition=Q(device_id__isnull=False),
+            ),
+        ]
         constraints = [
             # DB-level guard: if rate_method='Image' then image must be present (NOT NULL)
             models.CheckConstraint(
@@ -130,6 +154,23 @@ class Rating(models.Model):
 
         return super().save(*args, **kwargs)
 
+    def image_derivative_url(self, size='medium', fmt='webp'):
+        """URL of a resized copy of the photo, falling back to the original until it exists"""
+        if not self.image:
+            return None
+        name = (self.image_derivatives or {}).get(f"{size}.{fmt}")
+        if name:
+            return self.image.storage.url(name)
+        return self.image.url
+
+    @property
+    def thumbnail_url(self):
+        return self.image_derivative_url('thumb')
+
+    @property
+    def display_image_url(self):
+        return self.image_derivative_url('medium')
+
     def __str__(self):
         return f"Rating for {self.motor_car.motor_car_number} - {self.score} stars"
 
@@ -222,3 +263,18 @@ class ArchivedRating(models.Model):
 
     def __str__(self):
         return f"Archived Rating for {self.motor_car.motor_car_number} - {self.score} stars"
+
+
+class RatingArchiveCheckpoint(models.Model):
+    """Progress of a chunked archive_old_ratings run, so an interrupted run can resume"""
+    cutoff = models.DateTimeField()  # Ratings created before this are archived
+    last_id = models.BigIntegerField(default=0)  # Highest rating id already processed
+    max_id = models.BigIntegerField(default=0)  # Highest candidate id when the run started
+    rows_archived = models.PositiveBigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        state = 'completed' if self.completed_at else f'at id {self.last_id}/{self.max_id}'
+        return f"Archive run before {self.cutoff:%Y-%m-%d} ({state}, {self.rows_archived} rows)"
@@ -0,0 +1,118 @@
+"""
+Set-based archiving of old ratings.
+
+Ratings older than the cutoff move to ArchivedRating in bounded id-range
+chunks. Each chunk is a single DELETE ... RETURNING feeding an INSERT ...
+SELECT in its own short transaction, so locks are held only for one chunk at
+a time. Cars with no rating since the cutoff keep their whole history; that
+rule is an EXISTS clause in the same statement instead of a query per car.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from rating.models import RatingArchiveCheckpoint
+from rating.services.partitions import (
+    ARCHIVE_INSERT_COLUMNS, ARCHIVE_SELECT_COLUMNS, ARCHIVE_TABLE, RATING_TABLE,
+    archive_partitions, is_partitioned,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER = timedelta(days=5 * 365)  # 5 years
+
+# Row is old and its car has been rated since the cutoff
+_ELIGIBLE = (
+    "r.created_at < %(cutoff)s AND EXISTS ("
+    f'SELECT 1 FROM "{RATING_TABLE}" recent '
+    "WHERE recent.motor_car_id = r.motor_car_id AND recent.created_at >= %(cutoff)s)"
+)
+
+_MOVE_CHUNK = (
+    f'WITH moved AS (DELETE FROM "{RATING_TABLE}" r '
+    f"WHERE r.id > %(low)s AND r.id <= %(high)s AND {_ELIGIBLE} RETURNING r.*) "
+    f'INSERT INTO "{ARCHIVE_TABLE}" ({ARCHIVE_INSERT_COLUMNS}) '
+    f"SELECT {ARCHIVE_SELECT_COLUMNS} FROM moved"
+)
+
+
+def count_eligible(cutoff):
+    """Number of ratings an archive run with this cutoff would move (dry run)."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM "{RATING_TABLE}" r WHERE {_ELIGIBLE}', {'cutoff': cutoff})
+        return cursor.fetchone()[0]
+
+
+def start_or_resume(restart=False):
+    """
+    Return the checkpoint to work on: the unfinished run if there is one
+    (unless restart is set), otherwise a new run with a fresh cutoff.
+    """
+    unfinished = RatingArchiveCheckpoint.objects.filter(completed_at__isnull=True).order_by('-started_at')
+    if restart:
+        unfinished.update(completed_at=now())
+    else:
+        checkpoint = unfinished.first()
+        if checkpoint:
+            return checkpoint
+
+    cutoff = now() - ARCHIVE_AFTER
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT min(id), max(id) FROM "{RATING_TABLE}" WHERE created_at < %s', [cutoff]
+        )
+        min_id, max_id = cursor.fetchone()
+    return RatingArchiveCheckpoint.objects.create(
+        cutoff=cutoff,
+        last_id=(min_id or 1) - 1,
+        max_id=max_id or 0,
+    )
+
+
+def archive_chunk(checkpoint, chunk_size):
+    """
+    Archive eligible ratings with ids in (last_id, last_id + chunk_size] and
+    advance the checkpoint in the same transaction. Returns rows moved.
+    """
+    high = min(checkpoint.last_id + chunk_size, checkpoint.max_id)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(_MOVE_CHUNK, {'low': checkpoint.last_id, 'high': high, 'cutoff': checkpoint.cutoff})
+            moved = cursor.rowcount
+        checkpoint.last_id = high
+        checkpoint.rows_archived += moved
+        if high >= checkpoint.max_id:
+            checkpoint.completed_at = now()
+        checkpoint.save(update_fields=['last_id', 'rows_archived', 'completed_at', 'updated_at'])
+    return moved
+
+
+def archive_old_ratings(chunk_size=5000, pause=0.5, restart=False, progress=None):
+    """
+    Move ratings older than ARCHIVE_AFTER into ArchivedRating.
+
+    Whole monthly partitions are handled first when the table is partitioned;
+    the rest goes through id-range chunks, sleeping `pause` seconds between
+    chunks. Progress is checkpointed after every chunk, so calling this again
+    after an interruption continues where it stopped. `progress` is called
+    with the checkpoint after each chunk. Returns the checkpoint.
+    """
+    checkpoint = start_or_resume(restart=restart)
+
+    if is_partitioned():
+        # Idempotent: only months still attached and older than the cutoff are moved
+        checkpoint.rows_archived += archive_partitions(checkpoint.cutoff)
+        checkpoint.save(update_fields=['rows_archived', 'updated_at'])
+
+    while checkpoint.completed_at is None:
+        moved = archive_chunk(checkpoint, chunk_size)
+        logger.info("Archived %s ratings up to id %s of %s", moved, checkpoint.last_id, checkpoint.max_id)
+        if progress:
+            progress(checkpoint)
+        if checkpoint.completed_at is None and pause:
+            time.sleep(pause)
+
+    return checkpoint
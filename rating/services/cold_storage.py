@@ -0,0 +1,220 @@
+"""
+Cold storage for archived ratings.
+
+ArchivedRating rows are exported to append-only, gzip-compressed NDJSON
+segment files on local disk, one segment per month of created_at:
+
+    <RATING_COLD_STORAGE_DIR>/2019/ratings-2019-03.ndjson.gz
+    <RATING_COLD_STORAGE_DIR>/2019/ratings-2019-03.idx
+
+Every export appends one gzip member per plate to the segment (a file of
+concatenated members is still a valid gzip stream) and one line to the
+sidecar index recording the member's byte offset, length, plate and row
+count. A lookup for one plate reads the small index, then memory-maps the
+segment and decompresses only that plate's members, so whole segments are
+never loaded.
+
+Exports of one month can run in parallel (export_month skips rows another
+exporter holds), so an append holds an exclusive lock on the segment's
+.lock file from reading the end offset until its index lines are written;
+otherwise two writers would record stale, overlapping offsets.
+"""
+import gzip
+import json
+import mmap
+import os
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from rating.models import ArchivedRating
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EXPORT_FIELDS = [
+    'id', 'user_id', 'user_type', 'ip_address', 'score', 'motor_type', 'system_comments',
+    'comment', 'location', 'device_id', 'is_anonymous', 'created_at', 'archived_at',
+]
+
+
+def storage_dir() -> Path:
+    return Path(getattr(settings, 'RATING_COLD_STORAGE_DIR', Path(settings.BASE_DIR) / 'cold_storage'))
+
+
+def segment_paths(month: date):
+    folder = storage_dir() / f"{month.year:04d}"
+    stem = f"ratings-{month.year:04d}-{month.month:02d}"
+    return folder / f"{stem}.ndjson.gz", folder / f"{stem}.idx"
+
+
+@contextmanager
+def _segment_lock(data_path: Path):
+    """Hold an exclusive lock on a segment, across processes, while appending to it"""
+    with open(data_path.with_name(data_path.name.replace('.ndjson.gz', '.lock')), 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            # Retries for up to 10 seconds, then raises OSError
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _row_to_line(plate, row) -> bytes:
+    record = {'plate': plate}
+    record.update({field: _encode(row[field]) for field in EXPORT_FIELDS})
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode()
+
+
+def append_segment(month: date, rows_by_plate) -> int:
+    """
+    Append rows to a month's segment. rows_by_plate maps a plate number to
+    a list of row dicts. Data and index are fsynced before returning so the
+    caller can safely delete the exported rows. Safe to call from several
+    processes at once (see _segment_lock). Returns rows written.
+    """
+    data_path, index_path = segment_paths(month)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    index_lines = []
+    with _segment_lock(data_path), open(data_path, 'ab') as data_file:
+        offset = data_file.seek(0, os.SEEK_END)
+        for plate, rows in rows_by_plate.items():
+            member = gzip.compress(b''.join(_row_to_line(plate, row) for row in rows), compresslevel=9)
+            data_file.write(member)
+            index_lines.append(json.dumps({
+                'plate': plate, 'offset': offset, 'length': len(member), 'rows': len(rows),
+            }) + '\n')
+            offset += len(member)
+            written += len(rows)
+        data_file.flush()
+        os.fsync(data_file.fileno())
+
+        with open(index_path, 'a') as index_file:
+            index_file.writelines(index_lines)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+    return written
+
+
+def export_month(month: date, batch_size=5000) -> int:
+    """
+    Export all ArchivedRating rows created in one month to its segment and
+    delete them from the database, batch by batch. A batch's rows are only
+    deleted after its segment append has been fsynced. Returns rows exported.
+    """
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end = datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+    queryset = (
+        ArchivedRating.objects
+        .filter(created_at__gte=start, created_at__lt=end)
+        .order_by('id')
+    )
+    exported = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                queryset.select_for_update(skip_locked=True, of=('self',))
+                .values('motor_car__motor_car_number', *EXPORT_FIELDS)[:batch_size]
+            )
+            if not batch:
+                return exported
+            rows_by_plate = {}
+            for row in batch:
+                rows_by_plate.setdefault(row['motor_car__motor_car_number'], []).append(row)
+            exported += append_segment(month, rows_by_plate)
+            ArchivedRating.objects.filter(id__in=[row['id'] for row in batch]).delete()
+
+
+def export_older_than(cutoff, batch_size=5000):
+    """
+    Export every month of archived ratings created before cutoff's month.
+    Returns a {month: rows} dict of what was exported.
+    """
+    months = (
+        ArchivedRating.objects
+        .filter(created_at__lt=cutoff)
+        .dates('created_at', 'month')
+    )
+    cutoff_month = date(cutoff.year, cutoff.month, 1)
+    return {
+        month: export_month(month, batch_size=batch_size)
+        for month in months
+        if month < cutoff_month
+    }
+
+
+def _read_index(index_path: Path, plate: str):
+    with open(index_path) as index_file:
+        for line in index_file:
+            entry = json.loads(line)
+            if entry['plate'] == plate:
+                yield entry['offset'], entry['length']
+
+
+def iter_plate_ratings(plate: str, months=None):
+    """
+    Stream the cold-stored ratings for one plate as dicts, oldest segment
+    first. Only the gzip members indexed for that plate are decompressed,
+    straight out of a memory map of the segment. `months` restricts the
+    search to the given month dates.
+
+    A crash between a segment append and the database delete can export the
+    same rows twice, so rows are de-duplicated by archived id.
+    """
+    seen = set()
+    root = storage_dir()
+    if months is not None:
+        index_paths = [segment_paths(month)[1] for month in months]
+    else:
+        index_paths = sorted(root.glob('*/ratings-*.idx')) if root.exists() else []
+
+    for index_path in index_paths:
+        if not index_path.exists():
+            continue
+        members = list(_read_index(index_path, plate))
+        if not members:
+            continue
+        data_path = index_path.with_suffix('.ndjson.gz')
+        with open(data_path, 'rb') as data_file, \
+                mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset, length in members:
+                decompressor = zlib.decompressobj(wbits=31)  # gzip member
+                pending = b''
+                view = memoryview(mapped)[offset:offset + length]
+                try:
+                    for start in range(0, length, 64 * 1024):
+                        pending += decompressor.decompress(view[start:start + 64 * 1024])
+                        *lines, pending = pending.split(b'\n')
+                        for line in lines:
+                            record = json.loads(line)
+                            if record['id'] not in seen:
+                                seen.add(record['id'])
+                                yield record
+                finally:
+                    view.release()
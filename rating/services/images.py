@@ -0,0 +1,66 @@
+"""
+Resized, EXIF-stripped derivatives of rating photos.
+
+Phone photos attached to ratings are often 3-12 MB. After upload a Celery
+task renders each size in DERIVATIVE_SIZES as WebP and JPEG next to the
+original (photo_rate/images/derivatives/) and records the stored names in
+Rating.image_derivatives, e.g. {"thumb.webp": "...", "medium.jpg": "..."}.
+Pages and the API serve those instead of the original.
+"""
+import io
+import os
+
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+
+# Longest edge in pixels for each derivative size
+DERIVATIVE_SIZES = {
+    'thumb': 320,
+    'medium': 1024,
+}
+
+# Pillow format name and save options per file extension; no exif/icc is
+# passed on, so the derivatives carry no EXIF (GPS, device) metadata.
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+DERIVATIVE_DIR = 'derivatives'
+
+
+def derivative_key(size, fmt):
+    return f"{size}.{fmt}"
+
+
+def derivative_name(original_name, size, fmt):
+    folder, filename = os.path.split(original_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(folder, DERIVATIVE_DIR, f"{stem}_{size}.{fmt}")
+
+
+def generate_derivatives(image_field):
+    """
+    Render every size/format derivative of an ImageField file into the
+    field's storage. Returns the manifest dict of key -> stored name.
+    """
+    storage = image_field.storage
+    with storage.open(image_field.name, 'rb') as original:
+        with Image.open(original) as image:
+            image = ImageOps.exif_transpose(image)  # apply the camera rotation before EXIF is dropped
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.load()
+
+    manifest = {}
+    for size, long_edge in DERIVATIVE_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((long_edge, long_edge), Image.Resampling.LANCZOS)
+        for fmt, (pil_format, options) in DERIVATIVE_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = derivative_name(image_field.name, size, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            manifest[derivative_key(size, fmt)] = storage.save(name, ContentFile(buffer.getvalue()))
+    return manifest
@@ -0,0 +1,405 @@
+"""
+Monthly range partitioning of the rating table on PostgreSQL.
+
+The rating table can be converted (once, offline) into a declaratively
+partitioned table: one partition per calendar month of created_at plus a
+DEFAULT partition that catches anything outside the created ranges. Recent
+window queries (weekly bonus, activity drop, dashboard) then prune to the
+current one or two partitions, and archiving moves whole months at a time.
+"""
+import logging
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import OperationalError, connection, transaction
+
+from rating.models import ArchivedRating, Rating
+
+logger = logging.getLogger(__name__)
+
+RATING_TABLE = Rating._meta.db_table
+ARCHIVE_TABLE = ArchivedRating._meta.db_table
+DEFAULT_PARTITION = f"{RATING_TABLE}_default"
+LEGACY_TABLE = f"{RATING_TABLE}_unpartitioned"
+PARTITION_PREFIX = f"{RATING_TABLE}_y"
+
+# How long a plain DETACH PARTITION may wait for its ACCESS EXCLUSIVE lock on
+# the rating table before the month is skipped until the next run; waiting
+# longer would queue every rating read and write behind it
+DETACH_LOCK_TIMEOUT = '5s'
+
+# Column mapping for copying rating rows into ArchivedRating. The archive keeps
+# system_comments as varchar(50), so longer text is truncated rather than
+# failing the whole batch.
+ARCHIVE_INSERT_COLUMNS = (
+    "motor_car_id, user_id, user_type, ip_address, score, motor_type, system_comments, "
+    "comment, location, device_id, is_anonymous, created_at, archived_at"
+)
+ARCHIVE_SELECT_COLUMNS = (
+    "motor_car_id, user_id, user_type, ip_address, score, motor_type, LEFT(system_comments, 50), "
+    "comment, location, device_id, is_anonymous, created_at, now()"
+)
+
+
+def month_start(value) -> date:
+    """First day of the month containing value (a date or datetime)."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{RATING_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def _bound(month: date) -> str:
+    # created_at is timestamptz and the project runs in UTC
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+
+def is_partitioned() -> bool:
+    """True when the rating table is a partitioned (relkind 'p') table."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c "
+            "WHERE c.oid = to_regclass(%s)",
+            [RATING_TABLE],
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions():
+    """
+    Monthly partitions of the rating table, oldest first.
+    Returns a list of (table_name, month) tuples; the DEFAULT partition is excluded.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [RATING_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    return _monthly(names)
+
+
+def _monthly(names):
+    """(table_name, month) for the names that are monthly partition names, oldest first"""
+    partitions = []
+    for name in names:
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        suffix = name[len(PARTITION_PREFIX):]  # e.g. 2026m10
+        try:
+            month = date(int(suffix[:4]), int(suffix[5:7]), 1)
+        except ValueError:
+            continue
+        partitions.append((name, month))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def detached_partitions():
+    """
+    Monthly tables that are not (or no longer fully) attached to the rating
+    table: left behind by an archive run that stopped between detaching a
+    month and attaching its remaining rows again. Oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_class c "
+            "WHERE c.relkind = 'r' AND left(c.relname, %s) = %s "
+            "AND c.relnamespace = to_regnamespace(current_schema()) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)",
+            [len(PARTITION_PREFIX), PARTITION_PREFIX],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return _monthly(names)
+
+
+def create_partition(month: date) -> bool:
+    """
+    Create the partition for one month. Returns False if it already exists.
+    Rows for that month that had already landed in the DEFAULT partition
+    are moved into the new partition.
+    """
+    name = partition_name(month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" '
+            f"WHERE created_at >= %s AND created_at < %s)",
+            [lower, upper],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f'CREATE TABLE "{name}" PARTITION OF "{RATING_TABLE}" '
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            )
+            return True
+
+        cursor.execute(
+            f'CREATE TABLE "{name}" (LIKE "{RATING_TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+            f"WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [lower, upper],
+        )
+        cursor.execute(
+            f'ALTER TABLE "{RATING_TABLE}" ATTACH PARTITION "{name}" '
+            f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+    return True
+
+
+def ensure_partitions(months_ahead: int = 3, today=None):
+    """
+    Make sure partitions exist from the current month through months_ahead
+    months in the future. Returns the names of partitions that were created.
+    """
+    current = month_start(today or datetime.now(dt_timezone.utc))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(month):
+            created.append(partition_name(month))
+    return created
+
+
+def convert_to_partitioned(months_ahead: int = 3):
+    """
+    Rebuild the rating table as a monthly range-partitioned table.
+
+    Runs in one transaction holding an ACCESS EXCLUSIVE lock, so it is meant
+    for a maintenance window: every row is copied once into its month's
+    partition. Indexes, check constraints and foreign keys are recreated under
+    their original names; the primary key becomes (id, created_at) because
+    PostgreSQL requires unique constraints to include the partition key.
+    Returns the number of rows copied.
+    """
+    if connection.vendor != 'postgresql':
+        raise RuntimeError("Rating partitioning requires PostgreSQL")
+    if is_partitioned():
+        raise RuntimeError(f"{RATING_TABLE} is already partitioned")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Flush deferred FK checks so the old table can be dropped in this transaction
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f'LOCK TABLE "{RATING_TABLE}" IN ACCESS EXCLUSIVE MODE')
+
+        cursor.execute(
+            "SELECT count(*) FROM pg_constraint WHERE confrelid = to_regclass(%s)",
+            [RATING_TABLE],
+        )
+        if cursor.fetchone()[0]:
+            raise RuntimeError(f"Other tables reference {RATING_TABLE}; cannot partition it")
+
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes i "
+            "JOIN pg_class ic ON ic.relname = i.indexname "
+            "JOIN pg_index x ON x.indexrelid = ic.oid "
+            "WHERE i.tablename = %s AND NOT x.indisprimary",
+            [RATING_TABLE],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [RATING_TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min(created_at) FROM "{RATING_TABLE}"')
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE "{RATING_TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        cursor.execute(
+            f'CREATE TABLE "{RATING_TABLE}" (LIKE "{LEGACY_TABLE}" '
+            f"INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{RATING_TABLE}" DEFAULT')
+
+        now_month = month_start(datetime.now(dt_timezone.utc))
+        month = month_start(oldest) if oldest else now_month
+        while month <= add_months(now_month, months_ahead):
+            create_partition(month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{RATING_TABLE}" SELECT * FROM "{LEGACY_TABLE}"')
+        copied = cursor.rowcount
+
+        # Keep the id sequence: a serial column's sequence belongs to the old
+        # table, an identity column gets a fresh one that must skip used ids.
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [RATING_TABLE])
+        sequence = cursor.fetchone()[0]
+        if sequence is None:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [LEGACY_TABLE])
+            sequence = cursor.fetchone()[0]
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{RATING_TABLE}".id')
+        cursor.execute(
+            f'SELECT setval(%s, COALESCE((SELECT max(id) FROM "{RATING_TABLE}"), 0) + 1, false)',
+            [sequence],
+        )
+
+        cursor.execute(f'DROP TABLE "{LEGACY_TABLE}"')
+
+        cursor.execute(
+            f'ALTER TABLE "{RATING_TABLE}" ADD CONSTRAINT "{RATING_TABLE}_pkey" '
+            f"PRIMARY KEY (id, created_at)"
+        )
+        # Captured before the rename, so the definitions already name the new table
+        for index_def in index_defs:
+            cursor.execute(index_def)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{RATING_TABLE}" ADD CONSTRAINT "{name}" {definition}')
+
+    return copied
+
+
+def _has_default_partition(cursor) -> bool:
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s))",
+        [DEFAULT_PARTITION],
+    )
+    return cursor.fetchone()[0]
+
+
+def _recent_cars():
+    return f'SELECT DISTINCT motor_car_id FROM "{RATING_TABLE}" WHERE created_at >= %s'
+
+
+def _restore_preserved(cursor, name, cutoff) -> int:
+    """
+    Move a detached month's rows of cars with no rating since cutoff back
+    into the rating table, where they land in the DEFAULT partition and
+    stay visible to every Rating query until the month is attached again.
+    """
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{name}" WHERE motor_car_id NOT IN ({_recent_cars()}) RETURNING *) '
+        f'INSERT INTO "{RATING_TABLE}" SELECT * FROM moved',
+        [cutoff],
+    )
+    return cursor.rowcount
+
+
+def detach_partition(name, cutoff) -> bool:
+    """
+    Detach one monthly partition for archiving, in a transaction of its own
+    that waits at most DETACH_LOCK_TIMEOUT for the ACCESS EXCLUSIVE lock on
+    the rating table. The rows to keep (see _restore_preserved) are moved
+    into the DEFAULT partition in the same transaction, so they never drop
+    out of view; only the rows about to be archived are invisible until
+    they reach ArchivedRating. (DETACH ... CONCURRENTLY would take a weaker
+    lock, but PostgreSQL refuses it while a DEFAULT partition exists.)
+    Returns False if the lock could not be had; the month is then left
+    attached for the next run.
+    """
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'")
+            cursor.execute(f'ALTER TABLE "{RATING_TABLE}" DETACH PARTITION "{name}"')
+            _restore_preserved(cursor, name, cutoff)
+    except OperationalError as e:
+        logger.warning("Could not detach %s, leaving it for the next run: %s", name, e)
+        return False
+    return True
+
+
+def _archive_detached(cursor, name, month, cutoff) -> int:
+    """
+    Archive what is left in a detached month and attach the month again
+    with its preserved rows, fetched back from the DEFAULT partition, or
+    drop the table when the month has no rows left.
+    """
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    cursor.execute(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'")
+    # Left there by a run that stopped before restoring them
+    _restore_preserved(cursor, name, cutoff)
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{name}" RETURNING *) '
+        f'INSERT INTO "{ARCHIVE_TABLE}" ({ARCHIVE_INSERT_COLUMNS}) '
+        f"SELECT {ARCHIVE_SELECT_COLUMNS} FROM moved"
+    )
+    archived = cursor.rowcount
+
+    if _has_default_partition(cursor):
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+            f"WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [lower, upper],
+        )
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{name}")')
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'DROP TABLE "{name}"')
+        return archived
+
+    # The CHECK constraint lets ATTACH skip scanning the table for its bounds
+    check = f"{name}_bounds"
+    cursor.execute(f'ALTER TABLE "{name}" DROP CONSTRAINT IF EXISTS "{check}"')
+    cursor.execute(
+        f'ALTER TABLE "{name}" ADD CONSTRAINT "{check}" '
+        f"CHECK (created_at >= '{lower}' AND created_at < '{upper}')"
+    )
+    cursor.execute(
+        f'ALTER TABLE "{RATING_TABLE}" ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    )
+    cursor.execute(f'ALTER TABLE "{name}" DROP CONSTRAINT "{check}"')
+    return archived
+
+
+def _finish_detached(name, month, cutoff) -> int:
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            return _archive_detached(cursor, name, month, cutoff)
+    except OperationalError as e:
+        # Its preserved rows are in the DEFAULT partition meanwhile, still visible
+        logger.warning("Could not archive %s, leaving it for the next run: %s", name, e)
+        return 0
+
+
+def archive_partitions(cutoff):
+    """
+    Archive the rows of monthly partitions that lie entirely before cutoff.
+
+    For each such month that has rows of cars rated since cutoff, the
+    partition is detached (see detach_partition), so the rating table is
+    only locked for the detach itself. Those rows are then moved from the
+    detached table into ArchivedRating in a transaction of their own, and
+    the month is attached again with the preserved rows (cars with no
+    recent rating), keeping them out of the DEFAULT partition. Months left
+    detached by an interrupted run are finished first. Returns the number
+    of rows archived.
+    """
+    archived = 0
+    for name, month in detached_partitions():
+        archived += _finish_detached(name, month, cutoff)
+
+    cutoff_month = month_start(cutoff)
+    for name, month in list_partitions():
+        if add_months(month, 1) > cutoff_month:
+            break
+        with connection.cursor() as cursor:
+            # Months holding only preserved rows stay attached untouched
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM "{name}" WHERE motor_car_id IN ({_recent_cars()}))',
+                [cutoff],
+            )
+            if not cursor.fetchone()[0]:
+                continue
+        if detach_partition(name, cutoff):
+            archived += _finish_detached(name, month, cutoff)
+    return archived
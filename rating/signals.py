@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Rating
+from .tasks import generate_rating_image_derivatives
+
+
+# Resize and strip rating photos in the background once the upload is committed
+@receiver(post_save, sender=Rating)
+def schedule_image_derivatives(sender, instance, created, **kwargs):
+    if not instance.image or instance.image_derivatives:
+        return
+    transaction.on_commit(lambda: generate_rating_image_derivatives.delay(instance.pk))
@@ -1,5 +1,9 @@
 from celery import shared_task
+from rating.models import Rating
+from rating.services.images import generate_derivatives
 from rating.services.metrics import compute_average_ratings
+from rating.services.partitions import ensure_partitions, is_partitioned
+from django.conf import settings
 from django.core.cache import cache
 
 @shared_task
@@ -14,3 +18,23 @@ def clear_cache_task():
     cache.clear()
     return "Cache cleared successfully"
 
+
+
+@shared_task
+def create_rating_partitions_task():
+    if not is_partitioned():
+        return "Rating table is not partitioned"
+    created = ensure_partitions(getattr(settings, 'RATING_PARTITION_MONTHS_AHEAD', 3))
+    return f"Created {len(created)} rating partitions"
+
+
+@shared_task
+def generate_rating_image_derivatives(rating_id):
+    rating = Rating.objects.filter(pk=rating_id).first()
+    if not rating or not rating.image:
+        return "No image to process"
+
+    manifest = generate_derivatives(rating.image)
+    # update() rather than save(): Rating.save() awards points on every call
+    Rating.objects.filter(pk=rating_id).update(image_derivatives=manifest)
+    return f"Generated {len(manifest)} derivatives for rating {rating_id}"
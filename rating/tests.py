@@ -1,3 +1,449 @@
-from django.test import TestCase
+"""
+Tests for the rating app.
+"""
 
-# Create your tests here.
+import gzip
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from PIL import Image
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Avg, Count
+from django.db.models.functions import TruncDay
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import ArchivedRating, MotorCar, Rating, RatingArchiveCheckpoint
+from .services import archiving, cold_storage, images, partitions
+from .tasks import generate_rating_image_derivatives
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Query-plan checks need PostgreSQL')
+class RatingQueryPlanTests(TestCase):
+    """
+    Run EXPLAIN on the hot Rating queries and assert that an index serves them.
+    The table is seeded and analyzed so the planner has real statistics, and
+    sequential scans are disabled so the small test table doesn't make a seq
+    scan look cheaper; without a usable index the planner still falls back to
+    one and the assertion fails.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cars = cars = MotorCar.objects.bulk_create([
+            MotorCar(motor_car_number=f"UAX {100 + i}Y", motor_type='car') for i in range(50)
+        ])
+        user_types = ['Anonymous', 'Registered', 'Verified']
+        Rating.objects.bulk_create([
+            Rating(
+                motor_car=cars[i % len(cars)],
+                user_type=user_types[i % 3],
+                score=3,
+                motor_type='car',
+                system_comments='Careful driver',
+                location='Kampala',
+                device_id=f"device-{i % 200}" if i % 4 else None,
+            )
+            for i in range(3000)
+        ])
+        with connection.cursor() as cursor:
+            # Spread ratings over ~2 years so time windows are selective
+            cursor.execute(
+                f"UPDATE {Rating._meta.db_table} SET created_at = now() - (id % 730) * interval '1 day'"
+            )
+            cursor.execute(f"ANALYZE {Rating._meta.db_table}")
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        self.now = timezone.now()
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Expected {index_name} in plan:\n{plan}")
+
+    def test_average_by_car_and_user_type(self):
+        """compute_average_ratings: filter(motor_car, user_type) + aggregate"""
+        qs = Rating.objects.filter(motor_car=self.cars[0], user_type='Registered')
+        self.assertUsesIndex(qs.values('motor_car').annotate(avg=Avg('score')), 'rating_car_usertype_idx')
+
+    def test_last_comment_by_car_and_user_type(self):
+        """compute_average_ratings: latest rating per (motor_car, user_type)"""
+        qs = Rating.objects.filter(motor_car=self.cars[0], user_type='Verified').order_by('-created_at')[:1]
+        self.assertUsesIndex(qs, 'rating_car_usertype_idx')
+
+    def test_ratings_list_newest_first(self):
+        """MotorCarRatingsListView / archiving: ratings for one car by created_at"""
+        qs = Rating.objects.filter(motor_car=self.cars[0]).order_by('-created_at')
+        self.assertUsesIndex(qs, 'rating_car_created_idx')
+
+    def test_weekly_activity_window(self):
+        """check_weekly_activity_drop and the dashboard count a created_at range"""
+        qs = Rating.objects.filter(
+            created_at__range=[self.now - timedelta(days=14), self.now - timedelta(days=7)]
+        )
+        self.assertUsesIndex(qs.values('id'), 'rating_created_at_idx')
+
+    def test_dashboard_daily_stats(self):
+        qs = (
+            Rating.objects
+            .filter(created_at__gte=self.now - timedelta(days=7))
+            .annotate(day=TruncDay('created_at'))
+            .values('day')
+            .annotate(total=Count('id'))
+        )
+        self.assertUsesIndex(qs, 'rating_created_at_idx')
+
+    def test_weekly_bonus_active_users(self):
+        """award_weekly_bonus: distinct raters in the last week"""
+        qs = Rating.objects.filter(
+            created_at__gte=self.now - timedelta(days=7),
+            user__isnull=False
+        ).values_list('user_id', flat=True).distinct()
+        self.assertUsesIndex(qs, 'rating_recent_user_idx')
+
+    def test_device_repeat_rating_guard(self):
+        """RatingCreateView: has this device already rated this car?"""
+        qs = Rating.objects.filter(device_id='device-123', motor_car=self.cars[0])
+        self.assertUsesIndex(qs.values('id')[:1], 'rating_device_car_idx')
+
+    def test_plate_lookup(self):
+        qs = MotorCar.objects.filter(motor_car_number='UAX 123Y')
+        self.assertIn('Index', qs.explain())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL')
+class RatingPartitionTests(TestCase):
+    """Convert the rating table to monthly partitions inside the test transaction"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.active_car = MotorCar.objects.create(motor_car_number='UAX 123Y', motor_type='car')
+        self.idle_car = MotorCar.objects.create(motor_car_number='UBA 456K', motor_type='car')
+        self.old_active = self._rating(self.active_car, days_ago=6 * 365)
+        self.old_idle = self._rating(self.idle_car, days_ago=6 * 365)
+        self.recent = self._rating(self.active_car, days_ago=1)
+
+    def _rating(self, car, days_ago):
+        rating = Rating.objects.create(
+            motor_car=car, score=4, motor_type='car',
+            system_comments='Careful driver', location='Kampala',
+        )
+        Rating.objects.filter(pk=rating.pk).update(created_at=self.now - timedelta(days=days_ago))
+        return rating
+
+    def _partition_of(self, rating_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tableoid::regclass::text FROM {partitions.RATING_TABLE} WHERE id = %s",
+                [rating_id],
+            )
+            return cursor.fetchone()[0]
+
+    def test_convert_keeps_rows_and_ids(self):
+        copied = partitions.convert_to_partitioned(months_ahead=2)
+
+        self.assertEqual(copied, 3)
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(Rating.objects.count(), 3)
+        current = partitions.month_start(self.now)
+        names = [name for name, _ in partitions.list_partitions()]
+        self.assertIn(partitions.partition_name(partitions.add_months(current, 2)), names)
+        recent_month = partitions.month_start(Rating.objects.get(pk=self.recent.pk).created_at)
+        self.assertEqual(self._partition_of(self.recent.pk), partitions.partition_name(recent_month))
+
+        # New rows keep getting fresh ids and land in their month
+        new = Rating.objects.create(
+            motor_car=self.active_car, score=5, motor_type='car',
+            system_comments='Polite', location='Entebbe',
+        )
+        self.assertGreater(new.pk, self.recent.pk)
+        self.assertEqual(self._partition_of(new.pk), partitions.partition_name(current))
+
+    def test_recent_window_prunes_old_partitions(self):
+        partitions.convert_to_partitioned(months_ahead=1)
+        old_partition = partitions.partition_name(partitions.month_start(self.now - timedelta(days=6 * 365)))
+
+        plan = Rating.objects.filter(created_at__gte=self.now - timedelta(days=7)).explain()
+        self.assertNotIn(old_partition, plan)
+
+    def test_ensure_partitions_is_idempotent(self):
+        partitions.convert_to_partitioned(months_ahead=0)
+        created = partitions.ensure_partitions(months_ahead=2)
+        self.assertEqual(len(created), 2)
+        self.assertEqual(partitions.ensure_partitions(months_ahead=2), [])
+
+    def test_create_partition_moves_rows_from_default(self):
+        partitions.convert_to_partitioned(months_ahead=0)
+        future = partitions.add_months(partitions.month_start(self.now), 3)
+        stray = self._rating(self.active_car, days_ago=0)
+        Rating.objects.filter(pk=stray.pk).update(created_at=self.now + timedelta(days=95))
+        self.assertEqual(self._partition_of(stray.pk), partitions.DEFAULT_PARTITION)
+
+        partitions.ensure_partitions(months_ahead=4)
+        self.assertEqual(self._partition_of(stray.pk), partitions.partition_name(
+            partitions.month_start(Rating.objects.get(pk=stray.pk).created_at)))
+        self.assertIn(partitions.partition_name(future), [n for n, _ in partitions.list_partitions()])
+
+    def test_archive_partitions_moves_whole_months(self):
+        partitions.convert_to_partitioned(months_ahead=1)
+        cutoff = self.now - timedelta(days=5 * 365)
+
+        archived = partitions.archive_partitions(cutoff)
+
+        self.assertEqual(archived, 1)
+        self.assertTrue(ArchivedRating.objects.filter(motor_car=self.active_car).exists())
+        self.assertFalse(Rating.objects.filter(pk=self.old_active.pk).exists())
+        # Cars with no recent rating keep their history, still in its month's partition
+        old_month = partitions.partition_name(partitions.month_start(self.now - timedelta(days=6 * 365)))
+        self.assertEqual(self._partition_of(self.old_idle.pk), old_month)
+        self.assertIn(old_month, [n for n, _ in partitions.list_partitions()])
+        self.assertEqual(partitions.archive_partitions(cutoff), 0)
+
+    def test_archive_drops_emptied_month(self):
+        partitions.convert_to_partitioned(months_ahead=1)
+        Rating.objects.filter(pk=self.old_idle.pk).delete()
+        old_month = partitions.partition_name(partitions.month_start(self.now - timedelta(days=6 * 365)))
+
+        self.assertEqual(partitions.archive_partitions(self.now - timedelta(days=5 * 365)), 1)
+        self.assertNotIn(old_month, [n for n, _ in partitions.list_partitions()])
+        self.assertEqual(partitions.detached_partitions(), [])
+
+    def test_archive_finishes_interrupted_run(self):
+        partitions.convert_to_partitioned(months_ahead=1)
+        month = partitions.month_start(self.now - timedelta(days=6 * 365))
+        old_month = partitions.partition_name(month)
+        cutoff = self.now - timedelta(days=5 * 365)
+        # Stopped right after the detach
+        self.assertTrue(partitions.detach_partition(old_month, cutoff))
+        self.assertEqual(partitions.detached_partitions(), [(old_month, month)])
+        # The preserved row waits in the DEFAULT partition, still visible
+        self.assertEqual(self._partition_of(self.old_idle.pk), partitions.DEFAULT_PARTITION)
+        self.assertFalse(Rating.objects.filter(pk=self.old_active.pk).exists())
+
+        self.assertEqual(partitions.archive_partitions(cutoff), 1)
+        self.assertEqual(partitions.detached_partitions(), [])
+        self.assertEqual(self._partition_of(self.old_idle.pk), old_month)
+
+
+class ArchiveOldRatingsTests(TestCase):
+    """Chunked, resumable archiving of ratings older than five years"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.active_car = MotorCar.objects.create(motor_car_number='UAX 123Y', motor_type='car')
+        self.idle_car = MotorCar.objects.create(motor_car_number='UBA 456K', motor_type='car')
+        self.old_active = [self._rating(self.active_car, days_ago=6 * 365) for _ in range(5)]
+        self.old_idle = self._rating(self.idle_car, days_ago=6 * 365)
+        self.recent = self._rating(self.active_car, days_ago=1)
+
+    def _rating(self, car, days_ago):
+        rating = Rating.objects.create(
+            motor_car=car, score=4, motor_type='car',
+            system_comments='Careful driver', location='Kampala',
+        )
+        Rating.objects.filter(pk=rating.pk).update(created_at=self.now - timedelta(days=days_ago))
+        return rating
+
+    def test_dry_run_count(self):
+        self.assertEqual(archiving.count_eligible(self.now - archiving.ARCHIVE_AFTER), 5)
+        self.assertEqual(ArchivedRating.objects.count(), 0)
+
+    def test_archives_in_chunks_and_preserves_idle_cars(self):
+        seen = []
+        checkpoint = archiving.archive_old_ratings(chunk_size=2, pause=0, progress=seen.append)
+
+        self.assertEqual(checkpoint.rows_archived, 5)
+        self.assertIsNotNone(checkpoint.completed_at)
+        self.assertGreater(len(seen), 1)
+        self.assertEqual(ArchivedRating.objects.filter(motor_car=self.active_car).count(), 5)
+        self.assertTrue(Rating.objects.filter(pk=self.old_idle.pk).exists())
+        self.assertTrue(Rating.objects.filter(pk=self.recent.pk).exists())
+        archived = ArchivedRating.objects.order_by('created_at').first()
+        # Original timestamps are kept
+        self.assertEqual(archived.created_at, self.now - timedelta(days=6 * 365))
+
+    def test_resumes_unfinished_run(self):
+        checkpoint = archiving.start_or_resume()
+        archiving.archive_chunk(checkpoint, chunk_size=2)
+        self.assertEqual(checkpoint.rows_archived, 2)
+
+        resumed = archiving.archive_old_ratings(chunk_size=2, pause=0)
+
+        self.assertEqual(resumed.pk, checkpoint.pk)
+        self.assertEqual(resumed.rows_archived, 5)
+        self.assertEqual(ArchivedRating.objects.count(), 5)
+        self.assertEqual(RatingArchiveCheckpoint.objects.filter(completed_at__isnull=True).count(), 0)
+
+    def test_restart_abandons_unfinished_run(self):
+        stale = archiving.start_or_resume()
+        fresh = archiving.archive_old_ratings(chunk_size=100, pause=0, restart=True)
+
+        self.assertNotEqual(fresh.pk, stale.pk)
+        stale.refresh_from_db()
+        self.assertIsNotNone(stale.completed_at)
+        self.assertEqual(fresh.rows_archived, 5)
+
+    def test_command_rejects_bad_chunk_size_and_sleep(self):
+        for arguments in (['--chunk-size', '0'], ['--chunk-size', '-5'], ['--sleep', '-1']):
+            with self.assertRaises(CommandError):
+                call_command('archiving_old_ratings', *arguments, stdout=io.StringIO())
+        self.assertFalse(RatingArchiveCheckpoint.objects.exists())
+
+
+class ColdStorageTests(TestCase):
+    """Export archived ratings to gzip NDJSON segments and read them back per plate"""
+
+    def setUp(self):
+        self.storage = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage)
+        override = override_settings(RATING_COLD_STORAGE_DIR=self.storage)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.car = MotorCar.objects.create(motor_car_number='UAX 123Y', motor_type='car')
+        self.other_car = MotorCar.objects.create(motor_car_number='UBA 456K', motor_type='car')
+        self.march = datetime(2019, 3, 14, 8, 30, tzinfo=dt_timezone.utc)
+        for car, created_at in [(self.car, self.march), (self.car, self.march + timedelta(days=1)),
+                                (self.other_car, self.march), (self.car, datetime(2019, 4, 2, tzinfo=dt_timezone.utc))]:
+            ArchivedRating.objects.create(
+                motor_car=car, score=4, motor_type='car', system_comments='Careful driver',
+                location='Kampala', created_at=created_at,
+            )
+
+    def test_export_writes_monthly_segments_and_deletes_rows(self):
+        exported = cold_storage.export_older_than(datetime(2019, 5, 1, tzinfo=dt_timezone.utc), batch_size=2)
+
+        self.assertEqual(exported, {date(2019, 3, 1): 3, date(2019, 4, 1): 1})
+        self.assertEqual(ArchivedRating.objects.count(), 0)
+        data_path, index_path = cold_storage.segment_paths(date(2019, 3, 1))
+        self.assertTrue(index_path.exists())
+        # Several appended gzip members still read back as one gzip stream
+        with gzip.open(data_path, 'rt') as segment:
+            self.assertEqual(len(segment.readlines()), 3)
+
+    def test_export_stops_before_cutoff_month(self):
+        exported = cold_storage.export_older_than(datetime(2019, 4, 20, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(list(exported), [date(2019, 3, 1)])
+        self.assertEqual(ArchivedRating.objects.count(), 1)
+
+    def test_plate_lookup_streams_only_that_plate(self):
+        cold_storage.export_older_than(datetime(2019, 5, 1, tzinfo=dt_timezone.utc), batch_size=1)
+
+        records = list(cold_storage.iter_plate_ratings('UAX 123Y'))
+
+        self.assertEqual(len(records), 3)
+        self.assertTrue(all(r['plate'] == 'UAX 123Y' for r in records))
+        self.assertEqual(records[0]['created_at'], self.march.isoformat())
+        self.assertEqual(records[0]['score'], '4.0')
+        self.assertEqual(list(cold_storage.iter_plate_ratings('UAX 123Y', months=[date(2019, 4, 1)]))[0]['plate'],
+                         'UAX 123Y')
+        self.assertEqual(list(cold_storage.iter_plate_ratings('UZZ 999Z')), [])
+
+    def test_interleaved_appends_keep_offsets_apart(self):
+        import threading
+        import time
+        month = date(2019, 6, 1)
+        row = dict(ArchivedRating.objects.values(*cold_storage.EXPORT_FIELDS).first())
+        compress = gzip.compress
+        first_written = threading.Event()
+
+        def slow_compress(data, **kwargs):
+            # The first writer stalls between members, mid-append, while the second one starts
+            if threading.current_thread().name == 'first' and not first_written.is_set():
+                first_written.set()
+                time.sleep(0.2)
+            return compress(data, **kwargs)
+
+        def append(prefix):
+            rows = {f"{prefix} {number:03d}": [dict(row, id=f"{prefix}-{number}")] for number in range(3)}
+            cold_storage.append_segment(month, rows)
+
+        with mock.patch('rating.services.cold_storage.gzip.compress', side_effect=slow_compress):
+            first = threading.Thread(target=append, args=('UAA',), name='first')
+            first.start()
+            first_written.wait(5)
+            second = threading.Thread(target=append, args=('UBB',), name='second')
+            second.start()
+            first.join()
+            second.join()
+
+        for prefix in ('UAA', 'UBB'):
+            for number in range(3):
+                records = list(cold_storage.iter_plate_ratings(f"{prefix} {number:03d}", months=[month]))
+                self.assertEqual([r['id'] for r in records], [f"{prefix}-{number}"])
+
+
+class RatingImageDerivativeTests(TestCase):
+    """Background resizing / EXIF stripping of rating photos"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.car = MotorCar.objects.create(motor_car_number='UAX 123Y', motor_type='car')
+
+    def _photo(self, size=(3000, 2000)):
+        exif = Image.Exif()
+        exif[0x0110] = 'Phone Model X'  # Model
+        exif[0x0112] = 6  # Orientation: rotate 90 CW
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 180, 40)).save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile('plate.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def _rating(self):
+        return Rating.objects.create(
+            motor_car=self.car, score=4, motor_type='car', system_comments='Careful driver',
+            location='Kampala', rate_method='Image', image=self._photo(),
+        )
+
+    def test_upload_schedules_task_after_commit(self):
+        with mock.patch.object(generate_rating_image_derivatives, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                rating = self._rating()
+        delay.assert_called_once_with(rating.pk)
+
+    def test_rating_without_photo_schedules_nothing(self):
+        with mock.patch.object(generate_rating_image_derivatives, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                Rating.objects.create(
+                    motor_car=self.car, score=4, motor_type='car',
+                    system_comments='Careful driver', location='Kampala',
+                )
+        delay.assert_not_called()
+
+    def test_derivatives_are_resized_rotated_and_stripped(self):
+        rating = self._rating()
+        generate_rating_image_derivatives(rating.pk)
+        rating.refresh_from_db()
+
+        self.assertEqual(
+            set(rating.image_derivatives),
+            {images.derivative_key(size, fmt) for size in images.DERIVATIVE_SIZES for fmt in images.DERIVATIVE_FORMATS},
+        )
+        storage = rating.image.storage
+        with storage.open(rating.image_derivatives['thumb.jpg']) as f, Image.open(f) as thumb:
+            # EXIF orientation applied (portrait) before metadata was dropped
+            width, height = thumb.size
+            self.assertEqual(height, 320)
+            self.assertLess(width, height)
+            self.assertEqual(len(thumb.getexif()), 0)
+        with storage.open(rating.image_derivatives['medium.webp']) as f, Image.open(f) as medium:
+            self.assertEqual(max(medium.size), 1024)
+            self.assertEqual(medium.format, 'WEBP')
+        self.assertIn('derivatives/', rating.thumbnail_url)
+
+    def test_urls_fall_back_to_original_until_processed(self):
+        rating = self._rating()
+        self.assertEqual(rating.thumbnail_url, rating.image.url)
+        self.assertEqual(rating.display_image_url, rating.image.url)
@@ -6,7 +6,7 @@ django_asgi_app = get_asgi_application()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from voice_command import routing
+from plate_ocr import routing
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
@@ -37,10 +37,15 @@ WHATSAPP_API_KEY = 'uy983y5hkhoieyf89y5894y584jhoiufguqigho4y0574i4'
 # Channels configuration
 ASGI_APPLICATION = 'tra_ratings.asgi.application'
 
-# For local development, use in-memory channel layer
+# Redis in every environment, local development included (CHANNEL_REDIS_URL):
+# OCR jobs publish from Celery worker processes to the WebSockets held by the
+# web processes, so the layer has to be shared between processes (not in-memory)
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [config('CHANNEL_REDIS_URL', default='redis://localhost:6379/1')],
+        },
     }
 }
 
@@ -130,7 +135,13 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
         'LOCATION': r'D:\Dev\Django\tra_ratings\tra_cache',
-    }
+    },
+    # OCR quota counters (PLATE_OCR['OCR_QUOTA_CACHE']): shared by every web
+    # and Celery worker and incremented atomically, which the file cache is not
+    'ocr_quota': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('OCR_QUOTA_REDIS_URL', default='redis://localhost:6379/2'),
+    },
 }
 
 
@@ -207,6 +218,46 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'points.tasks.check_weekly_activity_drop',
         'schedule': timedelta(seconds=200),
     },
+    'create_rating_partitions': {
+        'task': 'rating.tasks.create_rating_partitions_task',
+        'schedule': timedelta(days=1),
+    },
+}
+
+# Monthly partitions of the rating table kept ready ahead of time
+# (only used once the table is converted with `manage.py partition_rating_table`)
+RATING_PARTITION_MONTHS_AHEAD = 3
+
+# Archived ratings older than this are moved out of the database into
+# compressed monthly segment files (`manage.py export_cold_ratings`)
+RATING_COLD_STORAGE_DIR = os.path.join(BASE_DIR, 'cold_storage')
+RATING_COLD_STORAGE_AFTER_DAYS = 6 * 365
+
+# Number plate OCR (see plate_ocr/conf.py for all options and defaults)
+PLATE_OCR = {
+    'CASCADE': True,
+    'CASCADE_MIN_CONFIDENCE': 0.85,
+    'MAX_OCR_CALLS': 24,
+    'MAX_OCR_MS': 5000,
+    # Detect plates on a copy scaled to this long edge (`manage.py benchmark_plate_detection`)
+    'DETECT_MAX_EDGE': 1280,
+    # Load the OCR models when a worker starts (web servers: run with PLATE_OCR_WARM_UP=1);
+    # photo/rating/ready/ is the readiness probe
+    'WARM_UP': True,
+    # Send photos to the shared OCR process pool (`manage.py run_ocr_pool`)
+    'POOL_ENABLED': False,
+    'POOL_SIZE': 2,
+    # Per-process cache of OCR results for re-submitted photos (0 = off)
+    'RESULT_CACHE_SIZE': 256,
+    'RESULT_CACHE_TTL': 600,
+    # Photo OCR runs on the "ocr" Celery queue: `celery -A tra_ratings worker -Q ocr`
+    'ASYNC_JOBS': True,
+    # Learn the best preprocessing variant order from OCRVariantStat
+    'ADAPTIVE_VARIANTS': True,
+    # Buffered OCRExtractionLog rows, reported at photo/rating/report/ for staff
+    'EXTRACTION_LOG': True,
+    # Per-client OCR quotas are counted in the Redis cache above
+    'OCR_QUOTA_CACHE': 'ocr_quota',
 }
 
 